@@ -0,0 +1,174 @@
+# anchor_manager.py
+import os
+import sys
+import json
+import cv2
+import numpy as np
+
+# 静态界面元素定义
+# roi: 模板截取区域，也是OCR回退时的识别区域
+# search: 模板匹配的搜索区域（缺省为roi向外扩展margin像素）
+# text: OCR回退时校验的文字
+DEFAULT_ANCHORS = {
+    "refresh": {"roi": [597, 1052, 59, 37], "search": [580, 1020, 100, 100], "text": "刷新"},
+    "game_library": {"roi": [462, 1180, 82, 88], "text": "游戏库"},
+    "event_center": {"roi": [370, 270, 105, 45], "text": "赛事中心"},
+    "predicting": {"roi": [304, 402, 113, 46], "text": "预测中"},
+}
+
+class AnchorManager:
+    """
+    界面锚点管理器：保存静态界面元素（刷新按钮、游戏库、赛事中心、预测中标签）的模板图像，
+    通过OpenCV模板匹配在毫秒级定位这些元素
+    """
+    def __init__(self, template_dir=os.path.join('config', 'anchors'), threshold=0.85, margin=20):
+        """
+        初始化锚点管理器
+        template_dir: 模板目录，包含各锚点的PNG模板和anchors.json
+        threshold: 模板匹配的最低归一化相关系数
+        margin: 未指定搜索区域时，ROI向外扩展的像素数
+        """
+        self.template_dir = template_dir
+        self.threshold = threshold
+        self.margin = margin
+        self.anchors = {name: dict(spec) for name, spec in DEFAULT_ANCHORS.items()}
+        self.templates = {}
+        self.load()
+
+    def load(self):
+        """从模板目录加载锚点定义和模板图像"""
+        spec_path = os.path.join(self.template_dir, 'anchors.json')
+        if os.path.exists(spec_path):
+            with open(spec_path, 'r', encoding='utf-8') as f:
+                for name, spec in json.load(f).items():
+                    self.anchors.setdefault(name, {}).update(spec)
+
+        self.templates = {}
+        for name in self.anchors:
+            path = os.path.join(self.template_dir, f"{name}.png")
+            if os.path.exists(path):
+                template = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+                if template is not None:
+                    self.templates[name] = template
+        if self.templates:
+            print(f"[锚点] 已加载 {len(self.templates)} 个模板: {list(self.templates)}")
+
+    def get(self, name):
+        """获取锚点定义"""
+        return self.anchors.get(name)
+
+    def search_region(self, name, roi=None):
+        """计算锚点的搜索区域：指定roi时在其周围搜索，否则使用锚点定义的搜索区域"""
+        spec = self.anchors[name]
+        if roi is None and "search" in spec:
+            return list(spec["search"])
+        x, y, w, h = roi if roi is not None else spec["roi"]
+        return [x - self.margin, y - self.margin, w + 2 * self.margin, h + 2 * self.margin]
+
+    def _to_gray(self, img_np):
+        if img_np.ndim == 2:
+            return img_np
+        if img_np.shape[2] == 4:
+            return cv2.cvtColor(img_np, cv2.COLOR_BGRA2GRAY)
+        return cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
+
+    def locate(self, img_np, name, roi=None):
+        """
+        模板匹配定位锚点
+        返回: (x, y, w, h, score)；无模板或未命中时返回None
+        """
+        template = self.templates.get(name)
+        if template is None:
+            return None
+
+        x, y, w, h = self.search_region(name, roi)
+        x, y = max(0, x), max(0, y)
+        w = min(w, img_np.shape[1] - x)
+        h = min(h, img_np.shape[0] - y)
+        t_h, t_w = template.shape[:2]
+        if w < t_w or h < t_h:
+            return None
+
+        region = self._to_gray(img_np[y:y + h, x:x + w])
+        scores = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+        _, max_score, _, max_loc = cv2.minMaxLoc(scores)
+        if max_score < self.threshold:
+            return None
+        return x + max_loc[0], y + max_loc[1], t_w, t_h, float(max_score)
+
+    def locate_all(self, img_np, name, region):
+        """
+        在指定区域内定位锚点的所有出现位置（如列表中的多个"预测中"标签）
+        返回: [(x, y, w, h, score), ...] 按纵坐标排序；无模板时返回None
+        """
+        template = self.templates.get(name)
+        if template is None:
+            return None
+
+        x, y, w, h = region
+        x, y = max(0, x), max(0, y)
+        w = min(w, img_np.shape[1] - x)
+        h = min(h, img_np.shape[0] - y)
+        t_h, t_w = template.shape[:2]
+        if w < t_w or h < t_h:
+            return []
+
+        scores = cv2.matchTemplate(self._to_gray(img_np[y:y + h, x:x + w]), template, cv2.TM_CCOEFF_NORMED)
+        matches = []
+        # 按得分从高到低贪心选取，抑制与已选位置重叠的候选
+        for loc_y, loc_x in sorted(zip(*np.where(scores >= self.threshold)), key=lambda p: -scores[p]):
+            if any(abs(loc_y - m_y) < t_h and abs(loc_x - m_x) < t_w for m_x, m_y, _ in matches):
+                continue
+            matches.append((int(loc_x), int(loc_y), float(scores[loc_y, loc_x])))
+        matches.sort(key=lambda m: m[1])
+        return [(x + m_x, y + m_y, t_w, t_h, score) for m_x, m_y, score in matches]
+
+    def capture(self, img_np, names=None):
+        """从截图中截取锚点模板并保存到模板目录，同时写出anchors.json"""
+        os.makedirs(self.template_dir, exist_ok=True)
+        names = names or list(self.anchors)
+        saved = []
+        for name in names:
+            spec = self.anchors.get(name)
+            if spec is None:
+                print(f"[锚点] 未知锚点: {name}")
+                continue
+            x, y, w, h = spec["roi"]
+            crop = img_np[y:y + h, x:x + w]
+            if crop.size == 0:
+                print(f"[锚点] 锚点 {name} 的区域超出截图范围，跳过")
+                continue
+            cv2.imwrite(os.path.join(self.template_dir, f"{name}.png"), crop)
+            saved.append(name)
+            print(f"[锚点] 已保存模板: {name} {spec['roi']}")
+
+        with open(os.path.join(self.template_dir, 'anchors.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.anchors, f, ensure_ascii=False, indent=4)
+        self.load()
+        return saved
+
+def capture_live_screenshot():
+    """连接模拟器并截取当前屏幕，用于采集模板"""
+    from init_manager import InitManager
+    init = InitManager()
+    controller = init.connect_adb()
+    controller.post_screencap().wait()
+    return np.array(controller.cached_image)
+
+if __name__ == "__main__":
+    # 用法:
+    #   python anchor_manager.py capture <截图文件|--live> [锚点名 ...]
+    if len(sys.argv) < 3 or sys.argv[1] != "capture":
+        print("用法: python anchor_manager.py capture <截图文件|--live> [锚点名 ...]")
+        sys.exit(1)
+    source = sys.argv[2]
+    if source == "--live":
+        screenshot = capture_live_screenshot()
+    else:
+        screenshot = cv2.imread(source, cv2.IMREAD_COLOR)
+        if screenshot is None:
+            print(f"[锚点] 无法读取截图: {source}")
+            sys.exit(1)
+    manager = AnchorManager()
+    saved = manager.capture(screenshot, sys.argv[3:] or None)
+    print(f"[锚点] 共保存 {len(saved)} 个模板")
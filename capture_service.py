@@ -0,0 +1,106 @@
+# capture_service.py
+import time
+import threading
+from collections import namedtuple
+import numpy as np
+
+# image: 环形缓冲区中该帧的只读视图（零拷贝）
+# timestamp: 截图请求发出的时间，帧内容不早于该时间
+# seq: 帧序号
+Frame = namedtuple("Frame", ["image", "timestamp", "seq"])
+
+class CaptureService:
+    """
+    后台截图服务：在独立线程中持续截图，写入预分配的uint8环形缓冲区，
+    消费者获取带时间戳的零拷贝视图，截图不再阻塞调用方
+    注意：视图所在的缓冲区会在之后第 ring_size 帧被覆盖，需要长时间持有的帧请自行复制
+    """
+    def __init__(self, controller, ring_size=4, interval=0.0, clock=None):
+        """
+        controller: ADB控制器
+        ring_size: 环形缓冲区帧数
+        interval: 两次截图之间的最小间隔（秒），0表示连续截图
+        clock: 帧时间戳使用的时钟，需与消费者（ScreenManager）的时钟一致，回放时为虚拟时钟；默认为 time 模块
+        """
+        self.controller = controller
+        self.clock = clock if clock is not None else time
+        self.ring_size = ring_size
+        self.interval = interval
+        self.buffers = [None] * ring_size
+        self.latest = None
+        self.seq = 0
+        self.running = False
+        self.thread = None
+        self.condition = threading.Condition()
+
+    def start(self):
+        """启动后台截图线程"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="capture-service", daemon=True)
+        self.thread.start()
+        print(f"[截图] 后台截图服务已启动，环形缓冲区 {self.ring_size} 帧")
+
+    def stop(self):
+        """停止后台截图线程"""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+        print("[截图] 后台截图服务已停止")
+
+    def _run(self):
+        while self.running:
+            requested_at = self.clock.time()
+            started = time.monotonic()
+            try:
+                self.controller.post_screencap().wait()
+                image = self.controller.cached_image
+            except Exception as e:
+                print(f"[截图] 后台截图失败: {e}")
+                time.sleep(0.5)
+                continue
+            if image is None or image.size == 0:
+                time.sleep(0.1)
+                continue
+            self._store(np.asarray(image), requested_at)
+            if self.interval > 0:
+                time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _store(self, image, timestamp):
+        """将截图写入下一个缓冲区，仅在尺寸变化时重新分配"""
+        slot = self.seq % self.ring_size
+        buffer = self.buffers[slot]
+        if buffer is None or buffer.shape != image.shape:
+            buffer = np.empty(image.shape, dtype=np.uint8)
+            self.buffers[slot] = buffer
+        np.copyto(buffer, image, casting="unsafe")
+        view = buffer.view()
+        view.flags.writeable = False
+        with self.condition:
+            self.latest = Frame(view, timestamp, self.seq)
+            self.seq += 1
+            self.condition.notify_all()
+
+    def is_current(self, frame):
+        """帧所在的缓冲区是否尚未被覆盖"""
+        return frame is not None and self.seq - frame.seq <= self.ring_size - 1
+
+    def next_frame(self, after=None, timeout=5.0):
+        """
+        获取在时间 after（按 clock 计时）之后发出请求的最新一帧，必要时等待
+        timeout: 实际等待的最长时间（秒）
+        返回: Frame，超时返回None
+        """
+        after = self.clock.time() if after is None else after
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.latest is None or self.latest.timestamp < after:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    return None
+                self.condition.wait(remaining)
+            return self.latest
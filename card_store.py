@@ -0,0 +1,91 @@
+# card_store.py
+import os
+import json
+import time
+import hashlib
+import numpy as np
+
+class CardStore:
+    """
+    卡片指纹库：对列表页上"预测中"卡片的可见区域（队伍、赔率）做粗粒度哈希，
+    记录每个指纹最近一次解析出的比赛数据；卡片未变化且数据未过期时无需再打开弹窗
+    """
+    FILE_NAME = "card_fingerprints.json"
+
+    def __init__(self, data_dir=None, ttl=600, crop=(-300, -70, 710, 150)):
+        """
+        data_dir: 数据目录，各游戏项目的指纹保存在 data_dir/<游戏项目>/card_fingerprints.json，
+                  为空时只保存在内存中
+        ttl: 数据有效期（秒），超过后即使卡片未变化也重新打开弹窗
+        crop: 卡片区域相对"预测中"标签中心的 (x偏移, y偏移, 宽, 高)
+        """
+        self.data_dir = data_dir
+        self.ttl = ttl
+        self.crop = crop
+        self.entries = {}  # {游戏项目: {指纹: {"match": 比赛数据, "time": 记录时间}}}
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, event_name):
+        return os.path.join(self.data_dir, event_name, self.FILE_NAME) if self.data_dir else None
+
+    def cards(self, event_name):
+        """获取游戏项目的指纹记录，首次访问时从文件加载（按项目分文件，多个分片进程互不覆盖）"""
+        if event_name not in self.entries:
+            cards = {}
+            path = self.path(event_name)
+            if path and os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        cards = json.load(f)
+                    print(f"[卡片] 已加载 {event_name} 卡片指纹 {len(cards)} 条")
+                except (OSError, ValueError) as e:
+                    print(f"[卡片] 加载 {event_name} 卡片指纹失败，重新建立: {e}")
+            self.entries[event_name] = cards
+        return self.entries[event_name]
+
+    def save(self):
+        """保存各游戏项目的指纹记录，同时清理已过期的记录"""
+        if not self.data_dir:
+            return
+        now = time.time()
+        for event_name, cards in self.entries.items():
+            for key in [key for key, entry in cards.items() if now - entry["time"] >= self.ttl]:
+                del cards[key]
+            path = self.path(event_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(cards, f, ensure_ascii=False)
+
+    def fingerprint(self, img_np, center):
+        """
+        计算卡片指纹：按标签中心截取卡片区域，降采样并量化后哈希，容忍轻微的渲染噪声
+        卡片区域超出截图范围（卡片被截断）时返回None
+        """
+        if img_np is None:
+            return None
+        x_offset, y_offset, w, h = self.crop
+        x = max(0, center[0] + x_offset)
+        y = center[1] + y_offset
+        if y < 0 or y + h > img_np.shape[0]:
+            return None
+        card = np.ascontiguousarray(img_np[y:y + h:2, x:x + w:2] >> 4)
+        return hashlib.blake2b(card.data, digest_size=16).hexdigest()
+
+    def get(self, event_name, key):
+        """返回指纹对应的未过期比赛数据，没有时返回None"""
+        entry = self.cards(event_name).get(key) if key else None
+        if entry is None or time.time() - entry["time"] >= self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(entry["match"])
+
+    def put(self, event_name, key, match):
+        """记录指纹对应的比赛数据"""
+        if key and match:
+            self.cards(event_name)[key] = {"match": dict(match), "time": time.time()}
+
+    def stats(self):
+        """命中统计：跳过的弹窗数和打开的弹窗数"""
+        return {"hits": self.hits, "misses": self.misses}
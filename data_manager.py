@@ -2,14 +2,27 @@
 import re
 import sqlite3
 import os
+import time
 import logging
 from datetime import datetime, timedelta
+from team_lexicon import TeamLexicon
+from db_manager import connect, write_transaction
+from odds_store import OddsStore
+from match_key import match_key, start_ts, ensure_key_columns
 
 class DataManager:
     def __init__(self, config):
         self.config = config
+        self.team_lexicons = {}  # 各游戏项目的队伍名称词典
+        self.odds_store = OddsStore(config['fetch']['data_dir'])  # 统一赔率库（与各比赛目录的数据库同时写入）
         logging.info("DataManager initialized with config: %s", config)
 
+    def get_team_lexicon(self, event_name, refresh=False):
+        """获取游戏项目的队伍名称词典（由 web_matches.db 和 mappings.db 建立），refresh 时重新建立"""
+        if refresh or event_name not in self.team_lexicons:
+            self.team_lexicons[event_name] = TeamLexicon.from_data_dir(self.config['fetch']['data_dir'], event_name)
+        return self.team_lexicons[event_name]
+
     def parse_extended_time(self, time_str):
         """解析可能超过24小时的时间格式 'H:M:S'"""
         logging.debug("Parsing time string: %s", time_str)
@@ -28,8 +41,13 @@ class DataManager:
             logging.info("Using default time due to parsing error: %s", default_time)
             return default_time
 
-    def process_text_data(self, text_data):
-        """处理文本数据，提取字段，根据x轴坐标从左到右识别队伍和赔率"""
+    def process_text_data(self, text_data, reread=None, min_confidence=0.85, lexicon=None):
+        """
+        处理文本数据，提取字段，根据x轴坐标从左到右识别队伍和赔率
+        reread: 可选的重新识别函数，接收文本项并返回（可能更新后的）文本项；
+                置信度低于 min_confidence 的字段（队伍、赔率、时间）各重新识别一次
+        lexicon: 可选的队伍名称词典，队伍名称纠正为编辑距离上界内唯一最近的已知名称
+        """
         match_name = None
         filtered_data = []
         
@@ -44,6 +62,9 @@ class DataManager:
                 continue
             if any(keyword in text for keyword in ["预测中", "猜胜负", "奖励率", "后", "刷新"]):
                 continue
+            if reread is not None and item.get("confidence", 1.0) < min_confidence:
+                logging.debug("Re-reading low confidence item: %s (%.2f)", text, item["confidence"])
+                item = reread(item)
             filtered_data.append(item)
 
         if match_name is None:
@@ -59,14 +80,20 @@ class DataManager:
             for item in filtered_data:
                 text = item["text"]
                 x_coord = item["coordinates"][0]
+                confidence = item.get("confidence", 1.0)
                 
                 if "." in text and text.replace(".", "").isdigit():
-                    odds_items.append({"text": float(text), "x": x_coord})
+                    odds_items.append({"text": float(text), "x": x_coord, "confidence": confidence})
                 elif ":" in text:
-                    time_items.append({"text": text, "x": x_coord})
+                    time_items.append({"text": text, "x": x_coord, "confidence": confidence})
                 else:
                     if text.strip() and text not in ["", " "]:
-                        team_items.append({"text": str(text), "x": x_coord})
+                        if lexicon is not None:
+                            corrected, distance = lexicon.correct(text)
+                            if distance:
+                                print(f"[文本处理] 队伍名称纠正: {text} -> {corrected}（编辑距离 {distance}）")
+                            text = corrected
+                        team_items.append({"text": str(text), "x": x_coord, "confidence": confidence})
             
             # 根据x坐标排序队伍和赔率
             team_items.sort(key=lambda x: x["x"])
@@ -82,6 +109,8 @@ class DataManager:
             odds_a = odds_items[0]["text"]
             odds_b = odds_items[1]["text"]
             match_time = self.parse_extended_time(time_items[0]["text"]) if time_items else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # 整条数据的置信度取所用字段中的最低值
+            used_items = team_items[:2] + odds_items[:2] + time_items[:1]
             
             processed_data = {
                 "team_a": team_a,
@@ -89,7 +118,8 @@ class DataManager:
                 "odds_a": odds_a,
                 "odds_b": odds_b,
                 "time": match_time,
-                "match_name": match_name
+                "match_name": match_name,
+                "confidence": min(item["confidence"] for item in used_items)
             }
             
             print(f"[文本处理] 处理结果: {team_a}({odds_a}) vs {team_b}({odds_b}), 时间: {match_time}")
@@ -108,219 +138,219 @@ class DataManager:
             print("[数据保存] 没有数据或比赛名称，跳过")
             return None
 
-        # 如果数据中包含原始名称，优先使用它查询映射
-        original_match_name = data.get("original_match_name", match_name)
-        
-        # 清理比赛名称中的非法字符，以便用作目录名
-        safe_match_name = re.sub(r'[<>:"/\\|?*]', '_', match_name)
-        
-        # 构建存储路径: data/CS2/比赛名字/
-        match_data_dir = self.config['fetch']['data_dir']
-        game_folder = os.path.join(match_data_dir, event_name)
-        os.makedirs(game_folder, exist_ok=True)
-        
-        # 检查映射关系以决定如何保存数据
-        mapping_found = False
-        mapped_name = None
+        return self.save_many(event_name, [dict(data, match_name=match_name, match_id=match_id)])[0]
+
+    def resolve_mappings(self, game_folder, event_name, names):
+        """
+        一次查询解析一批比赛名称的映射
+        返回: (有效映射 {小黑盒名称: 网络名称}, 已是标准名称的集合)
+        """
         db_path = os.path.join(game_folder, 'mappings.db')
-        
-        if os.path.exists(db_path):
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            # 首先查询原始名称的映射
-            cursor.execute('SELECT web_match_name FROM match_name_mapping WHERE lbb_match_name = ? AND game_name = ?', 
-                         (original_match_name, event_name))
-            mapping = cursor.fetchone()
-            
-            if mapping and mapping[0] and not mapping[0].startswith("UNMATCHED_") and not mapping[0] == "TIME_DIFF_TOO_LARGE":
-                mapped_name = mapping[0]
-                mapping_found = True
-                print(f"[数据保存] 找到有效映射: {original_match_name} -> {mapped_name}")
-            else:
-                # 如果原始名称没有映射，检查标准化名称是否已经是标准名称
-                cursor.execute('SELECT 1 FROM match_name_mapping WHERE web_match_name = ? AND game_name = ?', 
-                            (match_name, event_name))
-                is_standard_name = cursor.fetchone() is not None
-                
-                if is_standard_name:
-                    mapped_name = match_name
-                    mapping_found = True
-                    print(f"[数据保存] 使用标准化名称: {match_name}")
-                else:
-                    print(f"[数据保存] 未找到映射，使用默认路径保存: {match_name}")
-            
-            conn.close()
-        
-        # 确定目标文件夹
-        if mapping_found and mapped_name:
-            # 使用映射的标准名称作为目录
-            safe_match_name = re.sub(r'[<>:"/\\|?*]', '_', mapped_name)
-            match_folder = os.path.join(game_folder, safe_match_name)
-        else:
-            # 直接使用传入的match_name作为目录
-            match_folder = os.path.join(game_folder, safe_match_name)
-        
-        os.makedirs(match_folder, exist_ok=True)
-        
-        # 获取当前保存时间
+        names = sorted(set(names))
+        if not names or not os.path.exists(db_path):
+            return {}, set()
+
+        placeholders = ",".join("?" * len(names))
+        try:
+            rows = connect(db_path).execute(f"""
+                SELECT lbb_match_name, web_match_name FROM match_name_mapping
+                WHERE game_name = ? AND (lbb_match_name IN ({placeholders}) OR web_match_name IN ({placeholders}))
+            """, [event_name] + names + names).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"[数据保存] 查询映射失败: {e}")
+            rows = []
+
+        wanted = set(names)
+        mappings = {}
+        standard = set()
+        for lbb_name, web_name in rows:
+            if lbb_name in wanted and web_name and not web_name.startswith("UNMATCHED_") and web_name != "TIME_DIFF_TOO_LARGE":
+                mappings[lbb_name] = web_name
+            if web_name in wanted:
+                standard.add(web_name)
+        return mappings, standard
+
+    def _find_similar(self, cursor, row, batch_ids):
+        """按比赛规范键（同一天、同两支队伍）查找已有记录，先查本批次已分配的ID，再查数据库索引"""
+        if row["match_key"] in batch_ids:
+            return batch_ids[row["match_key"]]
+        cursor.execute("SELECT match_id FROM matches WHERE match_key = ?", (row["match_key"],))
+        found = cursor.fetchone()
+        return found[0] if found else None
+
+    @staticmethod
+    def _store_row(row, match_id, now, **extra):
+        """转换为统一赔率库的比赛数据字段"""
+        return dict(row, match_id=match_id, match_time=row["time"], creation_time=now, last_updated=now, **extra)
+
+    def save_many(self, event_name, matches):
+        """
+        批量保存小黑盒数据：
+        1. 一次查询解析整批比赛名称的映射
+        2. 按目标数据库（比赛目录下的 lbb_matches.db、未映射时的 default_lbb_matches.db）分组
+        3. 每个数据库一次连接、一个事务，executemany 执行 INSERT ... ON CONFLICT DO UPDATE
+        matches: 比赛数据列表，每项需包含 match_name、team_a、team_b、odds_a、odds_b、time，可选 match_id
+        返回: 与 matches 一一对应的 match_id 列表，跳过的数据为None
+        """
+        game_folder = os.path.join(self.config['fetch']['data_dir'], event_name)
+        os.makedirs(game_folder, exist_ok=True)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # 保存原始数据
-        original_team_a = data.get("original_team_a", data["team_a"])
-        original_team_b = data.get("original_team_b", data["team_b"])
-        
-        # 先在lbb_matches.db中检查是否有相似比赛（通过队伍和时间）
-        lbb_db_path = os.path.join(match_folder, "lbb_matches.db")
-        if os.path.exists(lbb_db_path):
-            conn = sqlite3.connect(lbb_db_path)
-            cursor = conn.cursor()
-            
-            # 提取比赛日期用于模糊匹配
-            match_date = data["time"].split(" ")[0]  # 只使用日期部分，如 "2023-05-20"
-            
-            # 查询有没有同一天同两支队伍的比赛（忽略队伍顺序）
-            cursor.execute("""
-                SELECT match_id FROM matches 
-                WHERE match_time LIKE ? AND 
-                      ((team_a = ? AND team_b = ?) OR 
-                       (team_a = ? AND team_b = ?))
-            """, (f"{match_date}%", data["team_a"], data["team_b"], 
-                  data["team_b"], data["team_a"]))
-            
-            match_row = cursor.fetchone()
-            if match_row and match_id is None:
-                match_id = match_row[0]
-                print(f"[数据保存] 找到时间和队伍匹配的记录，使用其ID: {match_id}")
-            
-            conn.close()
-        
-        # 生成唯一ID如果仍未提供或找到
-        if match_id is None:
-            match_id = f"lbb_{event_name}_{safe_match_name}_{data['time'].replace(':', '').replace(' ', '')}"
-            print(f"[数据保存] 生成新LBB数据ID: {match_id}")
-        
-        # 无论如何，保存小黑盒数据到lbb_matches.db
-        conn = sqlite3.connect(lbb_db_path)
-        cursor = conn.cursor()
-        
-        # 确保表结构包含last_updated字段
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS matches (
-                match_id TEXT PRIMARY KEY,
-                match_name TEXT,
-                match_time TEXT,
-                team_a TEXT,
-                team_b TEXT,
-                odds_a REAL,
-                odds_b REAL,
-                original_match_name TEXT,
-                original_team_a TEXT,
-                original_team_b TEXT,
-                last_updated TEXT
-            )
-        """)
-        
-        cursor.execute("SELECT match_id FROM matches WHERE match_id = ?", (match_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute("""
-                UPDATE matches SET 
-                    odds_a = ?, odds_b = ?, match_time = ?, match_name = ?, 
-                    team_a = ?, team_b = ?, original_match_name = ?,
-                    original_team_a = ?, original_team_b = ?, last_updated = ?
-                WHERE match_id = ?
-            """, (data["odds_a"], data["odds_b"], data["time"], match_name, 
-                 data["team_a"], data["team_b"], original_match_name,
-                 original_team_a, original_team_b, now, match_id))
-            print(f"[数据保存] 更新LBB记录: {match_id}")
-        else:
-            cursor.execute("""
-                INSERT INTO matches (
-                    match_id, match_name, match_time, team_a, team_b, 
-                    odds_a, odds_b, original_match_name, original_team_a, 
-                    original_team_b, last_updated
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (match_id, match_name, data["time"], data["team_a"], data["team_b"], 
-                 data["odds_a"], data["odds_b"], original_match_name, 
-                 original_team_a, original_team_b, now))
-            print(f"[数据保存] 创建新LBB记录: {match_id}")
-        
-        conn.commit()
-        conn.close()
-        print(f"[数据保存] 完成LBB数据保存: {match_name}")
-        
-        # 如果没有找到映射，则还需要保存到默认数据库
-        if not mapping_found:
-            default_db_path = os.path.join(game_folder, "default_lbb_matches.db")
-            conn = sqlite3.connect(default_db_path)
-            cursor = conn.cursor()
-            
-            # 确保表结构包含last_updated字段
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS matches (
-                    match_id TEXT PRIMARY KEY,
-                    match_name TEXT,
-                    match_time TEXT,
-                    team_a TEXT,
-                    team_b TEXT,
-                    odds_a REAL,
-                    odds_b REAL,
-                    original_match_name TEXT,
-                    original_team_a TEXT,
-                    original_team_b TEXT,
-                    creation_time TEXT,
-                    last_updated TEXT
-                )
-            """)
-            
-            # 检查是否已存在记录
-            cursor.execute("SELECT match_id FROM matches WHERE match_id = ?", (match_id,))
-            existing = cursor.fetchone()
-            
-            # 如果未找到精确匹配，尝试查找相似记录
-            if not existing:
-                match_date = data["time"].split(" ")[0]
-                cursor.execute("""
-                    SELECT match_id FROM matches 
-                    WHERE match_time LIKE ? AND 
-                          ((team_a = ? AND team_b = ?) OR 
-                           (team_a = ? AND team_b = ?))
-                """, (f"{match_date}%", data["team_a"], data["team_b"], 
-                      data["team_b"], data["team_a"]))
-                similar_match = cursor.fetchone()
-                if similar_match:
-                    existing = similar_match
-                    print(f"[数据保存] 找到相似的默认数据库记录: {existing[0]}")
-            
-            if existing:
-                # 更新已有记录
+
+        rows = []
+        for index, data in enumerate(matches):
+            match_name = data.get("match_name") if data else None
+            if not data or not match_name:
+                print("[数据保存] 没有数据或比赛名称，跳过")
+                continue
+            rows.append(dict(
+                data,
+                index=index,
+                # 如果数据中包含原始名称，优先使用它查询映射
+                original_match_name=data.get("original_match_name", match_name),
+                original_team_a=data.get("original_team_a", data["team_a"]),
+                original_team_b=data.get("original_team_b", data["team_b"]),
+                match_key=match_key(event_name, data["time"], data["team_a"], data["team_b"]),
+                start_ts=start_ts(data["time"])
+            ))
+
+        mappings, standard = self.resolve_mappings(
+            game_folder, event_name,
+            [row["original_match_name"] for row in rows] + [row["match_name"] for row in rows]
+        )
+
+        # 按目标目录分组：有映射时使用标准名称目录，否则直接使用比赛名称
+        groups = {}
+        for row in rows:
+            mapped_name = mappings.get(row["original_match_name"])
+            if mapped_name is None and row["match_name"] in standard:
+                mapped_name = row["match_name"]
+            row["mapping_found"] = mapped_name is not None
+            row["safe_match_name"] = re.sub(r'[<>:"/\\|?*]', '_', row["match_name"])
+            folder_name = re.sub(r'[<>:"/\\|?*]', '_', mapped_name) if mapped_name else row["safe_match_name"]
+            groups.setdefault(os.path.join(game_folder, folder_name), []).append(row)
+
+        match_ids = [None] * len(matches)
+        for match_folder, group in groups.items():
+            os.makedirs(match_folder, exist_ok=True)
+            with write_transaction(os.path.join(match_folder, "lbb_matches.db")) as conn:
+                cursor = conn.cursor()
                 cursor.execute("""
-                    UPDATE matches SET 
-                        odds_a = ?, odds_b = ?, match_time = ?, match_name = ?, 
-                        team_a = ?, team_b = ?, original_match_name = ?,
-                        original_team_a = ?, original_team_b = ?, last_updated = ?
-                    WHERE match_id = ?
-                """, (data["odds_a"], data["odds_b"], data["time"], match_name, 
-                     data["team_a"], data["team_b"], original_match_name,
-                     original_team_a, original_team_b, now, existing[0]))
-                print(f"[数据保存] 更新默认数据库记录: {existing[0]}")
-            else:
-                # 插入新记录
+                    CREATE TABLE IF NOT EXISTS matches (
+                        match_id TEXT PRIMARY KEY,
+                        match_name TEXT,
+                        match_time TEXT,
+                        team_a TEXT,
+                        team_b TEXT,
+                        odds_a REAL,
+                        odds_b REAL,
+                        original_match_name TEXT,
+                        original_team_a TEXT,
+                        original_team_b TEXT,
+                        last_updated TEXT,
+                        match_key TEXT,
+                        start_ts INTEGER
+                    )
+                """)
+                ensure_key_columns(conn, event_name)
+                batch_ids = {}
+                params = []
+                for row in group:
+                    match_id = row.get("match_id")
+                    if match_id is None:
+                        match_id = self._find_similar(cursor, row, batch_ids)
+                    if match_id is None:
+                        match_id = f"lbb_{event_name}_{row['safe_match_name']}_{row['time'].replace(':', '').replace(' ', '')}"
+                    batch_ids[row["match_key"]] = match_id
+                    row["match_id"] = match_id
+                    row["folder"] = os.path.basename(match_folder)
+                    match_ids[row["index"]] = match_id
+                    params.append((match_id, row["match_name"], row["time"], row["team_a"], row["team_b"],
+                                   row["odds_a"], row["odds_b"], row["original_match_name"],
+                                   row["original_team_a"], row["original_team_b"], now,
+                                   row["match_key"], row["start_ts"]))
+                cursor.executemany("""
+                    INSERT INTO matches (
+                        match_id, match_name, match_time, team_a, team_b, 
+                        odds_a, odds_b, original_match_name, original_team_a, 
+                        original_team_b, last_updated, match_key, start_ts
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(match_id) DO UPDATE SET
+                        odds_a = excluded.odds_a, odds_b = excluded.odds_b,
+                        match_time = excluded.match_time, match_name = excluded.match_name,
+                        team_a = excluded.team_a, team_b = excluded.team_b,
+                        original_match_name = excluded.original_match_name,
+                        original_team_a = excluded.original_team_a,
+                        original_team_b = excluded.original_team_b,
+                        last_updated = excluded.last_updated,
+                        match_key = excluded.match_key, start_ts = excluded.start_ts
+                """, params)
+            print(f"[数据保存] {os.path.basename(match_folder)}/lbb_matches.db 写入 {len(group)} 条记录")
+
+        # 未找到映射的数据还需要保存到默认数据库
+        unmapped = [row for row in rows if not row["mapping_found"]]
+        if unmapped:
+            with write_transaction(os.path.join(game_folder, "default_lbb_matches.db")) as conn:
+                cursor = conn.cursor()
                 cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS matches (
+                        match_id TEXT PRIMARY KEY,
+                        match_name TEXT,
+                        match_time TEXT,
+                        team_a TEXT,
+                        team_b TEXT,
+                        odds_a REAL,
+                        odds_b REAL,
+                        original_match_name TEXT,
+                        original_team_a TEXT,
+                        original_team_b TEXT,
+                        creation_time TEXT,
+                        last_updated TEXT,
+                        match_key TEXT,
+                        start_ts INTEGER
+                    )
+                """)
+                ensure_key_columns(conn, event_name)
+                batch_ids = {}
+                params = []
+                for row in unmapped:
+                    # 优先使用精确ID，其次使用相似记录的ID
+                    cursor.execute("SELECT match_id FROM matches WHERE match_id = ?", (row["match_id"],))
+                    target_id = row["match_id"] if cursor.fetchone() else self._find_similar(cursor, row, batch_ids)
+                    target_id = target_id or row["match_id"]
+                    batch_ids[row["match_key"]] = target_id
+                    row["default_id"] = target_id
+                    params.append((target_id, row["match_name"], row["time"], row["team_a"], row["team_b"],
+                                   row["odds_a"], row["odds_b"], row["original_match_name"],
+                                   row["original_team_a"], row["original_team_b"], now, now,
+                                   row["match_key"], row["start_ts"]))
+                cursor.executemany("""
                     INSERT INTO matches (
                         match_id, match_name, match_time, team_a, team_b, 
                         odds_a, odds_b, original_match_name, original_team_a, 
-                        original_team_b, creation_time, last_updated
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (match_id, match_name, data["time"], data["team_a"], data["team_b"], 
-                     data["odds_a"], data["odds_b"], original_match_name, 
-                     original_team_a, original_team_b, now, now))
-                print(f"[数据保存] 创建新默认数据库记录: {match_id}")
-            
-            conn.commit()
-            conn.close()
-            print(f"[数据保存] 完成默认数据库处理: {event_name}/default_lbb_matches.db")
-        
-        return match_id
\ No newline at end of file
+                        original_team_b, creation_time, last_updated, match_key, start_ts
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(match_id) DO UPDATE SET
+                        odds_a = excluded.odds_a, odds_b = excluded.odds_b,
+                        match_time = excluded.match_time, match_name = excluded.match_name,
+                        team_a = excluded.team_a, team_b = excluded.team_b,
+                        original_match_name = excluded.original_match_name,
+                        original_team_a = excluded.original_team_a,
+                        original_team_b = excluded.original_team_b,
+                        last_updated = excluded.last_updated,
+                        match_key = excluded.match_key, start_ts = excluded.start_ts
+                """, params)
+            print(f"[数据保存] 完成默认数据库处理: {event_name}/default_lbb_matches.db，{len(unmapped)} 条记录")
+
+        # 同时写入统一赔率库
+        self.odds_store.upsert_matches(event_name, "lbb", [self._store_row(row, row["match_id"], now) for row in rows])
+        self.odds_store.upsert_matches(event_name, "lbb_default",
+                                       [self._store_row(row, row["default_id"], now, folder=None) for row in unmapped])
+        # 追加赔率历史（赔率未变化的比赛不写入）
+        captured = int(time.time())
+        appended = self.odds_store.append_odds("lbb", [(row["match_key"], captured, row["odds_a"], row["odds_b"])
+                                                       for row in rows])
+        if appended:
+            print(f"[数据保存] {event_name} 赔率变化 {appended} 条，已追加到赔率历史")
+
+        print(f"[数据保存] {event_name} 批量保存完成: {len(rows)} 条数据，{len(groups)} 个比赛数据库")
+        return match_ids
@@ -0,0 +1,120 @@
+# db_manager.py - SQLite连接管理：按数据库路径复用连接，统一WAL和写入策略
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# 打开连接时设置的参数
+# journal_mode=WAL: 读写互不阻塞，抓取、网络获取和凯利计算可同时访问同一数据库
+# synchronous=NORMAL: WAL模式下只在检查点时同步磁盘，断电最多丢失最近的事务，不会损坏数据库
+# cache_size: 负数表示KB，每个连接约16MB页缓存
+# mmap_size: 内存映射读取，减少读操作的系统调用
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+BUSY_TIMEOUT = 30          # 等待其他进程释放写锁的最长时间（秒）
+CACHED_STATEMENTS = 256    # 每个连接缓存的预编译语句数，重复执行的SQL无需重新解析
+WRITE_RETRIES = 3          # 超过等待时间仍被锁定时重试写事务的次数
+
+_local = threading.local()
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+def _connections():
+    """当前线程的连接表；fork出的子进程不沿用父进程的连接"""
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        _local.pid = pid
+        _local.connections = {}
+    return _local.connections
+
+def connect(db_path):
+    """
+    获取数据库连接：同一线程内同一路径复用一个连接（sqlite3连接不能跨线程使用）
+    连接为自动提交模式，写入请使用 write_transaction，调用方不要关闭连接
+    每个缓存的连接占用页缓存和内存映射：遍历历史数据库的一次性读取请使用 read_only，
+    逐个写入大量数据库（如回填）时用完一个调用 release 关闭一个
+    """
+    key = os.path.abspath(db_path)
+    connections = _connections()
+    conn = connections.get(key)
+    if conn is None:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        conn = sqlite3.connect(key, timeout=BUSY_TIMEOUT, isolation_level=None,
+                               cached_statements=CACHED_STATEMENTS)
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        connections[key] = conn
+    return conn
+
+def release(db_path):
+    """关闭当前线程缓存的某个数据库连接，调用方确定不再使用该连接时调用"""
+    conn = _connections().pop(os.path.abspath(db_path), None)
+    if conn is not None:
+        conn.close()
+
+@contextmanager
+def read_only(db_path):
+    """
+    一次性只读连接：不进入连接缓存，不设置页缓存和内存映射，退出时关闭，
+    用于逐个扫描历史比赛目录下的数据库
+    用法:
+        with read_only(path) as conn:
+            rows = conn.execute(...).fetchall()
+    """
+    uri = "file:" + pathname2url(os.path.abspath(db_path)) + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, isolation_level=None)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def _write_lock(key):
+    with _write_locks_guard:
+        return _write_locks.setdefault(key, threading.Lock())
+
+@contextmanager
+def write_transaction(db_path):
+    """
+    写事务：同一进程内按路径串行化写入线程，事务以 BEGIN IMMEDIATE 开始，
+    一开始就取得写锁（多个进程之间由SQLite文件锁排队，等待 BUSY_TIMEOUT），
+    避免读事务升级为写事务时直接报 database is locked
+    用法:
+        with write_transaction(path) as conn:
+            conn.execute(...)
+    正常退出时提交，发生异常时回滚；嵌套调用并入外层事务
+    """
+    conn = connect(db_path)
+    if conn.in_transaction:
+        yield conn
+        return
+
+    with _write_lock(os.path.abspath(db_path)):
+        for attempt in range(WRITE_RETRIES):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                break
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == WRITE_RETRIES - 1:
+                    raise
+                print(f"[数据库] {os.path.basename(db_path)} 被锁定，重试写事务 ({attempt + 1}/{WRITE_RETRIES})")
+                time.sleep(1)
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def close_all():
+    """关闭当前线程打开的所有连接（程序退出前调用）"""
+    connections = _connections()
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
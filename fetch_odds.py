@@ -10,6 +10,9 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
+from db_manager import connect, write_transaction
+from odds_store import OddsStore
+from match_key import match_key, start_ts, ensure_key_columns
 
 # 配置缓存：用于存储网络请求结果，减少重复请求
 cache = TTLCache(maxsize=100, ttl=600)  # 缓存大小100条，有效期600秒
@@ -146,7 +149,7 @@ def fetch_team_odds(config, urls=None, force_refresh=False, max_attempts=3):
                 print(f"[网络] [{game_name}] 数据迁移失败: {e}")
 
         # 初始化数据库
-        conn = sqlite3.connect(db_path)
+        conn = connect(db_path)
         cursor = conn.cursor()
         
         # 确保表结构包含source字段
@@ -164,7 +167,6 @@ def fetch_team_odds(config, urls=None, force_refresh=False, max_attempts=3):
                 odds_b REAL,
                 source TEXT
             )''')
-            conn.commit()
             print(f"[网络] [{game_name}] 创建包含source字段的表结构")
         else:
             # 表结构已存在且包含source字段
@@ -178,12 +180,12 @@ def fetch_team_odds(config, urls=None, force_refresh=False, max_attempts=3):
                 odds_b REAL,
                 source TEXT
             )''')
-            conn.commit()
+        # 确保表带有比赛规范键列和索引
+        ensure_key_columns(conn, game_name)
 
         # 初始化WebDriver
         driver = setup_driver()
         if not driver:
-            conn.close()
             return -1, None
 
         # 重试机制，最多尝试max_attempts次
@@ -246,6 +248,8 @@ def fetch_team_odds(config, urls=None, force_refresh=False, max_attempts=3):
                 # 处理每个比赛数据
                 new_matches = []
                 match_summary = []
+                store_rows = []
+                now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 for i, (match_id, data) in enumerate(match_data.items()):
                     time_div = time_elements[i] if i < len(time_elements) else None
                     match_time, special_info = parse_time_element(time_div) if time_div else (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), None)
@@ -257,46 +261,56 @@ def fetch_team_odds(config, urls=None, force_refresh=False, max_attempts=3):
                         continue
 
                     # 使用带前缀的ID，确保web数据ID与小黑盒数据ID不冲突
-                    web_match_id = f"web_{match_id}"
-                    
-                    # 保存到web_matches.db，确保标记来源为web
-                    cursor.execute("SELECT match_id FROM matches WHERE match_id = ?", (web_match_id,))
-                    existing = cursor.fetchone()
-                    if existing:
-                        # 更新已有记录，包括所有信息（网站数据应完全更新，包括赔率）
-                        cursor.execute('''UPDATE matches SET 
-                            match_name = ?, match_time = ?, team_a = ?, team_b = ?, 
-                            odds_a = ?, odds_b = ?, source = ?
-                            WHERE match_id = ?''', 
-                            (match_name, match_time, data["team_a"], data["team_b"], 
-                            float(data["team_a_odds"]), float(data["team_b_odds"]), 
-                            "web", web_match_id))
-                        print(f"[网络] [{game_name}] 更新web记录: {web_match_id}")
-                    else:
-                        # 插入新记录，标记来源为web
-                        cursor.execute('''INSERT INTO matches (
-                            match_id, match_name, match_time, team_a, team_b, 
-                            odds_a, odds_b, source)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', 
-                            (web_match_id, match_name, match_time, data["team_a"], data["team_b"], 
-                            float(data["team_a_odds"]), float(data["team_b_odds"]), "web"))
-                        print(f"[网络] [{game_name}] 创建新web记录: {web_match_id}")
-                        
-                        # 添加到新比赛列表
-                        new_matches.append({
-                            "MatchId": web_match_id,
-                            "MatchName": match_name,
-                            "MatchTime": match_time,
-                            "TeamA": data["team_a"],
-                            "TeamB": data["team_b"],
-                            "TeamA_Odds": data["team_a_odds"],
-                            "TeamB_Odds": data["team_b_odds"]
-                        })
-                        
-                        # 收集信息用于汇总
-                        match_summary.append(f"{data['team_a']}({data['team_a_odds']}) vs {data['team_b']}({data['team_b_odds']}), 时间: {match_time}")
+                    store_rows.append({
+                        "match_id": f"web_{match_id}", "match_name": match_name, "match_time": match_time,
+                        "team_a": data["team_a"], "team_b": data["team_b"],
+                        "odds_a": float(data["team_a_odds"]), "odds_b": float(data["team_b_odds"]),
+                        "creation_time": now, "last_updated": now,
+                        "match_key": match_key(game_name, match_time, data["team_a"], data["team_b"]),
+                        "start_ts": start_ts(match_time)
+                    })
 
-                conn.commit()
+                # 保存到web_matches.db（标记来源为web）：一次查询找出已有记录，再在一个写事务内批量插入或更新
+                # 网站数据应完全更新，包括赔率
+                with write_transaction(db_path) as conn:
+                    ids = [row["match_id"] for row in store_rows]
+                    existing = {row[0] for row in conn.execute(
+                        f"SELECT match_id FROM matches WHERE match_id IN ({','.join('?' * len(ids))})", ids)}
+                    conn.executemany('''INSERT INTO matches (
+                        match_id, match_name, match_time, team_a, team_b, 
+                        odds_a, odds_b, source, match_key, start_ts)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, 'web', ?, ?)
+                        ON CONFLICT(match_id) DO UPDATE SET
+                            match_name = excluded.match_name, match_time = excluded.match_time,
+                            team_a = excluded.team_a, team_b = excluded.team_b,
+                            odds_a = excluded.odds_a, odds_b = excluded.odds_b, source = excluded.source,
+                            match_key = excluded.match_key, start_ts = excluded.start_ts''',
+                        [(row["match_id"], row["match_name"], row["match_time"], row["team_a"], row["team_b"],
+                          row["odds_a"], row["odds_b"], row["match_key"], row["start_ts"]) for row in store_rows])
+
+                for row in store_rows:
+                    if row["match_id"] in existing:
+                        print(f"[网络] [{game_name}] 更新web记录: {row['match_id']}")
+                        continue
+                    print(f"[网络] [{game_name}] 创建新web记录: {row['match_id']}")
+                    # 添加到新比赛列表
+                    new_matches.append({
+                        "MatchId": row["match_id"],
+                        "MatchName": match_name,
+                        "MatchTime": row["match_time"],
+                        "TeamA": row["team_a"],
+                        "TeamB": row["team_b"],
+                        "TeamA_Odds": row["odds_a"],
+                        "TeamB_Odds": row["odds_b"]
+                    })
+                    # 收集信息用于汇总
+                    match_summary.append(f"{row['team_a']}({row['odds_a']}) vs {row['team_b']}({row['odds_b']}), 时间: {row['match_time']}")
+
+                # 同时写入统一赔率库，并追加赔率历史（赔率未变化的比赛不写入）
+                store = OddsStore(config['fetch']['data_dir'])
+                store.upsert_matches(game_name, "web", store_rows, folder=match_name)
+                captured = int(time.time())
+                store.append_odds("web", [(row["match_key"], captured, row["odds_a"], row["odds_b"]) for row in store_rows])
                 cache[url] = new_matches  # 更新缓存
                 all_new_matches.extend(new_matches)
                 success = True
@@ -319,7 +333,6 @@ def fetch_team_odds(config, urls=None, force_refresh=False, max_attempts=3):
                     time.sleep(5)
 
         driver.quit()
-        conn.close()
         if not success:
             print(f"[网络] [{game_name}] 经过 {max_attempts} 次尝试仍失败")
             return -1, None
@@ -0,0 +1,118 @@
+# frame_diff.py
+from collections import namedtuple
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# similarity: 零偏移下两帧的相似度(0-1)
+# offset: 估计的纵向滚动偏移（正值表示内容向上移动，即 img2[y] ≈ img1[y + offset]）
+# aligned_similarity: 按估计偏移对齐后的相似度
+FrameComparison = namedtuple("FrameComparison", ["similarity", "offset", "aligned_similarity"])
+
+def row_signature(img, region=None, col_step=8):
+    """
+    计算行签名：对每行按列抽样后做通道平均，得到 (行数, 列数/col_step) 的float32矩阵
+    region: (y0, y1) 只使用指定行范围（如列表滚动区域，排除固定的顶栏和底栏）
+    """
+    if region is not None:
+        img = img[region[0]:region[1]]
+    sampled = img[:, ::col_step]
+    if sampled.ndim == 3:
+        # 逐通道累加比 mean(axis=2) 在跨步视图上快一个数量级
+        signature = sampled[:, :, 0].astype(np.float32)
+        for channel in range(1, min(sampled.shape[2], 3)):
+            signature += sampled[:, :, channel]
+        return signature / min(sampled.shape[2], 3)
+    return sampled.astype(np.float32)
+
+def _profile_distances(profile1, profile2, max_shift):
+    """在固定重叠长度下，向量化计算所有候选偏移的平均绝对差"""
+    length = len(profile1) - max_shift
+    # 正偏移：profile2[0:L] 对齐 profile1[s:s+L]
+    forward = np.abs(sliding_window_view(profile1, length) - profile2[:length]).mean(axis=1)
+    # 负偏移：profile1[0:L] 对齐 profile2[s:s+L]
+    backward = np.abs(sliding_window_view(profile2, length) - profile1[:length]).mean(axis=1)
+    shifts = np.concatenate([np.arange(0, max_shift + 1), -np.arange(1, max_shift + 1)])
+    return shifts, np.concatenate([forward, backward[1:]])
+
+def _aligned_mad(sig1, sig2, shift):
+    """按偏移对齐两个行签名后计算平均绝对差"""
+    if shift >= 0:
+        a, b = sig1[shift:], sig2[:len(sig2) - shift]
+    else:
+        a, b = sig1[:len(sig1) + shift], sig2[-shift:]
+    if len(a) == 0:
+        return 255.0
+    return float(np.abs(a - b).mean())
+
+def compare_frames(img1, img2, region=None, max_shift=None, col_step=8, candidates=3):
+    """
+    比较两帧截图，返回相似度和估计的纵向滚动偏移
+    1. 先比较稀疏抽样的像素，完全相同时立即返回（静止画面仅需极少的计算）
+    2. 否则计算行签名，用行均值曲线粗搜所有偏移，再用完整行签名复核最优的几个候选
+    所有计算都在抽样后的float32数据上进行，不会出现uint8相减溢出
+    """
+    if img1 is None or img2 is None or img1.shape != img2.shape:
+        return FrameComparison(0.0, 0, 0.0)
+
+    view1 = img1[region[0]:region[1]] if region is not None else img1
+    view2 = img2[region[0]:region[1]] if region is not None else img2
+
+    # 提前退出：稀疏抽样与较密抽样依次比较，全部一致则视为静止
+    if np.array_equal(view1[::32, ::32], view2[::32, ::32]) and \
+            np.array_equal(view1[::4, ::col_step], view2[::4, ::col_step]):
+        return FrameComparison(1.0, 0, 1.0)
+
+    sig1 = row_signature(view1, col_step=col_step)
+    sig2 = row_signature(view2, col_step=col_step)
+    rows = sig1.shape[0]
+    similarity = 1.0 - _aligned_mad(sig1, sig2, 0) / 255.0
+
+    if max_shift is None:
+        max_shift = rows * 3 // 4
+    max_shift = min(max_shift, rows - 1)
+    if max_shift <= 0:
+        return FrameComparison(similarity, 0, similarity)
+
+    shifts, distances = _profile_distances(sig1.mean(axis=1), sig2.mean(axis=1), max_shift)
+    best = shifts[np.argsort(distances, kind="stable")[:candidates]]
+    scored = [(_aligned_mad(sig1, sig2, int(shift)), int(shift)) for shift in best]
+    if 0 not in best:
+        scored.append(((1.0 - similarity) * 255.0, 0))
+    mad, offset = min(scored, key=lambda item: (item[0], abs(item[1])))
+    return FrameComparison(similarity, offset, 1.0 - mad / 255.0)
+
+def changed_region(img1, img2, threshold=24, step=2, min_count=2, pad=4):
+    """
+    计算两帧之间发生变化的外接矩形（如点击后弹出的窗口）
+    在步长为 step 的抽样网格上比较各通道的最大绝对差（cv2.absdiff 饱和计算，不会溢出），
+    变化像素数不少于 min_count 的行/列才计入，避免零星噪点撑大范围
+    返回: (x, y, w, h)，按 pad 像素外扩并裁剪到图像范围内；无变化或尺寸不同时返回None
+    """
+    if img1 is None or img2 is None or img1.shape != img2.shape:
+        return None
+    diff = cv2.absdiff(img1[::step, ::step], img2[::step, ::step])
+    if diff.ndim == 3:
+        # 逐通道取最大值比 max(axis=2) 快
+        channels = diff.shape[2]
+        diff = np.maximum(np.maximum(diff[:, :, 0], diff[:, :, 1 % channels]), diff[:, :, 2 % channels])
+    mask = diff > threshold
+    rows = np.flatnonzero(mask.sum(axis=1) >= min_count)
+    cols = np.flatnonzero(mask.sum(axis=0) >= min_count)
+    if len(rows) == 0 or len(cols) == 0:
+        return None
+    height, width = img1.shape[:2]
+    x0 = max(0, cols[0] * step - pad)
+    y0 = max(0, rows[0] * step - pad)
+    x1 = min(width, (cols[-1] + 1) * step + pad)
+    y1 = min(height, (rows[-1] + 1) * step + pad)
+    return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+def intersect_rois(roi, region):
+    """两个 (x, y, w, h) 区域的交集，不相交时返回None"""
+    x0, y0 = max(roi[0], region[0]), max(roi[1], region[1])
+    x1 = min(roi[0] + roi[2], region[0] + region[2])
+    y1 = min(roi[1] + roi[3], region[1] + region[3])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return [x0, y0, x1 - x0, y1 - y0]
@@ -0,0 +1,72 @@
+# frame_index.py
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+# box: 整帧坐标下的四点框
+# text: 识别文本
+# score: 识别置信度
+# center: 框中心 (x, y)
+TextItem = namedtuple("TextItem", ["box", "text", "score", "center"])
+
+class FrameOCR:
+    """
+    单帧OCR结果索引：对感兴趣区域做一次检测+识别，文本框按中心纵坐标排序，
+    区域查询用二分定位行范围后再按横坐标过滤，同一帧上的多次区域检查无需重复推理
+    """
+    def __init__(self, items, frame=None, region=None):
+        """
+        items: TextItem 列表
+        frame: 建立索引所用的截图（用于判断画面是否变化后能否复用）
+        region: 建立索引时识别的区域 [x, y, w, h]
+        """
+        self.items = sorted(items, key=lambda item: item.center[1])
+        self.ys = [item.center[1] for item in self.items]
+        self.frame = frame
+        self.region = region
+
+    @classmethod
+    def from_result(cls, result, frame=None, region=None):
+        """由PaddleOCR格式的 [box, (text, score)] 列表（整帧坐标）建立索引"""
+        items = []
+        for entry in result or []:
+            if not entry or len(entry) < 2 or len(entry[1]) == 0:
+                continue
+            box = entry[0]
+            center = (sum(p[0] for p in box) / len(box), sum(p[1] for p in box) / len(box))
+            items.append(TextItem(box, str(entry[1][0]), float(entry[1][1]), center))
+        return cls(items, frame, region)
+
+    def __len__(self):
+        return len(self.items)
+
+    def covers(self, roi):
+        """区域是否完全位于建立索引时识别的范围内"""
+        if self.region is None:
+            return True
+        x, y, w, h = roi
+        rx, ry, rw, rh = self.region
+        return x >= rx and y >= ry and x + w <= rx + rw and y + h <= ry + rh
+
+    def query(self, roi):
+        """返回中心落在区域 [x, y, w, h] 内的文本项，按纵坐标排序"""
+        x, y, w, h = roi
+        start = bisect_left(self.ys, y)
+        end = bisect_right(self.ys, y + h)
+        return [item for item in self.items[start:end] if x <= item.center[0] <= x + w]
+
+    def find(self, text, roi=None):
+        """查找包含指定文字的文本项，roi 限定查找区域；未找到返回None"""
+        candidates = self.query(roi) if roi is not None else self.items
+        return next((item for item in candidates if text in item.text), None)
+
+    def find_all(self, text, roi=None):
+        """查找所有包含指定文字的文本项"""
+        candidates = self.query(roi) if roi is not None else self.items
+        return [item for item in candidates if text in item.text]
+
+    @staticmethod
+    def bounds(item):
+        """文本项的外接矩形 [x, y, w, h]"""
+        xs = [point[0] for point in item.box]
+        ys = [point[1] for point in item.box]
+        return [int(min(xs)), int(min(ys)), int(max(xs) - min(xs)), int(max(ys) - min(ys))]
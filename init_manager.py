@@ -4,7 +4,9 @@ import yaml
 import subprocess
 import time
 import logging
-from paddleocr import PaddleOCR
+import threading
+from concurrent.futures import Future
+from ocr_backend import create_ocr_backend
 from maa.toolkit import Toolkit
 from maa.controller import AdbController
 from maa.define import MaaAdbScreencapMethodEnum, MaaAdbInputMethodEnum
@@ -13,9 +15,12 @@ class InitManager:
     """
     初始化管理器：负责系统启动流程，包括加载配置、启动模拟器、连接ADB、初始化OCR和启动小黑盒应用
     """
-    def __init__(self, config_path='config.yaml'):
-        """初始化配置"""
-        self.config = self.load_config(config_path)
+    def __init__(self, config_path='config.yaml', config=None):
+        """初始化配置：可直接传入已加载的配置（如分片运行时按模拟器改写过的配置）"""
+        self.config = config if config is not None else self.load_config(config_path)
+        self.controller = None
+        self.ocr = None
+        self.ocr_future = None  # 后台加载OCR模型的Future
 
     def load_config(self, config_path):
         """从YAML文件加载配置"""
@@ -29,28 +34,96 @@ class InitManager:
             exit(1)
 
     def initialize_ocr(self):
-        """初始化OCR模型：加载PaddleOCR模型用于识别界面文本"""
-        resource_path = self.config['resource']['path']
-        self.ocr = PaddleOCR(
-            use_angle_cls=False, lang="ch",
-            det_model_dir=None, rec_model_dir=None,
-            det_onnx_file=os.path.join(resource_path, self.config['resource']['det_model_path']),
-            rec_onnx_file=os.path.join(resource_path, self.config['resource']['rec_model_path']),
-            rec_char_dict_path=os.path.join(resource_path, self.config['resource']['charset_path']),
-            show_log=False
-        )
-        print("[初始化] OCR模型初始化成功")
+        """
+        初始化OCR模型：按配置 resource.backend 选择后端（paddle - PaddleOCR封装；
+        onnx - 直接驱动onnxruntime），两者均加载 ppocr_v4 下的检测/识别模型
+        """
+        self.ocr = create_ocr_backend(self.config)
+        print(f"[初始化] OCR模型初始化成功（{self.ocr.name} 后端）")
         return self.ocr
 
-    def start_emulator(self):
-        """启动模拟器：调用配置中指定的模拟器路径启动模拟器"""
+    def load_ocr_async(self, force=False):
+        """
+        在后台线程加载OCR模型，模拟器启动期间同时进行；已加载或正在加载时直接复用，上次加载失败时重新加载
+        返回: Future，结果为OCR后端实例
+        """
+        if self.ocr_future is not None and not force:
+            return self.ocr_future
+        future = Future()
+        if self.ocr is not None and not force:
+            future.set_result(self.ocr)
+            self.ocr_future = future
+            return future
+
+        def load():
+            try:
+                future.set_result(self.initialize_ocr())
+            except Exception as e:
+                # 加载失败时不保留该Future，之后的调用重新加载
+                if self.ocr_future is future:
+                    self.ocr_future = None
+                future.set_exception(e)
+
+        self.ocr_future = future
+        threading.Thread(target=load, name="ocr-loader", daemon=True).start()
+        return future
+
+    @property
+    def adb_address(self):
+        return f"127.0.0.1:{self.config['adb']['port']}"
+
+    def adb(self, *args, timeout=5):
+        """执行ADB命令，返回标准输出；失败或超时返回空字符串"""
+        try:
+            result = subprocess.run([self.config['adb']['path'], *args], capture_output=True,
+                                    text=True, timeout=timeout)
+            return result.stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    def device_ready(self):
+        """模拟器是否已启动完成：ADB可连接且系统启动完成"""
+        if "connected" not in self.adb("connect", self.adb_address):
+            return False
+        return self.adb("-s", self.adb_address, "shell", "getprop", "sys.boot_completed") == "1"
+
+    def app_running(self):
+        """小黑盒应用进程是否存在"""
+        return bool(self.adb("-s", self.adb_address, "shell", "pidof", self.config['package_name']))
+
+    def poll(self, predicate, timeout, interval=1.0):
+        """轮询直到条件成立或超时，返回是否成立"""
+        deadline = time.time() + timeout
+        while True:
+            if predicate():
+                return True
+            if time.time() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def start_emulator(self, force=False):
+        """
+        启动模拟器：已在运行时直接复用；否则调用配置中指定的模拟器路径启动，
+        并轮询ADB直到系统启动完成（wait_seconds 为等待上限）
+        """
+        if not force and self.device_ready():
+            print("[初始化] 模拟器已在运行，跳过启动")
+            return
         command = f'"{self.config["emulator"]["path"]}" {self.config["emulator"]["add_command"]}'
         subprocess.Popen(command, shell=True)
-        print(f"[初始化] 启动模拟器 MuMu Player 12，等待 {self.config['emulator']['wait_seconds']} 秒...")
-        time.sleep(self.config['emulator']['wait_seconds'])
+        wait_seconds = self.config['emulator']['wait_seconds']
+        print(f"[初始化] 启动模拟器 MuMu Player 12，最多等待 {wait_seconds} 秒...")
+        start = time.time()
+        if self.poll(self.device_ready, wait_seconds):
+            print(f"[初始化] 模拟器启动完成，耗时 {time.time() - start:.1f} 秒")
+        else:
+            print(f"[初始化] 等待 {wait_seconds} 秒后模拟器仍未就绪，继续尝试连接")
 
-    def connect_adb(self):
-        """连接ADB：建立与模拟器的ADB连接，用于后续的界面控制"""
+    def connect_adb(self, force=False):
+        """连接ADB：建立与模拟器的ADB连接，用于后续的界面控制；已连接时直接复用"""
+        if not force and self.controller is not None and self.controller.connected:
+            print("[初始化] ADB已连接，复用现有连接")
+            return self.controller
         Toolkit.init_option("./")
         if not os.path.exists(self.config['adb']['path']):
             print(f"[初始化] ADB文件不存在: {self.config['adb']['path']}")
@@ -79,23 +152,41 @@ class InitManager:
         print("[初始化] ADB连接失败")
         exit(1)
 
-    def launch_app(self):
-        """启动应用：通过ADB命令启动小黑盒应用"""
+    def launch_app(self, timeout=15):
+        """启动应用：通过ADB命令启动（或切回前台）小黑盒应用，并轮询等待应用进程就绪"""
+        was_running = self.app_running()
         app_job = self.controller.post_start_app(self.config['package_name'])
         app_job.wait()
-        print(f"[初始化] 已启动小黑盒应用 {self.config['package_name']}")
+        if was_running:
+            print(f"[初始化] 小黑盒应用已在运行，切换到前台 {self.config['package_name']}")
+            return
+        if self.poll(self.app_running, timeout, interval=0.5):
+            print(f"[初始化] 已启动小黑盒应用 {self.config['package_name']}")
+        else:
+            print(f"[初始化] {timeout} 秒内未检测到小黑盒应用进程，继续执行")
 
-    def initialize_all(self):
-        """执行完整的初始化流程：启动模拟器 -> 连接ADB -> 启动应用 -> 初始化OCR"""
+    def initialize_all(self, with_ocr=True, force=False):
+        """
+        执行完整的初始化流程：后台加载OCR模型的同时 启动模拟器 -> 连接ADB -> 启动应用，
+        最后等待OCR模型加载完成
+        可重复调用：已运行的模拟器、已建立的ADB连接和已加载的模型会被复用，
+        导航失败后的恢复只需切回应用
+        with_ocr: 是否在本进程加载OCR模型（使用OCR服务进程池时为False，返回的ocr为None）
+        force: 忽略已有状态，重新启动模拟器、重新连接并重新加载模型
+        """
         print("[初始化] 开始完整初始化流程...")
-        self.start_emulator()
+        ocr_future = self.load_ocr_async(force=force) if with_ocr else None
+        self.start_emulator(force=force)
         try:
-            self.connect_adb()
+            self.connect_adb(force=force)
         except Exception as e:
             print(f"[初始化] ADB连接失败: {e}")
             raise
         self.launch_app()
-        self.initialize_ocr()
+        if ocr_future is None:
+            print("[初始化] 初始化流程完成（未加载OCR模型），返回controller实例")
+            return self.controller, None
+        self.ocr = ocr_future.result()
         print("[初始化] 初始化流程完成，返回controller和ocr实例")
         return self.controller, self.ocr
     
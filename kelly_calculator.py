@@ -14,11 +14,13 @@ logging：用于记录错误日志, class KellyCalculator:
 四舍五入到最近的百位：round(COINS / 100) * 100'''
 
 import os
-import sqlite3
 import logging
 import glob
 from datetime import datetime
 import math
+from db_manager import connect, read_only, write_transaction, close_all
+from odds_store import OddsStore
+from match_key import match_key
 
 # 设置日志
 logging.basicConfig(
@@ -136,6 +138,15 @@ class KellyCalculator:
             logger.error(f"游戏目录不存在: {game_folder}")
             return []
         
+        # 该游戏项目已迁移到统一赔率库时，一次带索引的查询完成配对
+        store = OddsStore(self.data_dir)
+        if store.is_migrated(game_name):
+            all_match_data = [{"web_match": web_match, "lbb_match": lbb_match, "match_dir": os.path.join(game_folder, folder)}
+                              for web_match, lbb_match, folder in store.paired_matches(game_name)]
+            logger.info(f"从统一赔率库配对 {len(all_match_data)} 场比赛")
+            return all_match_data
+        
+        # 兼容旧目录结构：逐个比赛目录读取数据库
         # 搜索所有的比赛文件夹
         match_dirs = [d for d in os.listdir(game_folder) if os.path.isdir(os.path.join(game_folder, d)) and not d.startswith('.')]
         logger.info(f"找到 {len(match_dirs)} 个比赛目录")
@@ -161,14 +172,13 @@ class KellyCalculator:
             # 从web_matches.db读取数据
             web_matches = []
             if os.path.exists(web_db_path):
-                conn = sqlite3.connect(web_db_path)
-                cursor = conn.cursor()
                 try:
-                    cursor.execute("""
-                        SELECT match_id, match_name, match_time, team_a, team_b, odds_a, odds_b
-                        FROM matches
-                    """)
-                    for row in cursor.fetchall():
+                    with read_only(web_db_path) as conn:
+                        rows = conn.execute("""
+                            SELECT match_id, match_name, match_time, team_a, team_b, odds_a, odds_b
+                            FROM matches
+                        """).fetchall()
+                    for row in rows:
                         match_id, match_name, match_time, team_a, team_b, odds_a, odds_b = row
                         web_matches.append({
                             "match_id": match_id,
@@ -181,20 +191,17 @@ class KellyCalculator:
                         })
                 except Exception as e:
                     logger.error(f"读取 {web_db_path} 失败: {e}")
-                finally:
-                    conn.close()
             
             # 从lbb_matches.db读取数据
             lbb_matches = []
             if os.path.exists(lbb_db_path):
-                conn = sqlite3.connect(lbb_db_path)
-                cursor = conn.cursor()
                 try:
-                    cursor.execute("""
-                        SELECT match_id, match_name, match_time, team_a, team_b, odds_a, odds_b
-                        FROM matches
-                    """)
-                    for row in cursor.fetchall():
+                    with read_only(lbb_db_path) as conn:
+                        rows = conn.execute("""
+                            SELECT match_id, match_name, match_time, team_a, team_b, odds_a, odds_b
+                            FROM matches
+                        """).fetchall()
+                    for row in rows:
                         match_id, match_name, match_time, team_a, team_b, odds_a, odds_b = row
                         lbb_matches.append({
                             "match_id": match_id,
@@ -207,33 +214,38 @@ class KellyCalculator:
                         })
                 except Exception as e:
                     logger.error(f"读取 {lbb_db_path} 失败: {e}")
-                finally:
-                    conn.close()
             
-            # 匹配web和lbb数据
+            # 匹配web和lbb数据：按比赛规范键（同一天、同两支队伍，不考虑顺序）等值查找
+            lbb_by_key = {}
+            for lbb_match in lbb_matches:
+                key = match_key(game_name, lbb_match["match_time"], lbb_match["team_a"], lbb_match["team_b"])
+                lbb_by_key.setdefault(key, lbb_match)  # 同一键只取第一条
             matched_pairs = []
             for web_match in web_matches:
-                web_date = web_match["match_time"].split()[0]  # 只比较日期部分
-                web_teams = {web_match["team_a"].lower(), web_match["team_b"].lower()}
-                
-                for lbb_match in lbb_matches:
-                    lbb_date = lbb_match["match_time"].split()[0]  # 只比较日期部分
-                    lbb_teams = {lbb_match["team_a"].lower(), lbb_match["team_b"].lower()}
-                    
-                    # 如果日期相同且队伍匹配（不考虑顺序）
-                    if web_date == lbb_date and web_teams == lbb_teams:
-                        matched_pairs.append({
-                            "web_match": web_match,
-                            "lbb_match": lbb_match,
-                            "match_dir": match_path
-                        })
-                        break  # 找到匹配项后继续下一个web_match
+                key = match_key(game_name, web_match["match_time"], web_match["team_a"], web_match["team_b"])
+                if key in lbb_by_key:
+                    matched_pairs.append({
+                        "web_match": web_match,
+                        "lbb_match": lbb_by_key[key],
+                        "match_dir": match_path
+                    })
             
             all_match_data.extend(matched_pairs)
         
         logger.info(f"成功配对 {len(all_match_data)} 场比赛")
         return all_match_data
     
+    def _write_kelly_rows(self, kelly_db_path, rows):
+        """在一个写事务中批量写入凯利计算结果"""
+        with write_transaction(kelly_db_path) as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO kelly_results 
+                (match_id, match_name, match_time, team_a, team_b, 
+                 web_odds_a, web_odds_b, lbb_odds_a, lbb_odds_b,
+                 kelly_a, kelly_b, coins_a, coins_b, match_dir, calculation_time) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+    
     def save_kelly_data(self, game_name, match_data):
         """
         保存计算结果到数据库
@@ -249,8 +261,7 @@ class KellyCalculator:
         kelly_db_path = os.path.join(game_folder, "kelly_results.db")
         
         try:
-            conn = sqlite3.connect(kelly_db_path)
-            cursor = conn.cursor()
+            cursor = connect(kelly_db_path).cursor()
             
             # 创建表（如果不存在）
             cursor.execute("""
@@ -275,6 +286,8 @@ class KellyCalculator:
             
             calculation_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             count = 0
+            rows = []
+            results = []
             
             for match in match_data:
                 try:
@@ -317,14 +330,8 @@ class KellyCalculator:
                     coins_a = self.calculate_coins(kelly_a)
                     coins_b = self.calculate_coins(kelly_b)
                     
-                    # 保存结果
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO kelly_results 
-                        (match_id, match_name, match_time, team_a, team_b, 
-                         web_odds_a, web_odds_b, lbb_odds_a, lbb_odds_b,
-                         kelly_a, kelly_b, coins_a, coins_b, match_dir, calculation_time) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
+                    # 保存结果（整批在一个写事务中写入）
+                    rows.append((
                         match_id, match_name, match_time,
                         team_a, team_b, 
                         web_odds_a, web_odds_b,
@@ -333,13 +340,21 @@ class KellyCalculator:
                         coins_a, coins_b,
                         match_dir, calculation_time
                     ))
+                    results.append({
+                        "match_id": match_id, "match_name": match_name, "match_time": match_time,
+                        "team_a": team_a, "team_b": team_b,
+                        "web_odds_a": web_odds_a, "web_odds_b": web_odds_b,
+                        "lbb_odds_a": lbb_odds_a, "lbb_odds_b": lbb_odds_b,
+                        "kelly_a": kelly_a, "kelly_b": kelly_b, "coins_a": coins_a, "coins_b": coins_b,
+                        "match_dir": match_dir, "calculation_time": calculation_time
+                    })
                     count += 1
                 except Exception as e:
                     logger.error(f"保存比赛 {match['match_id']} 结果时出错: {str(e)}")
             
-            conn.commit()
-            conn.close()
-            
+            self._write_kelly_rows(kelly_db_path, rows)
+            # 同时写入统一赔率库
+            OddsStore(self.data_dir).save_kelly_results(game_name, results)
             logger.info(f"已保存 {count} 条凯利计算结果到 {kelly_db_path}")
             return count
             
@@ -417,6 +432,8 @@ def main():
         
     except Exception as e:
         logger.error(f"计算凯利值时出错: {str(e)}")
+    finally:
+        close_all()
 
 if __name__ == "__main__":
     main()
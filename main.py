@@ -1,128 +1,157 @@
 # main.py - 主程序，协调整个系统的运行流程
 import traceback
-import numpy as np
 import os
 import time
+from contextlib import nullcontext
 from init_manager import InitManager
 from screen_manager import ScreenManager
 from data_manager import DataManager
 from fetch_odds import fetch_team_odds
 from team_match import match_teams_and_names, replace_team_and_match_name
+from ocr_server import OCRServer
+from page_classifier import PageClassifier
+from card_store import CardStore
+from ocr_backend import FIELD_CHARSETS
+from db_manager import close_all
 
-def main():
-    """
-    主函数，协调整个系统的运行：
-    1. 加载配置并初始化系统
-    2. 导航到小黑盒的赛事中心
-    3. 顺序处理每个游戏项目的数据
-    4. 整合网络数据和小黑盒数据
-    5. 保存最终结果到数据库
-    """
-    # 加载配置文件
-    with open('config.yaml', 'r', encoding='utf-8') as f:
+def load_config(config_path='config.yaml'):
+    """加载配置文件"""
+    with open(config_path, 'r', encoding='utf-8') as f:
         import yaml
         config = yaml.safe_load(f)
     print("[主程序] 已加载配置文件")
+    return config
 
-    # 获取需要跳过的游戏列表
-    skip_games = config.get('skip_games', [])
-    if skip_games:
-        print(f"[主程序] 将跳过以下游戏: {skip_games}")
-    
-    # 初始化系统组件
-    print("[主程序] 开始系统初始化...")
-    init = InitManager()
-    controller, ocr = init.initialize_all()
-    screen_mgr = ScreenManager(controller, ocr)
-    data_mgr = DataManager(init.config)
-    print("[主程序] 系统初始化完成")
+def create_screen_manager(config, controller, ocr):
+    """按配置创建屏幕管理器"""
+    screen_config = config.get('screen', {})
+    card_ttl = screen_config.get('card_cache_ttl', 0)
+    card_store = CardStore(config['fetch']['data_dir'], ttl=card_ttl) if card_ttl > 0 else None
+    # 受限解码的字段类型，如 [odds, time]（仅onnx后端生效）
+    fields = config.get('resource', {}).get('restricted_fields', [])
+    field_charsets = {field: FIELD_CHARSETS[field] for field in fields if field in FIELD_CHARSETS}
+    unsupported = [field for field in fields if field not in FIELD_CHARSETS]
+    if unsupported:
+        print(f"[主程序] 以下字段不支持受限解码，按完整字典识别: {unsupported}")
+    screen_mgr = ScreenManager(controller, ocr, scan_mode=screen_config.get('scan_mode', 'fixed'),
+                               card_store=card_store, field_charsets=field_charsets)
+    if screen_config.get('background_capture', False):
+        screen_mgr.start_capture(ring_size=screen_config.get('capture_ring_size', 4))
+    return screen_mgr
 
-    # 导航到正确位置（赛事中心）
-    print("[主程序] 等待5秒后开始导航到赛事中心...")
-    time.sleep(5)
-    checks = [
-        {"roi": [597, 1052, 59, 37], "text": "刷新"},
-        {"roi": [462, 1180, 82, 88], "text": "游戏库"},
-        {"roi": [370, 270, 105, 45], "text": "赛事中心"}
-    ]
+def start_ocr_server(config, num_clients=1):
+    """按配置启动OCR服务进程池，未配置工作进程数时返回None（在本进程加载模型）"""
+    workers = config.get('ocr_server', {}).get('workers', 0)
+    if workers <= 0:
+        return None
+    return OCRServer(config, num_workers=workers, num_clients=num_clients).start()
+
+def select_default_game(screen_mgr):
+    """已在刷新页面：点击刷新并选择默认游戏（CS2）"""
+    print("[主程序] 已在刷新页面，点击刷新并选择CS2")
+    screen_mgr.refresh()
+    screen_mgr.wait_until_stable(10, label="导航刷新")
+    reference = screen_mgr.grab_frame()
+    screen_mgr.click(80, 135)  # 选择默认游戏
+    screen_mgr.wait_until_stable(5, reference=reference, label="选择默认游戏")
+
+def navigate_to_event_center(init, screen_mgr, classifier=None):
+    """
+    导航到正确位置（赛事中心）
+    classifier: 页面分类器，指纹库可用时先用单帧分类判断页面并按路径点击，
+    无法判断时回退到逐个检查界面元素
+    """
+    classifier = classifier if classifier is not None else PageClassifier()
+    print("[主程序] 等待画面稳定（最多5秒）后开始导航到赛事中心...")
+    screen_mgr.wait_until_stable(5, label="启动后")
     for attempt in range(3):
         print(f"[主程序] 导航尝试 {attempt+1}/3")
-        controller.post_screencap().wait()
-        image = controller.cached_image
-        if image is None or image.size == 0:
+        img_np = screen_mgr.grab_frame()
+        if img_np is None:
             print("[主程序] 截图失败")
             break
-        img_np = np.array(image)
+
+        # 单帧页面分类：一次指纹比对得到当前页面和到达赛事中心的点击路径
+        page, score = classifier.classify(img_np)
+        route = classifier.route(page)
+        if route is not None:
+            print(f"[主程序] 页面分类: {page}（得分 {score:.3f}），点击路径: {route}")
+            if not route:
+                select_default_game(screen_mgr)
+                break
+            reference = img_np
+            for name in route:
+                screen_mgr.click_roi(screen_mgr.anchors.get(name)["roi"])
+                reference = screen_mgr.wait_until_stable(3, reference=reference, label=f"导航点击{name}")
+            continue
         
-        # 检查是否已在刷新页面
-        if screen_mgr.check_text_in_roi(img_np, checks[0]["roi"], "刷新"):
-            print("[主程序] 已在刷新页面，点击刷新并选择CS2")
-            screen_mgr.refresh()
-            time.sleep(10)
-            screen_mgr.controller.post_click(80, 135).wait()  # 选择默认游戏
-            time.sleep(5)
+        # 检查是否已在刷新页面（界面元素优先模板匹配，未命中时回退到OCR）
+        if screen_mgr.find_anchor(img_np, "refresh"):
+            select_default_game(screen_mgr)
             break
             
         # 检查并导航到赛事中心
-        if screen_mgr.check_text_in_roi(img_np, checks[2]["roi"], "赛事中心"):
+        event_center = screen_mgr.find_anchor(img_np, "event_center")
+        if event_center:
             print("[主程序] 发现赛事中心按钮，点击进入")
-            screen_mgr.click_roi(checks[2]["roi"])
-            time.sleep(3)
+            screen_mgr.click_roi(event_center)
+            screen_mgr.wait_until_stable(3, reference=img_np, label="进入赛事中心")
             continue
             
         # 检查并导航到游戏库
-        if screen_mgr.check_text_in_roi(img_np, checks[1]["roi"], "游戏库"):
+        game_library = screen_mgr.find_anchor(img_np, "game_library")
+        if game_library:
             print("[主程序] 发现游戏库按钮，点击进入")
-            screen_mgr.click_roi(checks[1]["roi"])
-            time.sleep(3)
+            screen_mgr.click_roi(game_library)
+            screen_mgr.wait_until_stable(3, reference=img_np, label="进入游戏库")
             continue
             
-        # 如果都没找到，重新初始化
+        # 如果都没找到，重新初始化（复用已运行的模拟器和ADB连接，只将应用切回前台）
         print("[主程序] 未找到导航元素，重新初始化")
-        # 第三次尝试前，延长等待时间
+        # 屏幕管理器已持有OCR模型，重新初始化时无需再次加载
+        init.initialize_all(with_ocr=False)
+        # 第三次尝试前，延长等待上限，画面稳定后提前继续
         if attempt == 2:
-            print("[主程序] 第三次尝试前延长等待时间到15秒")
-            time.sleep(15)
+            print("[主程序] 第三次尝试前最多等待15秒画面稳定")
+            screen_mgr.wait_until_stable(15, label="重新初始化")
         else:
-            time.sleep(3)
-        init.initialize_all()
+            screen_mgr.wait_until_stable(3, label="重新初始化")
 
-    # 顺序处理每个游戏项目
-    event_list = list(config['urls']['games'].keys())
-    print(f"[主程序] 开始处理 {len(event_list)} 个游戏项目: {event_list}")
-    
-    for event_name in event_list:
-        # 检查是否跳过当前游戏
-        if event_name in skip_games:
-            print(f"[主程序] 跳过 {event_name}（配置中指定）")
-            continue
+def process_game(config, screen_mgr, data_mgr, event_name, save_lock=None):
+    """
+    处理单个游戏项目：获取网络数据和小黑盒数据，匹配并替换标准化名称后保存
+    save_lock: 可选的锁，多个进程共用数据目录时用于串行化数据库写入
+    返回: bool - 是否成功保存数据
+    """
+    print(f"\n[主程序] ===== 开始处理游戏: {event_name} =====")
+    try:
+        # 1. 获取网络数据（不依赖结果执行后续逻辑）
+        print(f"[主程序] 获取 {event_name} 网络数据")
+        status, web_data = fetch_team_odds(
+            config, 
+            {event_name: config['urls']['games'][event_name]}
+        )
+        if status != 0 or not web_data:
+            print(f"[主程序] [{event_name}] 网络数据获取失败或为空，使用本地数据继续")
+        # 用最新的网络队伍名称重建队伍词典，供识别时纠正队伍名称
+        data_mgr.get_team_lexicon(event_name, refresh=True)
+
+        # 2. 获取小黑盒界面数据（60秒超时）
+        print(f"[主程序] 获取 {event_name} 小黑盒界面数据（最多60秒）")
+        start_time = time.time()
+        lbb_data = None
+        while time.time() - start_time < 60:
+            lbb_data = screen_mgr.fetch_lbb_data(data_mgr, event_name)
+            if lbb_data:
+                print(f"[主程序] 成功获取 {len(lbb_data)} 条小黑盒数据")
+                break
+            time.sleep(1)
             
-        print(f"\n[主程序] ===== 开始处理游戏: {event_name} =====")
-        try:
-            # 1. 获取网络数据（不依赖结果执行后续逻辑）
-            print(f"[主程序] 获取 {event_name} 网络数据")
-            status, web_data = fetch_team_odds(
-                config, 
-                {event_name: config['urls']['games'][event_name]}
-            )
-            if status != 0 or not web_data:
-                print(f"[主程序] [{event_name}] 网络数据获取失败或为空，使用本地数据继续")
-
-            # 2. 获取小黑盒界面数据（60秒超时）
-            print(f"[主程序] 获取 {event_name} 小黑盒界面数据（最多60秒）")
-            start_time = time.time()
-            lbb_data = None
-            while time.time() - start_time < 60:
-                lbb_data = screen_mgr.fetch_lbb_data(data_mgr, event_name)
-                if lbb_data:
-                    print(f"[主程序] 成功获取 {len(lbb_data)} 条小黑盒数据")
-                    break
-                time.sleep(1)
-                
-            if not lbb_data:
-                print(f"[主程序] [{event_name}] 60秒内未能获取小黑盒数据，跳过处理")
-                continue
+        if not lbb_data:
+            print(f"[主程序] [{event_name}] 60秒内未能获取小黑盒数据，跳过处理")
+            return False
 
+        with save_lock if save_lock is not None else nullcontext():
             # 3. 匹配队伍和比赛名称，并替换标准化名称
             match_folder = os.path.join(config['fetch']['data_dir'], event_name)
             print(f"[主程序] 处理游戏: {event_name}, 路径: {match_folder}")
@@ -138,20 +167,67 @@ def main():
             
             # 4. 保存处理后的数据到数据库
             print(f"[主程序] 保存 {event_name} 的 {len(lbb_data)} 条处理后数据")
-            for match in lbb_data:
-                if "match_id" in match:
-                    match_id = match["match_id"]
-                    data_mgr.save_to_sqlite(event_name, match["match_name"], match, match_id=match_id)
-                else:
-                    data_mgr.save_to_sqlite(event_name, match["match_name"], match)
-            
-            print(f"[主程序] 完成 {event_name} 的数据处理")
+            data_mgr.save_many(event_name, lbb_data)
+        
+        print(f"[主程序] 完成 {event_name} 的数据处理")
+        return True
+
+    except Exception as e:
+        print(f"[主程序] [{event_name}] 处理过程中发生错误: {str(e)}")
+        print(traceback.format_exc())
+        return False
+
+def main():
+    """
+    主函数，协调整个系统的运行：
+    1. 加载配置并初始化系统
+    2. 导航到小黑盒的赛事中心
+    3. 顺序处理每个游戏项目的数据（配置多个模拟器分片时并行处理）
+    4. 整合网络数据和小黑盒数据
+    5. 保存最终结果到数据库
+    """
+    # 加载配置文件
+    config = load_config()
+
+    # 配置了多个模拟器分片时，交给分片运行器并行处理
+    if len(config.get('shards', [])) > 1:
+        from shard_runner import run_sharded
+        run_sharded(config)
+        return
+
+    # 获取需要跳过的游戏列表
+    skip_games = config.get('skip_games', [])
+    if skip_games:
+        print(f"[主程序] 将跳过以下游戏: {skip_games}")
+    
+    # 初始化系统组件
+    print("[主程序] 开始系统初始化...")
+    init = InitManager(config=config)
+    ocr_server = start_ocr_server(config)
+    controller, ocr = init.initialize_all(with_ocr=ocr_server is None)
+    if ocr_server is not None:
+        ocr = ocr_server.client(0)
+    screen_mgr = create_screen_manager(config, controller, ocr)
+    data_mgr = DataManager(init.config)
+    print("[主程序] 系统初始化完成")
+
+    navigate_to_event_center(init, screen_mgr)
 
-        except Exception as e:
-            print(f"[主程序] [{event_name}] 处理过程中发生错误: {str(e)}")
-            print(traceback.format_exc())
+    # 顺序处理每个游戏项目
+    event_list = list(config['urls']['games'].keys())
+    print(f"[主程序] 开始处理 {len(event_list)} 个游戏项目: {event_list}")
+    
+    for event_name in event_list:
+        # 检查是否跳过当前游戏
+        if event_name in skip_games:
+            print(f"[主程序] 跳过 {event_name}（配置中指定）")
             continue
+        process_game(config, screen_mgr, data_mgr, event_name)
     
+    if ocr_server is not None:
+        ocr.close()
+        ocr_server.stop()
+    close_all()
     print("[主程序] 所有游戏项目处理完成")
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+# match_key.py - 比赛规范键：游戏项目 + UTC日期 + 忽略顺序的规范化队伍对，用于带索引的等值查重和配对
+import os
+import re
+import sys
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from db_manager import connect, release, write_transaction
+
+# 小黑盒和网站显示的比赛时间均为北京时间
+SOURCE_TIMEZONE = timezone(timedelta(hours=8))
+TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M")
+
+def normalize_team(name):
+    """规范化队伍名称：忽略大小写、空白和标点"""
+    return re.sub(r"[\W_]+", "", str(name or "").casefold())
+
+def start_ts(match_time):
+    """比赛时间字符串转为UTC时间戳（整数秒），无法解析时返回None"""
+    for time_format in TIME_FORMATS:
+        try:
+            local = datetime.strptime(str(match_time).strip(), time_format)
+        except ValueError:
+            continue
+        return int(local.replace(tzinfo=SOURCE_TIMEZONE).timestamp())
+    return None
+
+def match_key(game, match_time, team_a, team_b):
+    """
+    比赛规范键：同一游戏项目、同一UTC日期、同两支队伍（忽略顺序）的比赛键相同
+    时间无法解析时退回使用时间字符串的日期部分
+    """
+    ts = start_ts(match_time)
+    if ts is not None:
+        date = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+    else:
+        date = str(match_time or "").split(" ")[0]
+    teams = sorted((normalize_team(team_a), normalize_team(team_b)))
+    return f"{game}|{date}|{teams[0]}|{teams[1]}"
+
+_ensured = set()  # 本进程内已检查过的 (数据库路径, 表名)
+
+def ensure_key_columns(conn, game, table="matches"):
+    """
+    确保比赛表带有 match_key、start_ts 列和 match_key 索引，并回填缺失的值
+    game 为空时从表中的 game 列读取游戏项目（统一赔率库）
+    返回: 回填的记录数
+    """
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if (db_path, table) in _ensured:
+        return 0
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    with write_transaction(db_path) as conn:
+        if "match_key" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN match_key TEXT")
+        if "start_ts" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN start_ts INTEGER")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_match_key ON {table} (match_key)")
+
+        game_column = "game" if game is None else "?"
+        rows = conn.execute(f"""
+            SELECT rowid, {game_column}, match_time, team_a, team_b FROM {table} WHERE match_key IS NULL
+        """, () if game is None else (game,)).fetchall()
+        conn.executemany(f"UPDATE {table} SET match_key = ?, start_ts = ? WHERE rowid = ?",
+                         [(match_key(row_game, match_time, team_a, team_b), start_ts(match_time), rowid)
+                          for rowid, row_game, match_time, team_a, team_b in rows])
+    _ensured.add((db_path, table))
+    return len(rows)
+
+def backfill(data_dir):
+    """
+    为已有的数据库文件补充 match_key / start_ts 列、索引和数据
+    返回: {数据库路径: 回填的记录数}
+    """
+    counts = {}
+    games = sorted(d for d in os.listdir(data_dir)
+                   if os.path.isdir(os.path.join(data_dir, d)) and not d.startswith('.'))
+    for game in games:
+        game_folder = os.path.join(data_dir, game)
+        paths = [os.path.join(game_folder, "default_lbb_matches.db")]
+        for folder in sorted(os.listdir(game_folder)):
+            for file_name in ("web_matches.db", "lbb_matches.db"):
+                paths.append(os.path.join(game_folder, folder, file_name))
+        for db_path in paths:
+            if not os.path.exists(db_path):
+                continue
+            try:
+                counts[db_path] = ensure_key_columns(connect(db_path), game)
+            except sqlite3.Error as e:
+                print(f"[比赛键] 回填 {db_path} 失败: {e}")
+            finally:
+                release(db_path)
+
+    store_path = os.path.join(data_dir, "odds.db")
+    if os.path.exists(store_path):
+        counts[store_path] = ensure_key_columns(connect(store_path), None)
+    return counts
+
+if __name__ == "__main__":
+    # 用法: python match_key.py backfill [数据目录]
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("用法: python match_key.py backfill [数据目录]")
+        sys.exit(1)
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    counts = backfill(data_dir)
+    for db_path, count in counts.items():
+        print(f"[比赛键] {db_path}: 回填 {count} 条记录")
+    print(f"[比赛键] 回填完成: {len(counts)} 个数据库，共 {sum(counts.values())} 条记录")
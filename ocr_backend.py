@@ -0,0 +1,487 @@
+# ocr_backend.py - 可替换的OCR推理后端：PaddleOCR封装，以及直接驱动 onnxruntime 的轻量实现
+import os
+import re
+import sys
+import glob
+import math
+import time
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+
+# 各类字段的解码字符白名单（CTC空白符始终保留）
+# 只收录字符集确实封闭的数字类字段：队伍名称和界面标签不受限，受限解码会把区域内任意文本强行解码成
+# 白名单字符（如任意标签都被解码成"预测中"的近似串），反而增加误判
+FIELD_CHARSETS = {
+    "odds": "0123456789.",
+    "time": "0123456789:",
+}
+
+def guess_field(text):
+    """按初次识别的文本推断字段类型（与 DataManager.process_text_data 的分类规则对应），无法判断时返回None"""
+    text = re.sub(r'\s+', '', str(text))
+    if not text:
+        return None
+    digits = sum(ch.isdigit() for ch in text)
+    if "BO" in text.upper() or "B0" in text.upper():
+        return "match_name"
+    if ":" in text and digits >= len(text) / 2:
+        return "time"
+    if "." in text and digits >= len(text) / 2:
+        return "odds"
+    if all(ord(ch) < 128 for ch in text):
+        return "team"
+    return None
+
+class OCRBackend(ABC):
+    """
+    OCR后端接口：ocr() 的调用方式和返回格式与 PaddleOCR 一致
+    det=True:  [[ [四点框, (文本, 置信度)], ... ]]
+    det=False: [[ (文本, 置信度), ... ]]
+    """
+    name = "base"
+
+    @abstractmethod
+    def ocr(self, img, det=True, rec=True, cls=False, charset=None):
+        """charset: 可选的解码字符白名单，不支持受限解码的后端忽略该参数"""
+
+    def warm_up(self, rounds=2):
+        """用空白图像预先运行几次推理，避免首次识别时的初始化开销落在扫描流程中"""
+        blank = np.full((640, 640, 3), 255, dtype=np.uint8)
+        crop = np.full((48, 320, 3), 255, dtype=np.uint8)
+        for _ in range(rounds):
+            self.ocr(blank)
+            self.ocr(crop, det=False, cls=False)
+
+class PaddleOCRBackend(OCRBackend):
+    """PaddleOCR封装：保持原有的识别行为"""
+    name = "paddle"
+
+    def __init__(self, det_path, rec_path, charset_path):
+        from paddleocr import PaddleOCR
+        self.engine = PaddleOCR(
+            use_angle_cls=False, lang="ch",
+            det_model_dir=None, rec_model_dir=None,
+            det_onnx_file=det_path,
+            rec_onnx_file=rec_path,
+            rec_char_dict_path=charset_path,
+            show_log=False
+        )
+
+    def ocr(self, img, det=True, rec=True, cls=False, charset=None):
+        # PaddleOCR封装不支持受限解码，忽略 charset
+        return self.engine.ocr(img, det=det, rec=rec, cls=cls)
+
+class OnnxOCRBackend(OCRBackend):
+    """
+    直接驱动 onnxruntime 的 PP-OCRv4 检测+识别后端：
+    - 可调的算子内/算子间线程数
+    - 检测/识别各复用一块预分配的输入缓冲区，仅在需要更大的输入时重新分配
+    - 检测后处理（DB）和识别解码（CTC贪心）用 OpenCV/numpy 实现，不经过 PaddleOCR 封装
+    """
+    name = "onnx"
+
+    def __init__(self, det_path, rec_path, charset_path, intra_op_threads=None, inter_op_threads=1,
+                 det_limit_side=960, det_thresh=0.3, box_thresh=0.6, unclip_ratio=1.5,
+                 drop_score=0.5, rec_height=48, rec_width=320, rec_batch=6):
+        """
+        det_path / rec_path: 检测/识别ONNX模型（可为int8量化模型）
+        charset_path: 识别字典（每行一个字符）
+        intra_op_threads: 单个算子内的线程数，默认使用物理核数
+        inter_op_threads: 算子间并行线程数，顺序执行模式下保持1即可
+        det_limit_side: 检测输入的最长边
+        det_thresh / box_thresh / unclip_ratio: DB后处理参数，与PaddleOCR默认值一致
+        drop_score: 检测+识别模式下丢弃置信度低于该值的结果
+        rec_height / rec_width: 识别输入高度和最小宽度
+        rec_batch: 识别批大小
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads or max(1, (os.cpu_count() or 2) // 2)
+        options.inter_op_num_threads = inter_op_threads
+        providers = ["CPUExecutionProvider"]
+        self.det_session = ort.InferenceSession(det_path, sess_options=options, providers=providers)
+        self.rec_session = ort.InferenceSession(rec_path, sess_options=options, providers=providers)
+        self.det_input = self.det_session.get_inputs()[0].name
+        self.rec_input = self.rec_session.get_inputs()[0].name
+
+        with open(charset_path, "r", encoding="utf-8") as f:
+            characters = [line.rstrip("\r\n") for line in f]
+        # 索引0为CTC空白符，字典末尾追加空格（与PaddleOCR use_space_char=True 一致）
+        self.characters = ["blank"] + characters + [" "]
+
+        self.det_limit_side = det_limit_side
+        self.det_thresh = det_thresh
+        self.box_thresh = box_thresh
+        self.unclip_ratio = unclip_ratio
+        self.drop_score = drop_score
+        self.rec_height = rec_height
+        self.rec_width = rec_width
+        self.rec_batch = rec_batch
+
+        self.mean = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape(3, 1, 1)
+        self.std = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(3, 1, 1)
+        self.buffers = {}
+        self.charset_indices = {}
+
+    def _buffer(self, kind, shape):
+        """
+        每类输入（det/rec）复用一块缓冲区，返回其前 prod(shape) 个元素构成的连续视图；
+        输入变大时才重新分配，检测图尺寸和识别批宽度不断变化时内存占用不会随形状种类增长
+        """
+        size = math.prod(shape)
+        buffer = self.buffers.get(kind)
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, dtype=np.float32)
+            self.buffers[kind] = buffer
+        return buffer[:size].reshape(shape)
+
+    # ---------------- 检测 ----------------
+
+    def _det_preprocess(self, img):
+        h, w = img.shape[:2]
+        ratio = min(1.0, self.det_limit_side / max(h, w))
+        resize_h = max(32, int(round(h * ratio / 32)) * 32)
+        resize_w = max(32, int(round(w * ratio / 32)) * 32)
+        resized = cv2.resize(img, (resize_w, resize_h))
+        buffer = self._buffer("det", (1, 3, resize_h, resize_w))
+        chw = buffer[0]
+        chw[...] = resized.transpose(2, 0, 1)
+        chw *= 1.0 / 255.0
+        chw -= self.mean
+        chw /= self.std
+        return buffer, resize_h / h, resize_w / w
+
+    def _box_score(self, pred, box):
+        h, w = pred.shape
+        xmin = int(np.clip(np.floor(box[:, 0].min()), 0, w - 1))
+        xmax = int(np.clip(np.ceil(box[:, 0].max()), 0, w - 1))
+        ymin = int(np.clip(np.floor(box[:, 1].min()), 0, h - 1))
+        ymax = int(np.clip(np.ceil(box[:, 1].max()), 0, h - 1))
+        mask = np.zeros((ymax - ymin + 1, xmax - xmin + 1), dtype=np.uint8)
+        shifted = box.copy()
+        shifted[:, 0] -= xmin
+        shifted[:, 1] -= ymin
+        cv2.fillPoly(mask, shifted.reshape(1, -1, 2).astype(np.int32), 1)
+        return cv2.mean(pred[ymin:ymax + 1, xmin:xmax + 1], mask)[0]
+
+    @staticmethod
+    def _order_points(points):
+        """按 左上、右上、右下、左下 排列四个顶点"""
+        points = sorted(points.tolist(), key=lambda p: p[0])
+        left = sorted(points[:2], key=lambda p: p[1])
+        right = sorted(points[2:], key=lambda p: p[1])
+        return np.array([left[0], right[0], right[1], left[1]], dtype=np.float32)
+
+    def _det_postprocess(self, pred, scale_y, scale_x, shape):
+        bitmap = (pred > self.det_thresh).astype(np.uint8)
+        contours, _ = cv2.findContours(bitmap, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        h, w = shape[:2]
+        boxes = []
+        for contour in contours[:1000]:
+            rect = cv2.minAreaRect(contour)
+            if min(rect[1]) < 3:
+                continue
+            box = self._order_points(cv2.boxPoints(rect))
+            if self._box_score(pred, box) < self.box_thresh:
+                continue
+            # 按DB算法的扩张距离放大最小外接矩形（矩形情况下与多边形偏移等价）
+            area = rect[1][0] * rect[1][1]
+            perimeter = 2 * (rect[1][0] + rect[1][1])
+            distance = area * self.unclip_ratio / perimeter
+            expanded = (rect[0], (rect[1][0] + 2 * distance, rect[1][1] + 2 * distance), rect[2])
+            if min(expanded[1]) < 5:
+                continue
+            box = self._order_points(cv2.boxPoints(expanded))
+            box[:, 0] = np.clip(np.round(box[:, 0] / scale_x), 0, w)
+            box[:, 1] = np.clip(np.round(box[:, 1] / scale_y), 0, h)
+            boxes.append(box)
+        # 从上到下、同一行从左到右排序
+        boxes.sort(key=lambda b: (b[0][1], b[0][0]))
+        for i in range(len(boxes) - 1):
+            for j in range(i, -1, -1):
+                if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                    boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+                else:
+                    break
+        return boxes
+
+    def detect(self, img):
+        """检测文本框，返回四点框列表（原图坐标）"""
+        tensor, scale_y, scale_x = self._det_preprocess(img)
+        pred = self.det_session.run(None, {self.det_input: tensor})[0][0, 0]
+        return self._det_postprocess(pred, scale_y, scale_x, img.shape)
+
+    @staticmethod
+    def _crop_box(img, box):
+        """透视变换裁剪文本框，竖排的窄长框旋转为横排"""
+        width = int(max(np.linalg.norm(box[0] - box[1]), np.linalg.norm(box[2] - box[3])))
+        height = int(max(np.linalg.norm(box[0] - box[3]), np.linalg.norm(box[1] - box[2])))
+        target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+        matrix = cv2.getPerspectiveTransform(box.astype(np.float32), target)
+        crop = cv2.warpPerspective(img, matrix, (max(width, 1), max(height, 1)),
+                                   borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+        if crop.shape[0] / max(crop.shape[1], 1) >= 1.5:
+            crop = np.rot90(crop)
+        return crop
+
+    # ---------------- 识别 ----------------
+
+    def _rec_batch_tensor(self, crops):
+        max_ratio = max([self.rec_width / self.rec_height] + [c.shape[1] / max(c.shape[0], 1) for c in crops])
+        width = int(math.ceil(self.rec_height * max_ratio))
+        buffer = self._buffer("rec", (len(crops), 3, self.rec_height, width))
+        buffer.fill(0.0)
+        for index, crop in enumerate(crops):
+            resized_w = min(width, int(math.ceil(self.rec_height * crop.shape[1] / max(crop.shape[0], 1))))
+            resized = cv2.resize(crop, (max(resized_w, 1), self.rec_height)).astype(np.float32)
+            resized = resized.transpose(2, 0, 1) * (2.0 / 255.0) - 1.0
+            buffer[index, :, :, :resized.shape[2]] = resized
+        return buffer
+
+    def _charset_indices(self, charset):
+        """白名单字符在字典中的索引（含空白符0），按白名单缓存"""
+        indices = self.charset_indices.get(charset)
+        if indices is None:
+            allowed = set(charset)
+            indices = np.array([0] + [i for i, ch in enumerate(self.characters) if i > 0 and ch in allowed])
+            self.charset_indices[charset] = indices
+        return indices
+
+    def decode(self, probs, charset=None):
+        """
+        CTC贪心解码：合并重复字符并去掉空白符，置信度为保留字符概率的均值
+        charset: 字符白名单，提供时只在白名单字符（和空白符）之间取最大概率
+        """
+        if charset:
+            allowed = self._charset_indices(charset)
+            restricted = probs[:, :, allowed]
+            indices = allowed[restricted.argmax(axis=-1)]
+            scores = restricted.max(axis=-1)
+        else:
+            indices = probs.argmax(axis=-1)
+            scores = probs.max(axis=-1)
+        results = []
+        for row, row_scores in zip(indices, scores):
+            keep = np.ones(len(row), dtype=bool)
+            keep[1:] = row[1:] != row[:-1]
+            keep &= row != 0
+            text = "".join(self.characters[i] for i in row[keep] if i < len(self.characters))
+            score = float(row_scores[keep].mean()) if keep.any() else 0.0
+            results.append((text, score))
+        return results
+
+    def recognize(self, crops, charset=None):
+        """批量识别文本行图像，返回 [(文本, 置信度), ...]；charset 为解码字符白名单"""
+        results = [None] * len(crops)
+        order = sorted(range(len(crops)), key=lambda i: crops[i].shape[1] / max(crops[i].shape[0], 1))
+        for start in range(0, len(order), self.rec_batch):
+            batch = order[start:start + self.rec_batch]
+            tensor = self._rec_batch_tensor([crops[i] for i in batch])
+            probs = self.rec_session.run(None, {self.rec_input: tensor})[0]
+            for i, result in zip(batch, self.decode(probs, charset)):
+                results[i] = result
+        return results
+
+    def ocr(self, img, det=True, rec=True, cls=False, charset=None):
+        img = np.asarray(img)
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        if not det:
+            return [self.recognize([img], charset)]
+        boxes = self.detect(img)
+        if not rec:
+            return [[box.tolist() for box in boxes]]
+        if not boxes:
+            return [None]
+        texts = self.recognize([self._crop_box(img, box) for box in boxes], charset)
+        lines = [[box.tolist(), result] for box, result in zip(boxes, texts) if result[1] >= self.drop_score]
+        return [lines or None]
+
+def model_paths(config, quantized=None):
+    """按配置返回检测/识别/字典路径；启用量化且量化模型存在时使用int8模型"""
+    resource = config['resource']
+    resource_path = resource['path']
+    det_path = os.path.join(resource_path, resource['det_model_path'])
+    rec_path = os.path.join(resource_path, resource['rec_model_path'])
+    charset_path = os.path.join(resource_path, resource['charset_path'])
+    quantized = resource.get('quantized', False) if quantized is None else quantized
+    if quantized:
+        det_int8, rec_int8 = quantized_path(det_path), quantized_path(rec_path)
+        if os.path.exists(det_int8) and os.path.exists(rec_int8):
+            det_path, rec_path = det_int8, rec_int8
+        else:
+            print("[OCR] 未找到int8量化模型，使用原始模型（可运行 python ocr_backend.py quantize 生成）")
+    return det_path, rec_path, charset_path
+
+def quantized_path(model_path):
+    root, ext = os.path.splitext(model_path)
+    return f"{root}_int8{ext}"
+
+def create_ocr_backend(config, backend=None, quantized=None):
+    """
+    按配置创建OCR后端
+    resource.backend: paddle（默认）或 onnx
+    resource.intra_op_threads / resource.inter_op_threads: onnx后端线程数
+    resource.quantized: onnx后端是否使用int8量化模型
+    resource.warm_up: 是否在创建后预热（默认True）
+    """
+    resource = config['resource']
+    backend = backend or resource.get('backend', 'paddle')
+    if backend == "onnx":
+        det_path, rec_path, charset_path = model_paths(config, quantized)
+        engine = OnnxOCRBackend(
+            det_path, rec_path, charset_path,
+            intra_op_threads=resource.get('intra_op_threads'),
+            inter_op_threads=resource.get('inter_op_threads', 1)
+        )
+    elif backend == "paddle":
+        engine = PaddleOCRBackend(*model_paths(config, quantized=False))
+    else:
+        raise ValueError(f"未知的OCR后端: {backend}")
+    if resource.get('warm_up', True):
+        start = time.time()
+        engine.warm_up()
+        print(f"[OCR] {engine.name} 后端预热完成，耗时 {time.time() - start:.2f} 秒")
+    return engine
+
+def quantize_models(config):
+    """对检测/识别模型做动态int8量化，生成 *_int8.onnx"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    det_path, rec_path, _ = model_paths(config, quantized=False)
+    for path in (det_path, rec_path):
+        target = quantized_path(path)
+        quantize_dynamic(path, target, weight_type=QuantType.QInt8)
+        print(f"[OCR] 已生成量化模型: {target}")
+
+def load_bench_images(source):
+    """
+    加载基准测试图像：
+    - 会话目录（session_replay 录制）：整帧用于检测+识别，锚点标签区域的裁剪用于仅识别
+    - 普通目录：其中的 png/jpg 图像，按裁剪图仅识别处理
+    返回: (整帧列表, 裁剪列表)
+    """
+    frames, crops = [], []
+    if os.path.exists(os.path.join(source, "meta.json")):
+        from anchor_manager import DEFAULT_ANCHORS
+        for path in sorted(glob.glob(os.path.join(source, "frames_*.npz"))):
+            with np.load(path) as chunk:
+                frames.extend(chunk[key] for key in chunk.files)
+        for frame in frames:
+            for spec in DEFAULT_ANCHORS.values():
+                x, y, w, h = spec["roi"]
+                crops.append(frame[y:y + h, x:x + w])
+    else:
+        for path in sorted(glob.glob(os.path.join(source, "*.png")) + glob.glob(os.path.join(source, "*.jpg"))):
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is not None:
+                crops.append(image)
+    return frames, crops
+
+def benchmark(config, source, backends=("paddle", "onnx", "onnx-int8"), rounds=3):
+    """对比各后端在录制截图/裁剪上的单次调用耗时，以及与第一个后端的识别结果一致率"""
+    frames, crops = load_bench_images(source)
+    print(f"[OCR基准] 整帧 {len(frames)} 张，裁剪 {len(crops)} 张")
+    reference = {}  # 各类输入以第一个可用后端的识别结果为基准
+    for name in backends:
+        quantized = name.endswith("-int8")
+        try:
+            engine = create_ocr_backend(config, backend=name.split("-")[0], quantized=quantized)
+        except Exception as e:
+            print(f"[OCR基准] {name} 后端不可用: {e}")
+            continue
+        for kind, images, det in (("检测+识别", frames, True), ("仅识别", crops, False)):
+            if not images:
+                continue
+            latencies, texts = [], []
+            for _ in range(rounds):
+                texts = []
+                for image in images:
+                    start = time.perf_counter()
+                    result = engine.ocr(image, det=det, cls=False)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    lines = result[0] or []
+                    texts.append("".join(line[1][0] if det else line[0] for line in lines))
+            latencies.sort()
+            summary = (f"[OCR基准] {name:<10} {kind}: 平均 {sum(latencies) / len(latencies):.1f}ms，"
+                       f"P50 {latencies[len(latencies) // 2]:.1f}ms，P95 {latencies[int(len(latencies) * 0.95)]:.1f}ms")
+            if kind not in reference:
+                reference[kind] = (name, texts)
+            else:
+                reference_name, reference_texts = reference[kind]
+                agree = sum(a == b for a, b in zip(reference_texts, texts)) / len(texts)
+                summary += f"，与 {reference_name} 一致率 {agree:.0%}"
+            print(summary)
+
+FIELD_PATTERNS = {
+    "odds": r"\d+\.\d+",
+    "time": r"\d+:\d{1,2}(:\d{1,2})?",
+}
+
+def benchmark_charsets(config, source, quantized=None):
+    """
+    对比受限字符集与完整字典的解码：按完整字典的识别结果推断字段类型，
+    同一份识别概率分别用完整字典和该字段白名单解码，统计解码耗时、格式有效率和结果一致率
+    """
+    engine = create_ocr_backend(config, backend="onnx", quantized=quantized)
+    frames, crops = load_bench_images(source)
+    lines = list(crops)
+    for frame in frames:
+        lines.extend(engine._crop_box(frame, box) for box in engine.detect(frame))
+    print(f"[字符集基准] 文本行 {len(lines)} 个")
+
+    stats = {}
+    for line in lines:
+        probs = engine.rec_session.run(None, {engine.rec_input: engine._rec_batch_tensor([line])})[0]
+        start = time.perf_counter()
+        full_text, _ = engine.decode(probs)[0]
+        full_ms = (time.perf_counter() - start) * 1000
+        field = guess_field(full_text)
+        if field not in FIELD_CHARSETS:
+            continue
+        start = time.perf_counter()
+        restricted_text, _ = engine.decode(probs, FIELD_CHARSETS[field])[0]
+        restricted_ms = (time.perf_counter() - start) * 1000
+        pattern = FIELD_PATTERNS[field]
+        entry = stats.setdefault(field, {"n": 0, "full_valid": 0, "restricted_valid": 0, "agree": 0,
+                                         "full_ms": 0.0, "restricted_ms": 0.0, "changed": []})
+        entry["n"] += 1
+        entry["full_valid"] += bool(re.fullmatch(pattern, full_text.strip()))
+        entry["restricted_valid"] += bool(re.fullmatch(pattern, restricted_text.strip()))
+        entry["agree"] += full_text == restricted_text
+        entry["full_ms"] += full_ms
+        entry["restricted_ms"] += restricted_ms
+        if full_text != restricted_text and len(entry["changed"]) < 5:
+            entry["changed"].append((full_text, restricted_text))
+
+    for field, entry in stats.items():
+        n = entry["n"]
+        print(f"[字符集基准] {field:<6} {n} 个: 格式有效率 完整字典 {entry['full_valid'] / n:.0%} -> "
+              f"白名单 {entry['restricted_valid'] / n:.0%}，一致率 {entry['agree'] / n:.0%}，"
+              f"解码 {entry['full_ms'] / n:.3f}ms -> {entry['restricted_ms'] / n:.3f}ms")
+        for full_text, restricted_text in entry["changed"]:
+            print(f"[字符集基准]     '{full_text}' -> '{restricted_text}'")
+    return stats
+
+if __name__ == "__main__":
+    # 用法:
+    #   python ocr_backend.py quantize
+    #   python ocr_backend.py bench <会话目录|裁剪图目录> [后端 ...]   后端: paddle onnx onnx-int8
+    #   python ocr_backend.py bench-charset <会话目录|裁剪图目录>
+    commands = ("quantize", "bench", "bench-charset")
+    if len(sys.argv) < 2 or sys.argv[1] not in commands or (sys.argv[1] != "quantize" and len(sys.argv) < 3):
+        print("用法: python ocr_backend.py quantize\n"
+              "      python ocr_backend.py bench <会话目录|裁剪图目录> [paddle onnx onnx-int8]\n"
+              "      python ocr_backend.py bench-charset <会话目录|裁剪图目录>")
+        sys.exit(1)
+    from main import load_config
+    config = load_config()
+    if sys.argv[1] == "quantize":
+        quantize_models(config)
+    elif sys.argv[1] == "bench-charset":
+        benchmark_charsets(config, sys.argv[2])
+    else:
+        benchmark(config, sys.argv[2], tuple(sys.argv[3:]) or ("paddle", "onnx", "onnx-int8"))
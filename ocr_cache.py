@@ -0,0 +1,121 @@
+# ocr_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+
+class OCRCache:
+    """
+    OCR结果缓存：以裁剪图像像素的哈希为键，缓存在OCR模型之前，
+    相同画面的重复识别只需计算一次哈希
+    """
+    def __init__(self, ocr, maxsize=512, mode="exact"):
+        """
+        初始化OCR缓存
+        ocr: 被包装的OCR对象（需提供 ocr(img, **kwargs) 方法）
+        maxsize: 最多缓存的结果条数，超出时按LRU淘汰
+        mode: exact - 按原始像素精确哈希；coarse - 降采样并量化后哈希，容忍轻微噪声
+        """
+        self.inner = ocr
+        self.maxsize = maxsize
+        self.mode = mode
+        self.entries = OrderedDict()
+        # 异步识别的完成回调在OCR服务客户端的读取线程中写入缓存，读写 entries 需加锁
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, img, kwargs):
+        """计算缓存键：图像内容哈希 + 形状 + 识别参数"""
+        img = np.asarray(img)
+        if self.mode == "coarse":
+            img = img[::2, ::2] >> 3
+        digest = hashlib.blake2b(np.ascontiguousarray(img).data, digest_size=16).hexdigest()
+        return digest, img.shape, str(img.dtype), tuple(sorted(kwargs.items()))
+
+    def _lookup(self, key):
+        """查找缓存，命中时移到LRU末尾；返回 (是否命中, 结果)"""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return True, self.entries[key]
+
+    def _store(self, key, result):
+        """写入缓存，超出容量时按LRU淘汰"""
+        with self.lock:
+            self.entries[key] = result
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def ocr(self, img, **kwargs):
+        """与被包装OCR对象相同的调用方式，命中缓存时直接返回结果"""
+        if self.maxsize <= 0:
+            return self.inner.ocr(img, **kwargs)
+
+        key = self.make_key(img, kwargs)
+        hit, result = self._lookup(key)
+        if hit:
+            return result
+
+        result = self.inner.ocr(img, **kwargs)
+        self._store(key, result)
+        return result
+
+    def submit(self, img, **kwargs):
+        """
+        异步识别：命中缓存时返回已完成的Future；
+        被包装对象支持 submit()（如OCR服务客户端）时异步提交，否则同步识别
+        """
+        if not hasattr(self.inner, "submit"):
+            future = Future()
+            try:
+                future.set_result(self.ocr(img, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if self.maxsize <= 0:
+            return self.inner.submit(img, **kwargs)
+
+        key = self.make_key(img, kwargs)
+        hit, result = self._lookup(key)
+        if hit:
+            future = Future()
+            future.set_result(result)
+            return future
+
+        future = self.inner.submit(img, **kwargs)
+
+        def store(done):
+            if done.exception() is None:
+                self._store(key, done.result())
+
+        future.add_done_callback(store)
+        return future
+
+    def stats(self):
+        """返回缓存命中统计"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __getattr__(self, name):
+        # 其他属性透传给被包装的OCR对象
+        return getattr(self.inner, name)
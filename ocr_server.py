@@ -0,0 +1,231 @@
+# ocr_server.py - 独立进程的OCR推理服务，通过共享内存传递图像
+import time
+import queue
+import itertools
+import threading
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from concurrent.futures import Future
+import numpy as np
+
+def attach_shared_memory(name):
+    """
+    附加到客户端创建的共享内存：共享内存由客户端负责释放，工作进程不应登记到资源跟踪器
+    Python 3.13+ 使用 track=False；更早版本在POSIX上构造时会自动登记，而工作进程与客户端共用父进程的
+    资源跟踪器，附加后再取消登记会把客户端的登记一并删除，因此附加期间跳过登记（Windows不登记，无影响）
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def ocr_worker(worker_index, config, request_queue, response_queues):
+    """
+    OCR工作进程：加载一次模型后持续处理请求
+    请求: (请求ID, 客户端ID, 共享内存名, 图像形状, 数据类型, 识别参数)
+    响应: (请求ID, 识别结果, 错误信息)
+    """
+    from init_manager import InitManager
+    ocr = InitManager(config=config).initialize_ocr()
+    print(f"[OCR服务] 工作进程 {worker_index} 模型加载完成")
+
+    while True:
+        request = request_queue.get()
+        if request is None:
+            break
+        request_id, client_id, shm_name, shape, dtype, kwargs = request
+        try:
+            shm = attach_shared_memory(shm_name)
+            try:
+                img = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+                result = ocr.ocr(img, **kwargs)
+                del img
+            finally:
+                shm.close()
+            response_queues[client_id].put((request_id, result, None))
+        except Exception as e:
+            response_queues[client_id].put((request_id, None, f"{e}\n{traceback.format_exc()}"))
+    print(f"[OCR服务] 工作进程 {worker_index} 退出")
+
+class OCRClient:
+    """
+    OCR服务客户端：提供与PaddleOCR相同的 ocr() 接口，以及返回Future的 submit()，
+    图像通过共享内存传给工作进程，调用方可在识别期间继续执行点击/滑动
+    共享内存段按客户端预分配并复用：请求完成后归还，图像更大时才重新分配；
+    超过 timeout 秒仍未返回的请求以 TimeoutError 失败，工作进程崩溃或卡住时调用方不会无限等待
+    """
+    REQUEST_TIMEOUT = 30  # 单次识别请求的最长等待时间（秒）
+
+    def __init__(self, client_id, request_queue, response_queue, timeout=REQUEST_TIMEOUT):
+        self.client_id = client_id
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+        self.timeout = timeout
+        self._reset_local_state()
+
+    def _reset_local_state(self):
+        self.pending = {}         # {请求ID: (Future, 共享内存, 截止时间)}
+        self.expired = {}         # {请求ID: 共享内存}，已超时但工作进程可能仍在读取，收到响应后才复用
+        self.free_segments = []   # 空闲的共享内存段
+        self.lock = threading.Lock()
+        self.counter = itertools.count()
+        self.reader = None
+
+    def __getstate__(self):
+        # 传给其他进程时只携带队列，线程、共享内存和待处理请求在新进程中重新创建
+        return {"client_id": self.client_id, "request_queue": self.request_queue,
+                "response_queue": self.response_queue, "timeout": self.timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_local_state()
+
+    def _ensure_reader(self):
+        if self.reader is None:
+            self.reader = threading.Thread(target=self._read_responses, name="ocr-client", daemon=True)
+            self.reader.start()
+
+    def _acquire_segment(self, size):
+        """取一个足够大的空闲共享内存段，没有时新建（调用方持有锁）"""
+        for index, shm in enumerate(self.free_segments):
+            if shm.size >= size:
+                return self.free_segments.pop(index)
+        if self.free_segments:
+            # 空闲段都太小：释放其中最小的一个，避免段数随图像尺寸变化而增长
+            smallest = min(self.free_segments, key=lambda shm: shm.size)
+            self.free_segments.remove(smallest)
+            smallest.close()
+            smallest.unlink()
+        return shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    def _expire(self, now):
+        """将超时的请求置为失败（调用方持有锁），返回需要通知的Future"""
+        failed = []
+        for request_id, (future, shm, deadline) in list(self.pending.items()):
+            if now >= deadline:
+                del self.pending[request_id]
+                self.expired[request_id] = shm
+                failed.append(future)
+        return failed
+
+    def _read_responses(self):
+        while True:
+            try:
+                response = self.response_queue.get(timeout=1)
+            except queue.Empty:
+                response = None
+            future = None
+            with self.lock:
+                if response is not None:
+                    request_id, result, error = response
+                    future, shm, _ = self.pending.pop(request_id, (None, None, None))
+                    shm = shm or self.expired.pop(request_id, None)
+                    if shm is not None:
+                        self.free_segments.append(shm)
+                failed = self._expire(time.monotonic())
+            for expired_future in failed:
+                expired_future.set_exception(TimeoutError(f"OCR服务识别超时（{self.timeout}秒），工作进程可能已退出"))
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(f"OCR服务识别失败: {error}"))
+            else:
+                future.set_result(result)
+
+    def submit(self, img, **kwargs):
+        """异步识别：将图像写入共享内存并提交请求，返回Future"""
+        self._ensure_reader()
+        img = np.ascontiguousarray(img)
+        future = Future()
+        with self.lock:
+            shm = self._acquire_segment(img.nbytes)
+            request_id = next(self.counter)
+            self.pending[request_id] = (future, shm, time.monotonic() + self.timeout)
+        np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[...] = img
+        self.request_queue.put((request_id, self.client_id, shm.name, img.shape, img.dtype.str, kwargs))
+        return future
+
+    def ocr(self, img, **kwargs):
+        """同步识别，接口与PaddleOCR一致"""
+        return self.submit(img, **kwargs).result(timeout=self.timeout + 1)
+
+    def close(self):
+        """释放空闲和已超时请求的共享内存段（程序退出前调用）"""
+        with self.lock:
+            segments = self.free_segments + list(self.expired.values())
+            self.free_segments, self.expired = [], {}
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+class OCRServer:
+    """
+    OCR推理服务：在多个独立进程中各加载一份模型，组成共享的推理池，
+    多个控制器（客户端）共用同一个已预热的模型池
+    """
+    def __init__(self, config, num_workers=2, num_clients=1):
+        """
+        config: 系统配置（用于加载OCR模型）
+        num_workers: 工作进程数
+        num_clients: 客户端数，每个客户端拥有独立的响应队列
+        """
+        self.config = config
+        self.num_workers = num_workers
+        self.request_queue = multiprocessing.Queue()
+        self.response_queues = [multiprocessing.Queue() for _ in range(num_clients)]
+        self.workers = []
+        self.running = False
+        self.watchdog = None
+
+    def _spawn(self, index):
+        process = multiprocessing.Process(
+            target=ocr_worker,
+            args=(index, self.config, self.request_queue, self.response_queues),
+            name=f"ocr-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def start(self):
+        """启动工作进程和看护线程"""
+        self.running = True
+        for index in range(self.num_workers):
+            self.workers.append(self._spawn(index))
+        self.watchdog = threading.Thread(target=self._watch, name="ocr-watchdog", daemon=True)
+        self.watchdog.start()
+        print(f"[OCR服务] 已启动 {self.num_workers} 个OCR工作进程，{len(self.response_queues)} 个客户端")
+        return self
+
+    def _watch(self, interval=1.0):
+        """看护线程：工作进程意外退出时重新启动，其未完成的请求由客户端按超时置为失败"""
+        while self.running:
+            time.sleep(interval)
+            for index, process in enumerate(list(self.workers)):
+                if self.running and not process.is_alive():
+                    print(f"[OCR服务] 工作进程 {index} 意外退出（退出码 {process.exitcode}），重新启动")
+                    self.workers[index] = self._spawn(index)
+
+    def client(self, client_id=0):
+        """获取指定编号的客户端"""
+        return OCRClient(client_id, self.request_queue, self.response_queues[client_id])
+
+    def stop(self):
+        """通知所有工作进程退出"""
+        self.running = False
+        if self.watchdog is not None:
+            self.watchdog.join(timeout=5)
+            self.watchdog = None
+        for _ in self.workers:
+            self.request_queue.put(None)
+        for process in self.workers:
+            process.join(timeout=10)
+        self.workers = []
+        print("[OCR服务] 已停止")
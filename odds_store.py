@@ -0,0 +1,417 @@
+# odds_store.py - 统一赔率库：所有游戏项目、比赛目录和数据来源保存在 data_dir/odds.db 一个文件中
+import os
+import sys
+import time
+import sqlite3
+from db_manager import connect, read_only, write_transaction
+from match_key import match_key, start_ts, ensure_key_columns
+
+# 数据来源及其在旧目录结构中对应的数据库文件
+SOURCES = {
+    "web": "web_matches.db",              # 网络数据，位于比赛目录
+    "lbb": "lbb_matches.db",              # 小黑盒数据，位于比赛目录
+    "lbb_default": "default_lbb_matches.db",  # 未找到映射的小黑盒数据，位于游戏项目目录
+}
+
+MATCH_COLUMNS = ("match_id", "match_name", "match_time", "team_a", "team_b", "odds_a", "odds_b",
+                 "original_match_name", "original_team_a", "original_team_b", "creation_time", "last_updated",
+                 "match_key", "start_ts")
+
+KELLY_COLUMNS = ("match_id", "match_name", "match_time", "team_a", "team_b", "web_odds_a", "web_odds_b",
+                 "lbb_odds_a", "lbb_odds_b", "kelly_a", "kelly_b", "coins_a", "coins_b", "match_dir",
+                 "calculation_time")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    legacy_file TEXT
+);
+CREATE TABLE IF NOT EXISTS matches (
+    game TEXT NOT NULL,
+    source TEXT NOT NULL REFERENCES sources(source),
+    match_id TEXT NOT NULL,
+    folder TEXT,                -- 比赛目录名（旧结构中数据库所在的目录），default来源为NULL
+    match_name TEXT,
+    match_time TEXT,
+    team_a TEXT,
+    team_b TEXT,
+    odds_a REAL,
+    odds_b REAL,
+    original_match_name TEXT,
+    original_team_a TEXT,
+    original_team_b TEXT,
+    creation_time TEXT,
+    last_updated TEXT,
+    match_key TEXT,             -- 比赛规范键（见 match_key.py）
+    start_ts INTEGER,           -- 比赛开始时间的UTC时间戳
+    PRIMARY KEY (game, source, match_id)
+);
+CREATE INDEX IF NOT EXISTS idx_matches_folder ON matches (game, source, folder);
+CREATE INDEX IF NOT EXISTS idx_matches_time ON matches (game, match_time);
+CREATE TABLE IF NOT EXISTS match_name_mapping (
+    game TEXT NOT NULL,
+    lbb_match_name TEXT NOT NULL,
+    web_match_name TEXT,
+    last_updated TEXT,
+    PRIMARY KEY (game, lbb_match_name)
+);
+CREATE INDEX IF NOT EXISTS idx_match_name_web ON match_name_mapping (game, web_match_name);
+CREATE TABLE IF NOT EXISTS team_mapping (
+    game TEXT NOT NULL,
+    lbb_team TEXT NOT NULL,
+    web_team TEXT,
+    last_updated TEXT,
+    PRIMARY KEY (game, lbb_team)
+);
+CREATE TABLE IF NOT EXISTS kelly_results (
+    game TEXT NOT NULL,
+    match_id TEXT NOT NULL,
+    match_name TEXT,
+    match_time TEXT,
+    team_a TEXT,
+    team_b TEXT,
+    web_odds_a REAL,
+    web_odds_b REAL,
+    lbb_odds_a REAL,
+    lbb_odds_b REAL,
+    kelly_a REAL,
+    kelly_b REAL,
+    coins_a INTEGER,
+    coins_b INTEGER,
+    match_dir TEXT,
+    calculation_time TEXT,
+    PRIMARY KEY (game, match_id)
+);
+CREATE INDEX IF NOT EXISTS idx_kelly_time ON kelly_results (game, match_time);
+-- 迁移状态：已由 migrate 导入旧目录结构数据的游戏项目，未迁移的游戏项目继续读取旧数据库
+CREATE TABLE IF NOT EXISTS migrated_games (
+    game TEXT PRIMARY KEY,
+    migrated_at TEXT,
+    match_count INTEGER
+);
+-- 赔率历史：只追加，赔率不变时不写入；赔率以百分之一为单位的整数保存，
+-- 每条记录保存相对同一来源同一比赛上一条记录的差值（第一条为绝对值），按时间累加即得当时赔率
+CREATE TABLE IF NOT EXISTS odds_history (
+    source TEXT NOT NULL,
+    match_key TEXT NOT NULL,
+    ts INTEGER NOT NULL,        -- 采集时间（UTC时间戳）
+    d_a INTEGER NOT NULL,       -- 队伍A赔率×100的变化量
+    d_b INTEGER NOT NULL,       -- 队伍B赔率×100的变化量
+    PRIMARY KEY (source, match_key, ts)
+) WITHOUT ROWID;
+"""
+
+def to_hundredths(odds):
+    """赔率转为百分之一为单位的整数"""
+    return int(round(float(odds) * 100))
+
+class OddsStore:
+    """
+    统一赔率库：一个数据库、一套表结构保存数据来源、比赛、赔率、名称映射和凯利计算结果，
+    跨比赛查询只需一次带索引的查询，无需遍历目录逐个打开数据库文件
+    """
+    FILE_NAME = "odds.db"
+    _initialized = set()  # 本进程内已建表的数据库路径
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, self.FILE_NAME)
+        if self.path not in self._initialized:
+            with write_transaction(self.path) as conn:
+                for statement in SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                conn.executemany("INSERT OR IGNORE INTO sources (source, legacy_file) VALUES (?, ?)",
+                                 SOURCES.items())
+            ensure_key_columns(connect(self.path), None)
+            self._initialized.add(self.path)
+
+    def upsert_matches(self, game, source, rows, folder=None):
+        """
+        写入比赛数据（按 游戏项目+来源+match_id 更新），rows 为含 MATCH_COLUMNS 字段的字典，
+        可带 folder 字段指定比赛目录，否则使用参数 folder；已有记录保留原创建时间
+        """
+        params = []
+        for row in rows:
+            row = dict(row)
+            if row.get("match_key") is None:
+                row["match_key"] = match_key(game, row.get("match_time"), row.get("team_a"), row.get("team_b"))
+                row["start_ts"] = start_ts(row.get("match_time"))
+            values = [row.get(column) for column in MATCH_COLUMNS]
+            params.append([game, source, row.get("folder", folder)] + values)
+        if not params:
+            return 0
+        columns = ", ".join(MATCH_COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in MATCH_COLUMNS[1:] if column != "creation_time")
+        with write_transaction(self.path) as conn:
+            conn.executemany(f"""
+                INSERT INTO matches (game, source, folder, {columns})
+                VALUES ({", ".join("?" * (len(MATCH_COLUMNS) + 3))})
+                ON CONFLICT(game, source, match_id) DO UPDATE SET
+                    folder = excluded.folder, {updates},
+                    creation_time = COALESCE(matches.creation_time, excluded.creation_time)
+            """, params)
+        return len(params)
+
+    def save_name_mappings(self, game, mappings):
+        """写入比赛名称映射，mappings 为 (小黑盒名称, 网络名称, 更新时间) 列表"""
+        with write_transaction(self.path) as conn:
+            conn.executemany("INSERT OR REPLACE INTO match_name_mapping VALUES (?, ?, ?, ?)",
+                             [(game,) + tuple(mapping) for mapping in mappings])
+
+    def save_team_mappings(self, game, mappings):
+        """写入队伍名称映射，mappings 为 (小黑盒队伍, 网络队伍, 更新时间) 列表"""
+        with write_transaction(self.path) as conn:
+            conn.executemany("INSERT OR REPLACE INTO team_mapping VALUES (?, ?, ?, ?)",
+                             [(game,) + tuple(mapping) for mapping in mappings])
+
+    def save_kelly_results(self, game, results):
+        """写入凯利计算结果，results 为含 KELLY_COLUMNS 字段的字典列表"""
+        with write_transaction(self.path) as conn:
+            conn.executemany(f"""
+                INSERT OR REPLACE INTO kelly_results (game, {", ".join(KELLY_COLUMNS)})
+                VALUES ({", ".join("?" * (len(KELLY_COLUMNS) + 1))})
+            """, [[game] + [result.get(column) for column in KELLY_COLUMNS] for result in results])
+
+    def is_migrated(self, game):
+        """
+        该游戏项目的旧目录结构数据是否已迁移到统一库
+        双写开始后统一库中很快就有数据，但只有迁移完成后才包含全部历史数据
+        """
+        return connect(self.path).execute("SELECT 1 FROM migrated_games WHERE game = ?", (game,)).fetchone() is not None
+
+    def mark_migrated(self, game, match_count):
+        """记录游戏项目已完成迁移"""
+        with write_transaction(self.path) as conn:
+            conn.execute("INSERT OR REPLACE INTO migrated_games (game, migrated_at, match_count) VALUES (?, ?, ?)",
+                         (game, time.strftime("%Y-%m-%d %H:%M:%S"), match_count))
+
+    def match_rows(self, game, source, folder=None):
+        """按旧数据库 matches 表的字段返回某来源（可限定比赛目录）的比赛数据"""
+        sql = f"SELECT folder, {', '.join(MATCH_COLUMNS)} FROM matches WHERE game = ? AND source = ?"
+        args = [game, source]
+        if folder is not None:
+            sql += " AND folder = ?"
+            args.append(folder)
+        rows = []
+        for values in connect(self.path).execute(sql, args):
+            rows.append(dict(zip(("folder",) + MATCH_COLUMNS, values)))
+        return rows
+
+    def paired_matches(self, game):
+        """
+        一次查询配对同一比赛目录下规范键相同（同一天、同两支队伍）的网络数据和小黑盒数据
+        返回: (网络数据, 小黑盒数据, 比赛目录) 列表，每场网络比赛只取第一条配对
+        """
+        fields = ("match_id", "match_name", "match_time", "team_a", "team_b", "odds_a", "odds_b")
+        select = ", ".join([f"w.{field}" for field in fields] + [f"l.{field}" for field in fields])
+        rows = connect(self.path).execute(f"""
+            SELECT {select}, w.folder
+            FROM matches w JOIN matches l
+              ON l.match_key = w.match_key AND l.source = 'lbb' AND l.folder = w.folder
+            WHERE w.game = ? AND w.source = 'web'
+            ORDER BY w.folder, w.match_id, l.match_id
+        """, (game,)).fetchall()
+        pairs, seen = [], set()
+        for row in rows:
+            web_match = dict(zip(fields, row[:len(fields)]))
+            if web_match["match_id"] in seen:
+                continue
+            seen.add(web_match["match_id"])
+            pairs.append((web_match, dict(zip(fields, row[len(fields):-1])), row[-1]))
+        return pairs
+
+    def append_odds(self, source, snapshots):
+        """
+        追加赔率快照，snapshots 为 (match_key, 采集时间戳, 赔率A, 赔率B) 列表
+        一个写事务内一次查询取得这批比赛的当前赔率，只追加发生变化的快照
+        返回: 追加的记录数
+        """
+        latest = {}
+        for key, ts, odds_a, odds_b in snapshots:
+            if odds_a is None or odds_b is None:
+                continue
+            ts = int(ts)
+            if key not in latest or ts >= latest[key][0]:  # 同一批次同一比赛只保留采集时间最晚的一次
+                latest[key] = (ts, to_hundredths(odds_a), to_hundredths(odds_b))
+        if not latest:
+            return 0
+        keys = list(latest)
+        with write_transaction(self.path) as conn:
+            current = {key: (last_ts, a, b) for key, last_ts, a, b in conn.execute(f"""
+                SELECT match_key, MAX(ts), SUM(d_a), SUM(d_b) FROM odds_history
+                WHERE source = ? AND match_key IN ({",".join("?" * len(keys))})
+                GROUP BY match_key
+            """, [source] + keys)}
+            rows = []
+            for key, (ts, a, b) in latest.items():
+                last_ts, previous_a, previous_b = current.get(key, (None, 0, 0))
+                if last_ts is not None and ts < last_ts:
+                    continue  # 早于已有记录的快照无法接入差值链，丢弃
+                if (a, b) != (previous_a, previous_b):
+                    rows.append((source, key, ts, a - previous_a, b - previous_b))
+            # 同一秒内的第二次变化并入已有记录，累加值保持正确
+            conn.executemany("""
+                INSERT INTO odds_history (source, match_key, ts, d_a, d_b) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(source, match_key, ts) DO UPDATE SET d_a = d_a + excluded.d_a, d_b = d_b + excluded.d_b
+            """, rows)
+        return len(rows)
+
+    def latest_odds(self, source, keys=None):
+        """
+        各比赛的最新赔率
+        返回: {match_key: (最近变化时间戳, 赔率A, 赔率B)}
+        """
+        sql = "SELECT match_key, MAX(ts), SUM(d_a), SUM(d_b) FROM odds_history WHERE source = ?"
+        args = [source]
+        if keys is not None:
+            keys = list(keys)
+            sql += f" AND match_key IN ({','.join('?' * len(keys))})"
+            args += keys
+        rows = connect(self.path).execute(sql + " GROUP BY match_key", args)
+        return {key: (ts, a / 100, b / 100) for key, ts, a, b in rows}
+
+    def odds_history(self, source, key, until_ts=None):
+        """某来源某比赛的赔率变化序列 [(时间戳, 赔率A, 赔率B)]，until_ts 限定截止时间"""
+        sql = """
+            SELECT ts, SUM(d_a) OVER w, SUM(d_b) OVER w FROM odds_history
+            WHERE source = ? AND match_key = ?
+            WINDOW w AS (ORDER BY ts)
+        """
+        rows = connect(self.path).execute(sql, (source, key)).fetchall()
+        return [(ts, a / 100, b / 100) for ts, a, b in rows if until_ts is None or ts <= until_ts]
+
+    def open_close(self, source, key, close_ts=None):
+        """
+        开盘赔率（第一条记录）和收盘赔率（close_ts 之前最后一条，默认为比赛开始时间，未知时取最新）
+        返回: {"open": (时间戳, 赔率A, 赔率B), "close": (...)}，没有记录时为None
+        """
+        if close_ts is None:
+            found = connect(self.path).execute(
+                "SELECT start_ts FROM matches WHERE match_key = ? AND start_ts IS NOT NULL LIMIT 1", (key,)).fetchone()
+            close_ts = found[0] if found else None
+        history = self.odds_history(source, key, until_ts=close_ts)
+        if not history:
+            return None
+        return {"open": history[0], "close": history[-1]}
+
+    def downsample(self, source, key, interval, start=None, end=None):
+        """
+        按固定时间间隔降采样：每个区间取区间结束时的赔率（区间内无变化时沿用上一区间）
+        返回: [(区间起始时间戳, 赔率A, 赔率B)]，从第一条记录所在区间（或 start）到 end（默认为当前时间）
+        """
+        history = self.odds_history(source, key)
+        if not history:
+            return []
+        start = history[0][0] if start is None else start
+        end = int(time.time()) if end is None else end
+        bucket = start - start % interval
+        result, index, value = [], 0, None
+        while bucket <= end:
+            while index < len(history) and history[index][0] < bucket + interval:
+                value = history[index][1:]
+                index += 1
+            if value is not None:
+                result.append((bucket,) + value)
+            bucket += interval
+        return result
+
+def legacy_matches(data_dir, game, source):
+    """
+    兼容读取：从旧目录结构读取某来源的比赛数据
+    返回: 含 folder 字段的比赛数据字典列表（旧表中缺少的字段为None）
+    """
+    game_folder = os.path.join(data_dir, game)
+    if source == "lbb_default":
+        paths = [(None, os.path.join(game_folder, SOURCES[source]))]
+    else:
+        folders = sorted(d for d in os.listdir(game_folder)
+                         if os.path.isdir(os.path.join(game_folder, d)) and not d.startswith('.')) \
+            if os.path.isdir(game_folder) else []
+        paths = [(folder, os.path.join(game_folder, folder, SOURCES[source])) for folder in folders]
+
+    rows = []
+    for folder, db_path in paths:
+        if not os.path.exists(db_path):
+            continue
+        try:
+            with read_only(db_path) as conn:
+                cursor = conn.execute("SELECT * FROM matches")
+                columns = [description[0] for description in cursor.description]
+                values_list = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"[赔率库] 读取 {db_path} 失败: {e}")
+            continue
+        for values in values_list:
+            row = dict.fromkeys(MATCH_COLUMNS)
+            row.update((column, value) for column, value in zip(columns, values) if column in row)
+            row["folder"] = folder
+            rows.append(row)
+    return rows
+
+def read_matches(data_dir, game, source, folder=None):
+    """兼容读取入口：该游戏项目已迁移时从统一库读取，否则读取旧目录结构"""
+    store = OddsStore(data_dir)
+    if store.is_migrated(game):
+        return store.match_rows(game, source, folder)
+    rows = legacy_matches(data_dir, game, source)
+    return [row for row in rows if folder is None or row["folder"] == folder]
+
+def migrate(data_dir):
+    """
+    一次性迁移：将旧目录结构中各游戏项目的比赛、映射和凯利结果导入 odds.db，
+    每个游戏项目导入完成后记录到 migrated_games，之后的读取才切换到统一库；
+    可重复执行（按主键覆盖）
+    返回: {游戏项目: 导入的比赛数据条数}
+    """
+    store = OddsStore(data_dir)
+    games = sorted(d for d in os.listdir(data_dir)
+                   if os.path.isdir(os.path.join(data_dir, d)) and not d.startswith('.'))
+    counts = {}
+    for game in games:
+        game_folder = os.path.join(data_dir, game)
+        counts[game] = 0
+        for source in SOURCES:
+            rows = legacy_matches(data_dir, game, source)
+            counts[game] += store.upsert_matches(game, source, rows)
+            # 旧数据库只保存最新赔率，作为赔率历史的第一条快照（default来源与lbb为同一数据）
+            history_source = "lbb" if source == "lbb_default" else source
+            store.append_odds(history_source, [
+                (match_key(game, row["match_time"], row["team_a"], row["team_b"]),
+                 start_ts(row["last_updated"]) or int(time.time()), row["odds_a"], row["odds_b"])
+                for row in rows
+            ])
+
+        mappings_path = os.path.join(game_folder, "mappings.db")
+        if os.path.exists(mappings_path):
+            try:
+                with read_only(mappings_path) as conn:
+                    store.save_name_mappings(game, conn.execute(
+                        "SELECT lbb_match_name, web_match_name, last_updated FROM match_name_mapping WHERE game_name = ?",
+                        (game,)).fetchall())
+                    store.save_team_mappings(game, conn.execute(
+                        "SELECT lbb_team, web_team, last_updated FROM team_mapping WHERE game_name = ?",
+                        (game,)).fetchall())
+            except sqlite3.Error as e:
+                print(f"[赔率库] 读取 {mappings_path} 失败: {e}")
+
+        kelly_path = os.path.join(game_folder, "kelly_results.db")
+        if os.path.exists(kelly_path):
+            try:
+                with read_only(kelly_path) as conn:
+                    cursor = conn.execute(f"SELECT {', '.join(KELLY_COLUMNS)} FROM kelly_results")
+                    store.save_kelly_results(game, [dict(zip(KELLY_COLUMNS, values)) for values in cursor])
+            except sqlite3.Error as e:
+                print(f"[赔率库] 读取 {kelly_path} 失败: {e}")
+        store.mark_migrated(game, counts[game])
+        print(f"[赔率库] {game}: 导入 {counts[game]} 条比赛数据")
+    return counts
+
+if __name__ == "__main__":
+    # 用法: python odds_store.py migrate [数据目录]
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("用法: python odds_store.py migrate [数据目录]")
+        sys.exit(1)
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    counts = migrate(data_dir)
+    print(f"[赔率库] 迁移完成: {sum(counts.values())} 条比赛数据，{len(counts)} 个游戏项目 -> {os.path.join(data_dir, OddsStore.FILE_NAME)}")
@@ -0,0 +1,179 @@
+# page_classifier.py - 单帧页面分类：通过页面指纹库判断当前所在页面，并给出到达赛事中心的点击路径
+import os
+import sys
+import json
+import glob
+import cv2
+import numpy as np
+from anchor_manager import AnchorManager
+
+# 页面及其到达赛事中心所需依次点击的锚点
+# event_list: 赛事中心列表页（有刷新按钮），即导航目标
+# event_entry: 有"赛事中心"入口的页面
+# home: 有"游戏库"标签的首页
+PAGE_ROUTES = {
+    "event_list": [],
+    "event_entry": ["event_center"],
+    "home": ["game_library", "event_center"],
+}
+
+# 用于自动标注录制帧的锚点：按顺序第一个命中的锚点决定页面
+PAGE_ANCHORS = [("refresh", "event_list"), ("event_center", "event_entry"), ("game_library", "home")]
+
+class PageClassifier:
+    """
+    页面分类器：页面指纹取固定的顶部栏和底部栏（排除内容随列表变化的滚动区域），
+    缩成小尺寸灰度图并归一化，与指纹库中各页面的指纹求相关系数，一次计算即可判断页面
+    """
+    BANDS = ((0, 180), (1040, 1280))  # 指纹使用的行范围
+    THUMB_SIZE = (24, 6)              # 每个行范围缩放后的 (宽, 高)
+
+    def __init__(self, db_path=os.path.join('config', 'pages.json'), threshold=0.9, margin=0.02,
+                 max_per_page=20):
+        """
+        db_path: 指纹库文件
+        threshold: 判定为某页面的最低相关系数
+        margin: 最佳页面与次佳页面的最小得分差，差距过小时视为无法判断
+        max_per_page: 每个页面最多保存的指纹数
+        """
+        self.db_path = db_path
+        self.threshold = threshold
+        self.margin = margin
+        self.max_per_page = max_per_page
+        self.pages = {}
+        self.load()
+
+    def load(self):
+        """加载指纹库"""
+        self.pages = {}
+        if os.path.exists(self.db_path):
+            with open(self.db_path, 'r', encoding='utf-8') as f:
+                for name, fingerprints in json.load(f).items():
+                    self.pages[name] = [np.array(fp, dtype=np.float32) for fp in fingerprints]
+            print(f"[页面] 已加载 {len(self.pages)} 个页面指纹: {list(self.pages)}")
+        self._stack()
+
+    def _stack(self):
+        """将所有指纹堆叠为矩阵，分类时一次矩阵乘法完成比较"""
+        labels, vectors = [], []
+        for name, fingerprints in self.pages.items():
+            labels.extend([name] * len(fingerprints))
+            vectors.extend(fingerprints)
+        self.labels = labels
+        self.matrix = np.stack(vectors) if vectors else None
+
+    def save(self):
+        """保存指纹库"""
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        data = {name: [np.round(fp, 4).tolist() for fp in fingerprints] for name, fingerprints in self.pages.items()}
+        with open(self.db_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @property
+    def ready(self):
+        return self.matrix is not None
+
+    def fingerprint(self, img_np):
+        """计算页面指纹：顶部栏和底部栏的缩略灰度图，零均值单位长度"""
+        gray = img_np if img_np.ndim == 2 else cv2.cvtColor(img_np[:, :, :3], cv2.COLOR_BGR2GRAY)
+        parts = []
+        for top, bottom in self.BANDS:
+            band = gray[min(top, gray.shape[0] - 1):min(bottom, gray.shape[0])]
+            parts.append(cv2.resize(band, self.THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32).ravel())
+        vector = np.concatenate(parts)
+        vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def classify(self, img_np):
+        """
+        判断截图所在页面
+        返回: (页面名, 相关系数)；指纹库为空、得分过低或与其他页面难以区分时页面名为None
+        """
+        if self.matrix is None or img_np is None:
+            return None, 0.0
+        scores = self.matrix @ self.fingerprint(img_np)
+        best = {}
+        for label, score in zip(self.labels, scores):
+            best[label] = max(best.get(label, -1.0), float(score))
+        ranked = sorted(best.items(), key=lambda item: -item[1])
+        page, score = ranked[0]
+        if score < self.threshold:
+            return None, score
+        if len(ranked) > 1 and score - ranked[1][1] < self.margin:
+            return None, score
+        return page, score
+
+    def route(self, page):
+        """返回从该页面到达赛事中心需要依次点击的锚点名；未知页面返回None"""
+        return PAGE_ROUTES.get(page)
+
+    def add(self, page, img_np):
+        """将截图加入指定页面的指纹，与已有指纹几乎相同时跳过；返回是否加入"""
+        vector = self.fingerprint(img_np)
+        fingerprints = self.pages.setdefault(page, [])
+        if any(float(vector @ fp) > 0.99 for fp in fingerprints):
+            return False
+        fingerprints.append(vector)
+        del fingerprints[:-self.max_per_page]
+        self._stack()
+        return True
+
+    def build(self, frames, anchors=None):
+        """用锚点模板自动标注录制的帧并加入指纹库，返回各页面新增的指纹数"""
+        anchors = anchors if anchors is not None else AnchorManager()
+        added = {}
+        for frame in frames:
+            for anchor_name, page in PAGE_ANCHORS:
+                if anchors.locate(frame, anchor_name):
+                    if self.add(page, frame):
+                        added[page] = added.get(page, 0) + 1
+                    break
+        return added
+
+def load_frames(source):
+    """从会话目录（session_replay 录制）或截图文件加载帧"""
+    if os.path.isdir(source):
+        frames = []
+        for path in sorted(glob.glob(os.path.join(source, "frames_*.npz"))):
+            with np.load(path) as chunk:
+                frames.extend(chunk[key] for key in chunk.files)
+        return frames
+    image = cv2.imread(source, cv2.IMREAD_COLOR)
+    return [image] if image is not None else []
+
+if __name__ == "__main__":
+    # 用法:
+    #   python page_classifier.py build <会话目录|截图文件> ...    用锚点模板自动标注并建库
+    #   python page_classifier.py add <页面名> <截图文件|--live>   手动标注
+    #   python page_classifier.py classify <截图文件|--live>
+    usage = ("用法: python page_classifier.py build <会话目录|截图文件> ...\n"
+             "      python page_classifier.py add <页面名> <截图文件|--live>\n"
+             "      python page_classifier.py classify <截图文件|--live>")
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "add", "classify"):
+        print(usage)
+        sys.exit(1)
+
+    def read_source(source):
+        if source == "--live":
+            from anchor_manager import capture_live_screenshot
+            return [capture_live_screenshot()]
+        return load_frames(source)
+
+    classifier = PageClassifier()
+    if sys.argv[1] == "build":
+        frames = [frame for source in sys.argv[2:] for frame in load_frames(source)]
+        added = classifier.build(frames)
+        classifier.save()
+        print(f"[页面] 处理 {len(frames)} 帧，新增指纹: {added}")
+    elif sys.argv[1] == "add":
+        if len(sys.argv) < 4 or sys.argv[2] not in PAGE_ROUTES:
+            print(f"[页面] 页面名须为: {list(PAGE_ROUTES)}")
+            sys.exit(1)
+        added = sum(classifier.add(sys.argv[2], frame) for frame in read_source(sys.argv[3]))
+        classifier.save()
+        print(f"[页面] {sys.argv[2]} 新增 {added} 个指纹")
+    else:
+        for frame in read_source(sys.argv[2]):
+            page, score = classifier.classify(frame)
+            print(f"[页面] 当前页面: {page}，得分 {score:.3f}，路径: {classifier.route(page)}")
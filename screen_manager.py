@@ -1,31 +1,217 @@
 # screen_manager.py
 import time
+import re
+import difflib
+import cv2
 import numpy as np
 import logging
+from collections import namedtuple, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from anchor_manager import AnchorManager
+from ocr_cache import OCRCache
+from frame_diff import compare_frames, changed_region, intersect_rois
+from virtual_page import VirtualPage
+from frame_index import FrameOCR
+from ocr_backend import guess_field
+from capture_service import CaptureService
+
+# 一次等待的记录：标签、预算（原固定等待时长）、实际耗时、是否在预算内满足条件
+WaitRecord = namedtuple("WaitRecord", ["label", "budget", "elapsed", "settled"])
 
 class ScreenManager:
     """
     屏幕管理器：负责与模拟器界面交互，包括截图、识别、点击和滑动操作，
     以及提取比赛数据
     """
-    def __init__(self, controller, ocr):
-        """初始化屏幕管理器"""
+    SCROLL_REGION = (180, 1040)  # 列表滚动区域的行范围，排除固定的顶部标签栏和底部按钮
+    BADGE_COLUMN = (290, 140)    # "预测中"标签所在列的 (x, 宽度)
+    WAIT_LOG_SIZE = 1000         # 等待记录上限，防止长时间运行时无限增长
+    OCR_TIMEOUT = 30             # 等待单次异步识别结果的最长时间（秒），OCR服务工作进程卡住时放弃该次识别
+
+    def __init__(self, controller, ocr, rec_only_labels=True, label_threshold=0.66, anchors=None,
+                 ocr_cache_size=512, scan_mode="fixed", clock=None, dirty_region=True, card_store=None,
+                 field_charsets=None):
+        """
+        初始化屏幕管理器
+        rec_only_labels: 固定位置的标签检查（刷新、预测中、游戏库、赛事中心）是否跳过检测模型，仅运行识别模型
+        label_threshold: 仅识别模式下，识别文本与预期标签的最低相似度
+        anchors: 界面锚点管理器，默认从 config/anchors 加载模板
+        ocr_cache_size: OCR结果缓存条数，所有方法共享同一缓存，0表示不缓存
+        scan_mode: fixed - 按固定区域逐个刷新扫描；stitched - 单次滚动拼接虚拟长页面扫描
+        clock: 提供 time()/sleep() 的时钟，默认为 time 模块；回放录制的会话时传入虚拟时钟
+        dirty_region: 弹窗识别时只识别点击前后发生变化的区域（与倒T形区域的交集）
+        card_store: 卡片指纹库，提供时未变化且未过期的卡片直接使用上次解析结果，不再打开弹窗
+        field_charsets: {字段类型: 字符白名单}，仅识别时按字段类型限制解码字符（如赔率只解码数字和'.'），
+                        字段类型见 ocr_backend.FIELD_CHARSETS，需OCR后端支持受限解码
+        """
         self.controller = controller
-        self.ocr = ocr
+        self.clock = clock if clock is not None else time
+        self.ocr = ocr if isinstance(ocr, OCRCache) else OCRCache(ocr, maxsize=ocr_cache_size)
+        self.rec_only_labels = rec_only_labels
+        self.label_threshold = label_threshold
+        self.anchors = anchors if anchors is not None else AnchorManager()
+        self.scan_mode = scan_mode
+        self.dirty_region = dirty_region
+        self.card_store = card_store
+        self.field_charsets = field_charsets or {}
+        self.current_event = None  # 正在扫描的游戏项目，卡片指纹按项目区分
+        self.last_page = None  # 最近一次拼接扫描的虚拟页面，便于调试
+        self.capture = None  # 后台截图服务，start_capture() 后启用
+        self.last_input_time = 0.0  # 最近一次点击/滑动的时间，之后的截图才反映操作结果
+        self.wait_log = deque(maxlen=self.WAIT_LOG_SIZE)  # 每次等待的实际耗时记录，每次扫描结束时清空
+        self.last_popup = None  # 最近一次弹窗截图，低置信度字段重新识别时使用
+        self.last_index = None  # 最近一次建立的单帧OCR索引，画面未变化时复用
+        self.index_builds = 0
+        self.index_reuses = 0
+        self.rereads = 0
+        self.reread_fixes = 0
         print("[屏幕] 初始化屏幕管理器")
 
+    def start_capture(self, ring_size=4, interval=0.0):
+        """启动后台截图服务，之后的截图从环形缓冲区获取"""
+        if self.capture is None:
+            self.capture = CaptureService(self.controller, ring_size=ring_size, interval=interval, clock=self.clock)
+        self.capture.start()
+
+    def stop_capture(self):
+        """停止后台截图服务，恢复同步截图"""
+        if self.capture is not None:
+            self.capture.stop()
+
+    def grab_frame(self, view=False, fresh=False):
+        """
+        获取当前屏幕截图
+        后台截图服务运行时，返回最近一次点击/滑动之后截取的帧；否则同步截图
+        view: 返回环形缓冲区的零拷贝只读视图，该视图在之后第 ring_size 帧被覆盖，
+              仅用于立即比较、不跨越滑动/等待或异步识别的场景；默认返回副本
+        fresh: 要求返回调用之后才截取的新帧（轮询等待时使用）
+        返回: numpy图像，截图失败时返回None
+        """
+        if self.capture is not None and self.capture.running:
+            after = self.clock.time() if fresh else self.last_input_time
+            while True:
+                frame = self.capture.next_frame(after=after)
+                if frame is None:
+                    print("[屏幕] 等待后台截图超时")
+                    return None
+                if view:
+                    return frame.image
+                image = frame.image.copy()
+                # 复制期间缓冲区被后台线程覆盖时副本可能混有两帧内容，改取最新一帧
+                if self.capture.is_current(frame):
+                    return image
+
+        self.controller.post_screencap().wait()
+        image = self.controller.cached_image
+        if image is None or image.size == 0:
+            return None
+        return np.array(image)
+
+    def wait_for(self, predicate, timeout, interval=0.1, label="等待"):
+        """
+        轮询等待条件成立，超过 timeout 秒仍不成立则放弃
+        返回: predicate 最后一次的返回值；实际耗时记录到 wait_log
+        """
+        start = self.clock.time()
+        result = predicate()
+        while not result and self.clock.time() - start < timeout:
+            self.clock.sleep(interval)
+            result = predicate()
+        elapsed = self.clock.time() - start
+        self.wait_log.append(WaitRecord(label, timeout, elapsed, bool(result)))
+        return result
+
+    def wait_until_stable(self, timeout, reference=None, interval=0.1, threshold=0.995, label="画面稳定",
+                          change_timeout=None):
+        """
+        等待画面稳定：连续两帧无滚动偏移且相似度超过阈值
+        reference: 操作前的截图；提供时需先等到画面相对它发生变化，避免在界面响应之前就判定为稳定
+        timeout: 等待上限（即原来的固定等待时长），条件满足时提前返回
+        change_timeout: 等待画面变化的上限，超过后不再要求变化、只等画面稳定
+                        （操作后的画面可能与操作前相同，如重新加载出同样的列表）
+        返回: 最后截取的一帧（超时也返回），截图失败时为None
+        """
+        start = self.clock.time()
+        state = {"previous": None, "changed": reference is None, "frame": None}
+
+        def settled():
+            frame = self.grab_frame(fresh=True)
+            if frame is None:
+                return False
+            state["frame"] = frame
+            if not state["changed"]:
+                comparison = compare_frames(reference, frame)
+                state["changed"] = comparison.offset != 0 or comparison.similarity < threshold or \
+                    (change_timeout is not None and self.clock.time() - start >= change_timeout)
+                state["previous"] = frame
+                return False
+            previous, state["previous"] = state["previous"], frame
+            if previous is None:
+                return False
+            comparison = compare_frames(previous, frame)
+            return comparison.offset == 0 and comparison.similarity >= threshold
+
+        self.wait_for(settled, timeout, interval=interval, label=label)
+        return state["frame"]
+
+    def wait_summary(self):
+        """汇总等待记录：次数、实际总耗时、固定等待总预算"""
+        elapsed = sum(record.elapsed for record in self.wait_log)
+        budget = sum(record.budget for record in self.wait_log)
+        return len(self.wait_log), elapsed, budget
+
+    def click(self, x, y):
+        """点击指定坐标"""
+        self.controller.post_click(x, y).wait()
+        self.last_input_time = self.clock.time()
+
+    def swipe(self, x1, y1, x2, y2, duration):
+        """从 (x1, y1) 滑动到 (x2, y2)"""
+        self.controller.post_swipe(x1, y1, x2, y2, duration).wait()
+        self.last_input_time = self.clock.time()
+
     def get_center_coordinates(self, box):
         """计算矩形框中心坐标，用于精确点击"""
         x_coords = [point[0] for point in box]
         y_coords = [point[1] for point in box]
         return int(sum(x_coords) / len(x_coords)), int(sum(y_coords) / len(y_coords))
 
+    def label_score(self, text, expected_text):
+        """计算识别文本与预期标签的相似度：包含预期标签时为1，否则为字符串相似度"""
+        text = re.sub(r'\s+', '', str(text))
+        if expected_text in text:
+            return 1.0
+        return difflib.SequenceMatcher(None, text, expected_text).ratio()
+
+    def recognize_label(self, img_np, roi, expected_text):
+        """
+        仅识别模式：对固定位置的小区域跳过文本检测，直接运行识别模型，
+        并按预期标签校验识别结果
+        """
+        x, y, w, h = roi
+        cropped_img = img_np[max(0, y):y+h, max(0, x):x+w]
+        if cropped_img.size == 0:
+            return False
+        # 标签不使用受限解码：需要识别出真实文本才能与预期标签比较
+        result = self.ocr.ocr(cropped_img, det=False, cls=False)
+        if not result or not result[0]:
+            return False
+        text, _ = result[0][0]
+        return self.label_score(text, expected_text) >= self.label_threshold
+
+    def charset_kwargs(self, field):
+        """字段类型配置了字符白名单时返回受限解码参数，否则返回空参数"""
+        charset = self.field_charsets.get(field)
+        return {"charset": charset} if charset else {}
+
     def check_text_in_roi(self, img_np, roi, expected_text):
         """检查指定区域(ROI)内的文本是否包含预期文本"""
         try:
             x, y, w, h = roi
             if x + w > img_np.shape[1] or y + h > img_np.shape[0]:
                 return False
+            if self.rec_only_labels:
+                return self.recognize_label(img_np, roi, expected_text)
             cropped_img = img_np[y:y+h, x:x+w]
             result = self.ocr.ocr(cropped_img, cls=False)
             if not result or not result[0]:
@@ -36,104 +222,317 @@ class ScreenManager:
             print(f"[屏幕] 检查文本时出错: {e}")
             return False
 
+    def roi_to_box(self, roi):
+        """将 [x, y, w, h] 区域转换为四点框"""
+        x, y, w, h = roi[:4]
+        return [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+
+    def frame_index(self, img_np, region):
+        """
+        获取截图在指定区域上的OCR索引：与上一次建立索引的画面相同（无偏移且相似度足够高）
+        且区域被覆盖时直接复用，否则对该区域做一次检测+识别并建立新索引
+        """
+        index = self.last_index
+        if index is not None and index.covers(region):
+            comparison = compare_frames(index.frame, img_np, region=(region[1], region[1] + region[3]))
+            if comparison.offset == 0 and comparison.similarity >= 0.995:
+                self.index_reuses += 1
+                return index
+        self.index_builds += 1
+        frame = np.array(img_np)  # 先复制再识别，索引保存的画面与识别时的内容一致
+        index = FrameOCR.from_result(self.ocr_rois(frame, [region])[0], frame=frame, region=list(region))
+        self.last_index = index
+        return index
+
+    def find_anchor(self, img_np, name, roi=None, index_region=None):
+        """
+        定位静态界面元素：优先使用模板匹配，未命中时回退到OCR
+        roi: 可选，在指定区域附近查找（如固定区域中的"预测中"标签）
+        index_region: 可选，OCR回退时对该区域建立单帧索引并在索引中查询roi，
+                      同一画面上的多个区域检查共用一次推理
+        返回: 元素所在区域 [x, y, w, h]，未找到时返回None
+        """
+        spec = self.anchors.get(name)
+        located = self.anchors.locate(img_np, name, roi)
+        if located:
+            return list(located[:4])
+
+        # 模板未命中，回退到OCR
+        target_roi = list(roi) if roi is not None else spec["roi"]
+        if index_region is not None:
+            margin = self.anchors.margin
+            query = [target_roi[0] - margin, target_roi[1] - margin,
+                     target_roi[2] + 2 * margin, target_roi[3] + 2 * margin]
+            item = self.frame_index(img_np, index_region).find(spec["text"], query)
+            return FrameOCR.bounds(item) if item is not None else None
+        if self.rec_only_labels:
+            return target_roi if self.recognize_label(img_np, target_roi, spec["text"]) else None
+        search_roi = target_roi if roi is not None else spec.get("search", spec["roi"])
+        for item in self.ocr_rois(img_np, [search_roi])[0]:
+            if spec["text"] in str(item[1][0]):
+                xs = [point[0] for point in item[0]]
+                ys = [point[1] for point in item[0]]
+                return [int(min(xs)), int(min(ys)), int(max(xs) - min(xs)), int(max(ys) - min(ys))]
+        return None
+
     def click_roi(self, roi):
         """点击指定区域的中心点"""
         x, y, w, h = roi
         center_x = x + w // 2
         center_y = y + h // 2
         print(f"[屏幕] 点击区域: ({x},{y},{w},{h}) 中心点: ({center_x}, {center_y})")
-        self.controller.post_click(center_x, center_y).wait()
+        self.click(center_x, center_y)
+
+    def _pack_rois(self, img_np, rois, gap):
+        """将各ROI纵向拼接到一张画布上，返回 (画布, 各区域位置, 裁剪信息)，无有效区域时返回None"""
+        crops = []
+        for x, y, w, h in rois:
+            x, y = max(0, x), max(0, y)
+            w = min(w, img_np.shape[1] - x)
+            h = min(h, img_np.shape[0] - y)
+            crops.append((x, y, img_np[y:y + h, x:x + w]) if w > 0 and h > 0 else (x, y, None))
+
+        valid = [c for c in crops if c[2] is not None]
+        if not valid:
+            return None
+
+        # 拼接画布：各区域之间留出空白间隔，避免检测框跨区域合并
+        canvas_w = max(c[2].shape[1] for c in valid)
+        canvas_h = sum(c[2].shape[0] for c in valid) + gap * (len(valid) - 1)
+        canvas = np.zeros((canvas_h, canvas_w) + img_np.shape[2:], dtype=img_np.dtype)
+        slots = []  # (区域序号, 画布y偏移, 区域高度)
+        offset = 0
+        for index, (x, y, crop) in enumerate(crops):
+            if crop is None:
+                continue
+            canvas[offset:offset + crop.shape[0], :crop.shape[1]] = crop
+            slots.append((index, offset, crop.shape[0]))
+            offset += crop.shape[0] + gap
+        return canvas, slots, crops
+
+    def _unpack_rois(self, result, slots, crops):
+        """将画布上的识别结果按所在区域拆分，并把框映射回整帧坐标"""
+        results = [[] for _ in crops]
+        if not result or not result[0]:
+            return results
 
-    def crop_and_recognize(self, center_x, center_y):
-        """截取并识别指定点附近的倒T形状区域文本"""
-        self.controller.post_screencap().wait()
-        image = self.controller.cached_image
-        if image is None or image.size == 0:
+        for item in result[0]:
+            if not item or len(item) < 2 or len(item[1]) == 0:
+                continue
+            _, center_y = self.get_center_coordinates(item[0])
+            for index, slot_y, slot_h in slots:
+                if slot_y <= center_y < slot_y + slot_h:
+                    x, y, _ = crops[index]
+                    box = [[px + x, py - slot_y + y] for px, py in item[0]]
+                    results[index].append([box, item[1]])
+                    break
+        return results
+
+    def ocr_rois_async(self, img_np, rois, gap=32):
+        """
+        异步批量识别多个区域，返回Future，结果格式同 ocr_rois
+        OCR对象为OCR服务客户端时在后台进程识别，调用方可继续执行点击/滑动
+        """
+        future = Future()
+        packed = self._pack_rois(img_np, rois, gap)
+        if packed is None:
+            future.set_result([[] for _ in rois])
+            return future
+        canvas, slots, crops = packed
+
+        def unpack(done):
+            try:
+                future.set_result(self._unpack_rois(done.result(), slots, crops))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.ocr.submit(canvas, cls=False).add_done_callback(unpack)
+        return future
+
+    def wait_ocr(self, future, default):
+        """等待异步识别结果，超过 OCR_TIMEOUT 仍未完成（或OCR服务报告超时）时返回 default"""
+        try:
+            return future.result(timeout=self.OCR_TIMEOUT)
+        except (TimeoutError, FutureTimeoutError) as e:
+            print(f"[屏幕] 等待识别结果超时，放弃本次识别: {e}")
+            return default
+
+    def ocr_rois(self, img_np, rois, gap=32):
+        """
+        批量识别多个区域：将各ROI纵向拼接为一张图，只进行一次检测+识别，
+        再将结果框映射回整帧坐标
+        返回: 与rois一一对应的列表，每项为PaddleOCR格式的 [box, (text, score)] 列表
+        """
+        return self.wait_ocr(self.ocr_rois_async(img_np, rois, gap), [[] for _ in rois])
+
+    def crop_and_recognize_async(self, center_x, center_y, img_np=None, changed=None):
+        """
+        异步截取并识别指定点附近的倒T形状区域文本，返回Future
+        img_np 为空时重新截图
+        changed: 画面发生变化的区域 (x, y, w, h)，提供时只识别倒T形区域与它的交集
+        """
+        future = Future()
+        if img_np is None:
+            img_np = self.grab_frame()
+        if img_np is None:
             print("[屏幕] 截图失败")
-            return []
+            future.set_result([])
+            return future
         
-        img_np = np.array(image)
         print(f"[屏幕] 识别中心点 ({center_x}, {center_y}) 周围的倒T形区域")
         
         # 定义倒T形状的两个区域，以 center_x, center_y 为基准
-        # 上方区域 [255, y-65, 228, 100]
-        upper_x = 255
-        upper_y = max(0, center_y - 65)  # 防止越界
-        upper_w = 228
-        upper_h = 100
-        if upper_y + upper_h > img_np.shape[0] or upper_x + upper_w > img_np.shape[1]:
-            print("[屏幕] 上方区域超出图像边界，正在调整")
-            upper_h = min(upper_h, img_np.shape[0] - upper_y)
-            upper_w = min(upper_w, img_np.shape[1] - upper_x)
-        upper_crop = img_np[upper_y:upper_y + upper_h, upper_x:upper_x + upper_w]
-
-        # 下方区域 [5, y+35, 710, 185]
-        lower_x = 5
-        lower_y = center_y + 35
-        lower_w = 710
-        lower_h = 185
-        if lower_y + lower_h > img_np.shape[0] or lower_x + lower_w > img_np.shape[1]:
-            print("[屏幕] 下方区域超出图像边界，正在调整")
-            lower_h = min(lower_h, img_np.shape[0] - lower_y)
-            lower_w = min(lower_w, img_np.shape[1] - lower_x)
-        lower_crop = img_np[lower_y:lower_y + lower_h, lower_x:lower_x + lower_w]
-
-        # 对两个区域分别进行 OCR 识别
-        upper_result = self.ocr.ocr(upper_crop, cls=False)
-        lower_result = self.ocr.ocr(lower_crop, cls=False)
-
-        # 初始化返回结果
-        text_data = []
-
-        # 处理上方区域的结果
-        if upper_result and upper_result[0]:
-            for item in upper_result[0]:
-                if item and len(item) > 1 and len(item[1]) > 0:
-                    coords = self.get_center_coordinates(item[0])
-                    adjusted_coords = [coords[0] + upper_x, coords[1] + upper_y]
-                    text_data.append({
-                        "text": str(item[1][0]).strip(),
-                        "coordinates": adjusted_coords
-                    })
-
-        # 处理下方区域的结果
-        if lower_result and lower_result[0]:
-            for item in lower_result[0]:
-                if item and len(item) > 1 and len(item[1]) > 0:
-                    coords = self.get_center_coordinates(item[0])
-                    adjusted_coords = [coords[0] + lower_x, coords[1] + lower_y]
-                    text_data.append({
-                        "text": str(item[1][0]).strip(),
-                        "coordinates": adjusted_coords
-                    })
-
-        if not text_data:
-            print("[屏幕] 在指定的T形区域中未识别到文本")
-        else:
-            print(f"[屏幕] 识别到 {len(text_data)} 个文本项")
-        
-        return text_data
+        # 上方区域 [255, y-65, 228, 100]，下方区域 [5, y+35, 710, 185]
+        # 超出图像边界的部分由 ocr_rois 自动裁剪
+        upper_region = [255, max(0, center_y - 65), 228, 100]
+        lower_region = [5, center_y + 35, 710, 185]
+        regions = [upper_region, lower_region]
+        if changed is not None:
+            regions = [roi for roi in (intersect_rois(r, changed) for r in regions) if roi is not None]
+            print(f"[屏幕] 仅识别变化区域 {list(changed)} 内的 {len(regions)} 个子区域")
+
+        def collect(done):
+            try:
+                text_data = []
+                for region_items in done.result():
+                    for item in region_items:
+                        text_data.append({
+                            "text": str(item[1][0]).strip(),
+                            "coordinates": list(self.get_center_coordinates(item[0])),
+                            "confidence": float(item[1][1]),
+                            "box": [[int(px), int(py)] for px, py in item[0]]
+                        })
+            except Exception as e:
+                future.set_exception(e)
+                return
+
+            if not text_data:
+                print("[屏幕] 在指定的T形区域中未识别到文本")
+            else:
+                print(f"[屏幕] 识别到 {len(text_data)} 个文本项")
+            future.set_result(text_data)
+
+        # 两个区域合并为一次 OCR 识别
+        self.ocr_rois_async(img_np, regions).add_done_callback(collect)
+        return future
+
+    def crop_and_recognize(self, center_x, center_y, img_np=None):
+        """截取并识别指定点附近的倒T形状区域文本，img_np 为空时重新截图"""
+        return self.wait_ocr(self.crop_and_recognize_async(center_x, center_y, img_np), [])
 
-    def process_predict_box(self, box):
-        """点击'预测中'按钮并截取内容"""
+    def process_predict_box(self, box, before=None):
+        """
+        点击'预测中'按钮并截取内容
+        弹窗识别异步提交，关闭弹窗和等待画面稳定与识别同时进行
+        before: 点击前的列表页截图，为空时重新截图
+        """
         center_x, center_y = self.get_center_coordinates(box)
         print(f"[屏幕] 点击'预测中'按钮，坐标: ({center_x}, {center_y})")
-        self.controller.post_click(center_x, center_y).wait()
-        time.sleep(0.3)
-        text_data = self.crop_and_recognize(center_x, center_y)
-        time.sleep(0.3)
-        self.controller.post_click(center_x, center_y).wait()  # 点击关闭弹窗
-        return text_data
-
-    def swipe_screen(self, distance=180):
+        if before is None:
+            before = self.grab_frame()
+        self.click(center_x, center_y)
+        popup = self.wait_until_stable(0.3, reference=before, label="弹窗打开")
+        self.last_popup = popup
+        # 只识别弹窗带来的变化区域；检测不到变化时（如截图失败）识别完整的倒T形区域
+        changed = changed_region(before, popup) if self.dirty_region else None
+        pending = self.crop_and_recognize_async(center_x, center_y, popup, changed=changed)
+        self.click(center_x, center_y)  # 点击关闭弹窗
+        self.wait_until_stable(0.3, reference=popup, label="弹窗关闭")
+        return self.wait_ocr(pending, [])
+
+    def reread_text_item(self, item, img_np=None, scale=2, pad=4):
+        """
+        对单个低置信度文本项重新识别：按其文本框从弹窗截图中裁剪并放大，只运行识别模型
+        img_np 为空时使用最近一次弹窗截图
+        返回: 置信度更高时为更新后的文本项副本，否则为原文本项
+        """
+        img_np = img_np if img_np is not None else self.last_popup
+        if img_np is None or "box" not in item:
+            return item
+        xs = [point[0] for point in item["box"]]
+        ys = [point[1] for point in item["box"]]
+        x0, y0 = max(0, min(xs) - pad), max(0, min(ys) - pad)
+        x1, y1 = min(img_np.shape[1], max(xs) + pad), min(img_np.shape[0], max(ys) + pad)
+        if x1 <= x0 or y1 <= y0:
+            return item
+        crop = cv2.resize(img_np[y0:y1, x0:x1], None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        self.rereads += 1
+        # 按初次识别的文本推断字段类型，赔率/时间等字段只在白名单字符中解码
+        result = self.ocr.ocr(crop, det=False, cls=False, **self.charset_kwargs(guess_field(item["text"])))
+        if not result or not result[0]:
+            return item
+        text, confidence = result[0][0]
+        text = str(text).strip()
+        if not text or confidence <= item.get("confidence", 0.0):
+            return item
+        print(f"[屏幕] 重新识别: '{item['text']}'({item.get('confidence', 0.0):.2f}) -> '{text}'({confidence:.2f})")
+        self.reread_fixes += 1
+        return dict(item, text=text, confidence=float(confidence))
+
+    def read_predict_card(self, box, data_mgr):
+        """
+        打开'预测中'卡片弹窗，识别并解析比赛数据，失败时返回None
+        启用卡片指纹库时，列表页上卡片外观未变化且数据未过期则直接返回上次的解析结果
+        """
+        before = self.grab_frame()
+        key = None
+        if self.card_store is not None:
+            key = self.card_store.fingerprint(before, self.get_center_coordinates(box))
+            cached = self.card_store.get(self.current_event, key)
+            if cached is not None:
+                print(f"[屏幕] 卡片未变化，跳过弹窗: {cached['match_name']}")
+                return cached
+
+        text_data = self.process_predict_box(box, before=before)
+        lexicon = data_mgr.get_team_lexicon(self.current_event) if self.current_event else None
+        match_name, processed_data = data_mgr.process_text_data(text_data, reread=self.reread_text_item,
+                                                                lexicon=lexicon)
+        if not match_name or not processed_data:
+            return None
+        match = {
+            "match_name": match_name,
+            "team_a": processed_data["team_a"],
+            "team_b": processed_data["team_b"],
+            "odds_a": str(processed_data["odds_a"]),
+            "odds_b": str(processed_data["odds_b"]),
+            "time": processed_data["time"],
+            "confidence": processed_data["confidence"]
+        }
+        if self.card_store is not None:
+            self.card_store.put(self.current_event, key, match)
+        return match
+
+    def swipe_screen(self, distance=180, start_y=500):
         """滑动屏幕，向下滑动指定像素"""
         print(f"[屏幕] 向下滑动 {distance} 像素")
-        self.controller.post_swipe(360, 500, 360, 500 - distance, 500).wait()
-        time.sleep(2)
+        reference = self.grab_frame()
+        self.swipe(360, start_y, 360, start_y - distance, 500)
+        self.wait_until_stable(2, reference=reference, label="滑动")
+
+    def find_predict_badges(self, img_np):
+        """
+        查找列表区域内所有完整可见的"预测中"标签
+        优先使用模板匹配，无模板时对标签所在列做一次OCR
+        返回: 四点框列表，按纵坐标排序
+        """
+        top, bottom = self.SCROLL_REGION
+        column = [self.BADGE_COLUMN[0], top, self.BADGE_COLUMN[1], bottom - top]
+        located = self.anchors.locate_all(img_np, "predicting", column)
+        if located is not None:
+            return [self.roi_to_box(found) for found in located]
+        boxes = [item[0] for item in self.ocr_rois(img_np, [column])[0] if "预测中" in str(item[1][0])]
+        # 排除被列表区域边缘截断的标签，它们会在下一帧完整出现
+        boxes = [box for box in boxes if min(p[1] for p in box) > top + 2 and max(p[1] for p in box) < bottom - 2]
+        return sorted(boxes, key=lambda box: self.get_center_coordinates(box)[1])
 
     def count_predict_in_area(self, img_np, roi_coords):
         """统计指定区域内'预测中'的数量"""
         x, y, w, h = roi_coords
+        if self.rec_only_labels:
+            # 固定区域只容纳一个标签，仅识别模式下按0/1计数
+            predict_count = 1 if self.recognize_label(img_np, roi_coords, "预测中") else 0
+            print(f"[屏幕] 区域 ({x},{y},{w},{h}) 发现 {predict_count} 个'预测中'")
+            return predict_count
         roi = img_np[y:y+h, x:x+w]
         result = self.ocr.ocr(roi, cls=False)
         if not result or not result[0]:
@@ -150,43 +549,23 @@ class ScreenManager:
         print("[屏幕] 点击刷新按钮")
         # 刷新按钮坐标
         refresh_x, refresh_y = 630, 1070
-        self.controller.post_click(refresh_x, refresh_y).wait()
-        time.sleep(3)  # 等待基本加载
+        # 刷新按钮始终可见，需先等到画面相对点击前发生变化（页面开始重新加载），再轮询刷新按钮；
+        # 1秒内没有变化时视为重新加载出了相同的列表，只等画面稳定
+        reference = self.grab_frame()
+        self.click(refresh_x, refresh_y)
+        self.wait_until_stable(3, reference=reference, label="刷新加载", change_timeout=1.0)  # 等待基本加载
         
-        # 检查刷新按钮周围区域是否加载完成
-        max_attempts = 10
-        for attempt in range(max_attempts):
-            self.controller.post_screencap().wait()
-            image = self.controller.cached_image
-            if image is None or image.size == 0:
-                print(f"[屏幕] 截图失败，尝试 {attempt + 1}/{max_attempts}")
-                time.sleep(3)
-                continue
-                
-            # 检查刷新按钮周围区域
-            img_np = np.array(image)
-            # 定义刷新按钮周围100x100像素的区域
-            refresh_region = [refresh_x - 50, refresh_y - 50, 100, 100]
-            # 确保区域不超出图像边界
-            refresh_region[0] = max(0, refresh_region[0])
-            refresh_region[1] = max(0, refresh_region[1])
-            if refresh_region[0] + refresh_region[2] > img_np.shape[1]:
-                refresh_region[2] = img_np.shape[1] - refresh_region[0]
-            if refresh_region[1] + refresh_region[3] > img_np.shape[0]:
-                refresh_region[3] = img_np.shape[0] - refresh_region[1]
-                
-            refresh_roi = img_np[refresh_region[1]:refresh_region[1]+refresh_region[3], 
-                               refresh_region[0]:refresh_region[0]+refresh_region[2]]
-            
-            result = self.ocr.ocr(refresh_roi, cls=False)
-            if result and result[0]:
-                texts = [item[1][0] for item in result[0] if len(item) > 1 and len(item[1]) > 0]
-                if any("刷新" in text for text in texts):
-                    print("[屏幕] 页面加载完成，发现刷新按钮")
-                    return True
-            
-            print(f"[屏幕] 等待页面加载，尝试 {attempt + 1}/{max_attempts}")
-            time.sleep(3)
+        # 轮询刷新按钮是否出现（模板匹配，未命中时回退到OCR），最多30秒
+        def refresh_visible():
+            img_np = self.grab_frame(fresh=True)
+            if img_np is None:
+                print("[屏幕] 截图失败，继续等待")
+                return False
+            return self.find_anchor(img_np, "refresh") is not None
+
+        if self.wait_for(refresh_visible, 30, interval=0.5, label="刷新按钮"):
+            print("[屏幕] 页面加载完成，发现刷新按钮")
+            return True
         
         print("[屏幕] 页面加载超时")
         return False
@@ -196,36 +575,110 @@ class ScreenManager:
         event_coords = {"Dota2": (80, 135), "CS2": (190, 135), "LOL": (325, 135), "Valorant": (485, 135)}
         x, y = event_coords[event_name]
         print(f"[屏幕] 切换到游戏项目: {event_name}，坐标: ({x}, {y})")
-        self.controller.post_click(x, y).wait()
-        time.sleep(3)
+        reference = self.grab_frame()
+        self.click(x, y)
+        self.wait_until_stable(3, reference=reference, label="切换游戏")
         return self.refresh()
     
     def is_screen_static(self, img1, img2, threshold=0.95):
-        """检查两张截图是否几乎相同（界面无变化）"""
-        if img1.shape != img2.shape:
-            return False
-        diff = np.mean((img1 - img2) ** 2)
-        similarity = 1 - diff / (255 ** 2)
-        print(f"[屏幕] 屏幕相似度: {similarity:.4f}, 阈值: {threshold}")
-        return similarity > threshold
+        """检查两张截图是否几乎相同（界面无变化）：列表区域无滚动偏移且相似度超过阈值"""
+        comparison = compare_frames(img1, img2, region=self.SCROLL_REGION)
+        print(f"[屏幕] 屏幕相似度: {comparison.similarity:.4f}, 滚动偏移: {comparison.offset}, 阈值: {threshold}")
+        return comparison.offset == 0 and comparison.similarity > threshold
 
     def scroll_to_bottom(self, refresh_roi):
         """点击刷新并向下滑动直到界面无变化"""
         print("[屏幕] 开始滑动到底部流程")
+        # refresh() 已等到页面重新加载并出现刷新按钮，这里只等列表稳定（重新加载后的列表可能与刷新前相同）
         self.refresh()
-        time.sleep(3)
+        self.wait_until_stable(3, label="刷新后")
 
         while True:
-            self.controller.post_screencap().wait()
-            img1 = np.array(self.controller.cached_image)
+            img1 = self.grab_frame()
             self.swipe_screen(200)
-            self.controller.post_screencap().wait()
-            img2 = np.array(self.controller.cached_image)
+            img2 = self.grab_frame(view=True)
             
             if self.is_screen_static(img1, img2):
                 print("[屏幕] 屏幕内容稳定，停止滑动")
                 break
-        time.sleep(2)
+        self.wait_until_stable(2, label="滑动到底部")
+
+    def print_scan_stats(self):
+        """打印扫描过程中的等待耗时和OCR缓存统计，等待记录按扫描统计，打印后清空"""
+        waits, waited, budget = self.wait_summary()
+        print(f"[屏幕] 累计等待 {waits} 次，实际 {waited:.1f} 秒，固定等待预算 {budget:.1f} 秒")
+        self.wait_log.clear()
+        if self.card_store is not None:
+            self.card_store.save()
+            cards = self.card_store.stats()
+            print(f"[屏幕] 卡片指纹命中 {cards['hits']} 次（跳过弹窗），打开弹窗 {cards['misses']} 次")
+        if self.index_builds:
+            print(f"[屏幕] 单帧OCR索引建立 {self.index_builds} 次，复用 {self.index_reuses} 次")
+        if self.rereads:
+            print(f"[屏幕] 低置信度字段重新识别 {self.rereads} 次，其中 {self.reread_fixes} 次得到更高置信度结果")
+        stats = self.ocr.stats()
+        print(f"[屏幕] OCR缓存命中 {stats['hits']}/{stats['hits'] + stats['misses']} "
+              f"({stats['hit_rate']:.0%})，当前缓存 {stats['size']} 条")
+
+    def fetch_lbb_data_stitched(self, data_mgr, event_name, max_frames=40, overlap=260,
+                                initial_distance=500):
+        """
+        单次滚动拼接模式获取比赛数据:
+        1. 切换到指定游戏项目并刷新，只从顶部向下滚动一遍
+        2. 根据相邻截图估计的滚动偏移将列表拼接为虚拟长页面
+        3. 每帧只处理虚拟页面上尚未处理过的"预测中"卡片
+        4. 根据实测偏移与滑动距离之比调整下一次滑动距离，使相邻截图保持 overlap 像素重叠
+        5. 滚动偏移为0（到达底部）时结束
+        """
+        lbb_matches = []
+        self.current_event = event_name
+        print(f"[屏幕] 开始获取 {event_name} 比赛数据（拼接模式）")
+        self.change_event_and_refresh(event_name)
+
+        frame = self.grab_frame()
+        page = VirtualPage(self.SCROLL_REGION)
+        page.start(frame)
+        self.last_page = page
+
+        region_rows = self.SCROLL_REGION[1] - self.SCROLL_REGION[0]
+        target_advance = region_rows - overlap
+        distance = initial_distance
+        for _ in range(max_frames):
+            opened = False
+            for box in self.find_predict_badges(frame):
+                if not page.mark_card(self.get_center_coordinates(box)[1]):
+                    continue
+                opened = True
+                match = self.read_predict_card(box, data_mgr)
+                if match:
+                    lbb_matches.append(match)
+                    print(f"[屏幕] 成功提取比赛: {match['match_name']}")
+            if opened:
+                # 弹窗关闭后重新截图，作为滚动偏移估计的基准帧
+                frame = self.grab_frame()
+
+            self.swipe_screen(distance, start_y=self.SCROLL_REGION[1] - 40)
+            next_frame = self.grab_frame()
+            comparison = compare_frames(frame, next_frame, region=self.SCROLL_REGION)
+            if comparison.offset <= 0:
+                if comparison.similarity > 0.95:
+                    print("[屏幕] 滚动偏移为0，已到达列表底部")
+                    break
+                # 画面变化但无法估计偏移（例如页面被重新加载），放弃本帧对齐
+                print(f"[屏幕] 无法估计滚动偏移，相似度: {comparison.similarity:.4f}")
+                frame = next_frame
+                continue
+
+            page.advance(next_frame, comparison.offset)
+            frame = next_frame
+            # 按实测滑动增益调整下一次滑动距离
+            gain = comparison.offset / distance
+            distance = int(min(max(target_advance / gain, 100), region_rows - 80))
+            print(f"[屏幕] 滚动偏移 {comparison.offset} 像素，虚拟页面高度 {page.height}，下次滑动 {distance} 像素")
+
+        print(f"[屏幕] 拼接扫描完成，处理 {len(page.cards)} 张卡片，获取 {len(lbb_matches)} 条数据")
+        self.print_scan_stats()
+        return lbb_matches
 
     def fetch_lbb_data(self, data_mgr, event_name):
         """
@@ -235,6 +688,9 @@ class ScreenManager:
         3. 依次处理各个区域的"预测中"
         4. 返回所有提取的比赛数据
         """
+        if self.scan_mode == "stitched":
+            return self.fetch_lbb_data_stitched(data_mgr, event_name)
+
         # 定义区域
         upper_region = [308, 548, 100, 46]         
         middle_upper_region = [297, 723, 121, 46]    
@@ -243,48 +699,45 @@ class ScreenManager:
         initial_check_region = [304, 402, 113, 46]   
         refresh_popup_roi = [603, 1047, 45, 47]     # "刷新"弹窗区域，用于排除
 
+        # 所有"预测中"检查区域（含中下区域滑动后的位置）的外接范围：OCR回退时只对它做一次推理，
+        # 画面未变化时各区域检查都从同一个索引中查询
+        label_rois = [initial_check_region, upper_region, middle_upper_region, middle_lower_region,
+                      lower_region, [middle_lower_region[0], middle_lower_region[1] + 135] + middle_lower_region[2:]]
+        margin = self.anchors.margin
+        x0 = min(r[0] for r in label_rois) - margin
+        y0 = min(r[1] for r in label_rois) - margin
+        x1 = max(r[0] + r[2] for r in label_rois) + margin
+        y1 = max(r[1] + r[3] for r in label_rois) + margin
+        label_column = [x0, y0, x1 - x0, y1 - y0]
+
         lbb_matches = []  # 存储提取的比赛数据
+        self.current_event = event_name
         print(f"[屏幕] 开始获取 {event_name} 比赛数据")
 
         self.change_event_and_refresh(event_name)
 
         # 使用while循环检查初始区域是否有"预测中"
         while True:
-            self.controller.post_screencap().wait()
-            image = self.controller.cached_image
-            if image is None or image.size == 0:
+            img_np = self.grab_frame()
+            if img_np is None:
                 print("[屏幕] 截取初始屏幕失败")
                 break
-            img_np = np.array(image)
-            initial_result = self.ocr.ocr(img_np[initial_check_region[1]:initial_check_region[1]+initial_check_region[3], 
-                                        initial_check_region[0]:initial_check_region[0]+initial_check_region[2]], cls=False)
+            # 模板匹配定位"预测中"标签，未命中时回退到OCR（仅识别模式下以区域本身作为点击框）
+            found = self.find_anchor(img_np, "predicting", initial_check_region, index_region=label_column)
+            predict_boxes = [self.roi_to_box(found)] if found else []
 
             # 检查是否有"预测中"
-            predicts_found = False
-            if initial_result and initial_result[0]:
-                predicts_found = any("预测中" in str(item[1][0]) for item in initial_result[0] if len(item) > 1 and len(item[1]) > 0)
-            
-            if not predicts_found:
+            if not predict_boxes:
                 print("[屏幕] 初始区域未发现'预测中'，退出初始循环")
                 break
 
             print("[屏幕] 在初始区域发现'预测中'，处理中")
             # 找到并点击初始区域的"预测中"
-            predict_boxes = [item[0] for item in initial_result[0] if len(item) > 1 and len(item[1]) > 0 and "预测中" in str(item[1][0])]
             if predict_boxes:
-                adjusted_box = [[x + initial_check_region[0], y + initial_check_region[1]] for x, y in predict_boxes[0]]
-                text_data = self.process_predict_box(adjusted_box)  # 点击并截图特定区域
-                match_name, processed_data = data_mgr.process_text_data(text_data)
-                if match_name and processed_data:
-                    lbb_matches.append({
-                        "match_name": match_name,
-                        "team_a": processed_data["team_a"],
-                        "team_b": processed_data["team_b"],
-                        "odds_a": str(processed_data["odds_a"]),
-                        "odds_b": str(processed_data["odds_b"]),
-                        "time": processed_data["time"]
-                    })
-                    print(f"[屏幕] 成功提取初始区域比赛: {match_name}")
+                match = self.read_predict_card(predict_boxes[0], data_mgr)  # 点击并截图特定区域
+                if match:
+                    lbb_matches.append(match)
+                    print(f"[屏幕] 成功提取初始区域比赛: {match['match_name']}")
 
             # 向下滑动180像素，继续检查
             self.swipe_screen(180)
@@ -302,79 +755,50 @@ class ScreenManager:
 
         for region_name, region_coords in regions:
             print(f"[屏幕] 处理 {region_name} 区域: {region_coords}")
-            self.controller.post_screencap().wait()
-            image = self.controller.cached_image
-            if image is None or image.size == 0:
+            img_np = self.grab_frame()
+            if img_np is None:
                 print(f"[屏幕] 截取 {region_name} 区域屏幕失败")
                 continue
-            img_np = np.array(image)
-            result = self.ocr.ocr(img_np[region_coords[1]:region_coords[1]+region_coords[3], 
-                                        region_coords[0]:region_coords[0]+region_coords[2]], cls=False)
-            if not result or not result[0]:
-                print(f"[屏幕] {region_name} 区域无OCR结果")
-                continue
-
-            predict_boxes = [item[0] for item in result[0] if len(item) > 1 and len(item[1]) > 0 and "预测中" in str(item[1][0])]
+            found = self.find_anchor(img_np, "predicting", region_coords, index_region=label_column)
+            predict_boxes = [self.roi_to_box(found)] if found else []
             print(f"[屏幕] 在 {region_name} 区域发现 {len(predict_boxes)} 个'预测中'")
 
             if region_name == "middle_lower" and predict_boxes:  
                 print("[屏幕] 中下区域特殊处理：向下滑动")
-                self.controller.post_swipe(360, 500, 360, 635, 500).wait()
-                time.sleep(1.5)
-                self.controller.post_screencap().wait()
-                image = self.controller.cached_image
-                if image is None or image.size == 0:
+                reference = self.grab_frame()
+                self.swipe(360, 500, 360, 635, 500)
+                self.wait_until_stable(1.5, reference=reference, label="中下区域滑动")
+                img_np = self.grab_frame()
+                if img_np is None:
                     print("[屏幕] 截取中下区域屏幕失败")
                     continue
-                img_np = np.array(image)
                 adjusted_y = region_coords[1] + 135
-                result = self.ocr.ocr(img_np[adjusted_y:adjusted_y+region_coords[3], 
-                                            region_coords[0]:region_coords[0]+region_coords[2]], cls=False)
-                if result and result[0]:
-                    predict_boxes = [item[0] for item in result[0] if len(item) > 1 and len(item[1]) > 0 and "预测中" in str(item[1][0])]
-                    for box in predict_boxes:
-                        adjusted_box = [[x + region_coords[0], y + adjusted_y] for x, y in box]
-                        text_data = self.process_predict_box(adjusted_box)
-                        match_name, processed_data = data_mgr.process_text_data(text_data)
-                        if match_name and processed_data:
-                            lbb_matches.append({
-                                "match_name": match_name,
-                                "team_a": processed_data["team_a"],
-                                "team_b": processed_data["team_b"],
-                                "odds_a": str(processed_data["odds_a"]),
-                                "odds_b": str(processed_data["odds_b"]),
-                                "time": processed_data["time"]
-                            })
-                            print(f"[屏幕] 成功提取中下区域比赛: {match_name}")
+                adjusted_region = [region_coords[0], adjusted_y, region_coords[2], region_coords[3]]
+                found = self.find_anchor(img_np, "predicting", adjusted_region, index_region=label_column)
+                if found:
+                    match = self.read_predict_card(self.roi_to_box(found), data_mgr)
+                    if match:
+                        lbb_matches.append(match)
+                        print(f"[屏幕] 成功提取中下区域比赛: {match['match_name']}")
 
             else:
                 # 其他区域的常规处理
                 for box in predict_boxes:
-                    adjusted_box = [[x + region_coords[0], y + region_coords[1]] for x, y in box]
-                    text_data = self.process_predict_box(adjusted_box)
-                    match_name, processed_data = data_mgr.process_text_data(text_data)
-                    if match_name and processed_data:
-                        lbb_matches.append({
-                            "match_name": match_name,
-                            "team_a": processed_data["team_a"],
-                            "team_b": processed_data["team_b"],
-                            "odds_a": str(processed_data["odds_a"]),
-                            "odds_b": str(processed_data["odds_b"]),
-                            "time": processed_data["time"]
-                        })
-                        print(f"[屏幕] 成功提取 {region_name} 区域比赛: {match_name}")
+                    match = self.read_predict_card(box, data_mgr)
+                    if match:
+                        lbb_matches.append(match)
+                        print(f"[屏幕] 成功提取 {region_name} 区域比赛: {match['match_name']}")
 
             # 每个区域处理完后刷新并滑动到底部
             self.refresh()
-            time.sleep(5)
+            self.wait_until_stable(5, label="区域刷新")
             while True:
-                self.controller.post_screencap().wait()
-                img1 = np.array(self.controller.cached_image)
+                img1 = self.grab_frame()
                 self.swipe_screen(367)
-                self.controller.post_screencap().wait()
-                img2 = np.array(self.controller.cached_image)
+                img2 = self.grab_frame(view=True)
                 if self.is_screen_static(img1, img2):
                     print(f"[屏幕] {region_name} 区域内容稳定，移动到下一个区域")
                     break
 
+        self.print_scan_stats()
         return lbb_matches
\ No newline at end of file
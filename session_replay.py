@@ -0,0 +1,365 @@
+# session_replay.py - 会话录制与回放：离线重跑小黑盒扫描流程，用于基准测试和回归测试
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+
+class VirtualClock:
+    """
+    虚拟时钟：提供与 time 模块相同的 time()/sleep() 接口，
+    sleep() 只推进虚拟时间而不真正等待，回放可以快于真实时间
+    """
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+    def advance(self, seconds):
+        self.sleep(seconds)
+
+class _Job:
+    """模拟MAA任务对象：回放中的操作立即完成"""
+    def wait(self):
+        return self
+
+    @property
+    def succeeded(self):
+        return True
+
+    @property
+    def done(self):
+        return True
+
+class _RecordingJob:
+    """包装截图任务：等待完成后记录截图"""
+    def __init__(self, recorder, job, started):
+        self.recorder = recorder
+        self.job = job
+        self.started = started
+
+    def wait(self):
+        self.job.wait()
+        self.recorder.record_frame(self.recorder.controller.cached_image, self.started)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self.job, name)
+
+class SessionRecorder:
+    """
+    会话录制器：包装ADB控制器，记录每一次截图和点击/滑动
+    会话目录结构:
+        events.jsonl         事件日志，每行一个事件（截图/点击/滑动），时间相对录制开始
+        frames_00000.npz ... 分块压缩保存的截图，内容相同的连续截图只保存一次
+        meta.json            会话信息（帧数、分块大小、分辨率等）
+    """
+    def __init__(self, controller, session_dir, chunk_size=32):
+        """
+        controller: 被录制的ADB控制器
+        session_dir: 会话目录
+        chunk_size: 每个压缩文件保存的帧数
+        """
+        self.controller = controller
+        self.session_dir = session_dir
+        self.chunk_size = chunk_size
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+        self.chunk = {}
+        self.frame_count = 0
+        self.last_digest = None
+        self.screencaps = 0
+        self.inputs = 0
+        self.shape = None
+        os.makedirs(session_dir, exist_ok=True)
+        self.events = open(os.path.join(session_dir, "events.jsonl"), "w", encoding="utf-8")
+        print(f"[录制] 开始录制会话: {session_dir}")
+
+    @property
+    def cached_image(self):
+        return self.controller.cached_image
+
+    def __getattr__(self, name):
+        # 其他属性和方法透传给被包装的控制器
+        return getattr(self.controller, name)
+
+    def _write_event(self, event):
+        self.events.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def _flush_chunk(self):
+        if not self.chunk:
+            return
+        chunk_index = (self.frame_count - 1) // self.chunk_size
+        path = os.path.join(self.session_dir, f"frames_{chunk_index:05d}.npz")
+        np.savez_compressed(path, **self.chunk)
+        self.chunk = {}
+
+    def record_frame(self, image, started):
+        """记录一次截图：与上一帧内容相同时只记录事件，不重复保存图像"""
+        finished = time.time()
+        if image is None or image.size == 0:
+            return
+        image = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(image.data, digest_size=16).digest()
+        with self.lock:
+            if digest != self.last_digest:
+                self.chunk[f"f{self.frame_count}"] = image.copy()
+                self.frame_count += 1
+                self.last_digest = digest
+                self.shape = image.shape
+                if self.frame_count % self.chunk_size == 0:
+                    self._flush_chunk()
+            self.screencaps += 1
+            self._write_event({
+                "type": "screencap",
+                "t": round(started - self.start_time, 4),
+                "duration": round(finished - started, 4),
+                "frame": self.frame_count - 1
+            })
+
+    def post_screencap(self):
+        started = time.time()
+        return _RecordingJob(self, self.controller.post_screencap(), started)
+
+    def _record_input(self, event, job):
+        started = time.time()
+        job.wait()
+        event["t"] = round(started - self.start_time, 4)
+        event["duration"] = round(time.time() - started, 4)
+        with self.lock:
+            self.inputs += 1
+            self._write_event(event)
+        return job
+
+    def post_click(self, x, y):
+        return self._record_input({"type": "click", "x": x, "y": y}, self.controller.post_click(x, y))
+
+    def post_swipe(self, x1, y1, x2, y2, duration):
+        return self._record_input(
+            {"type": "swipe", "x1": x1, "y1": y1, "x2": x2, "y2": y2, "swipe_duration": duration},
+            self.controller.post_swipe(x1, y1, x2, y2, duration)
+        )
+
+    def close(self, **meta):
+        """结束录制：写入剩余帧和会话信息，meta 中的额外字段一并保存"""
+        with self.lock:
+            self._flush_chunk()
+            self.events.close()
+            meta.update({
+                "frames": self.frame_count,
+                "screencaps": self.screencaps,
+                "inputs": self.inputs,
+                "chunk_size": self.chunk_size,
+                "shape": list(self.shape) if self.shape else None,
+                "duration": round(time.time() - self.start_time, 3)
+            })
+            with open(os.path.join(self.session_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2, default=str)
+        print(f"[录制] 会话录制完成: {self.screencaps} 次截图（保存 {self.frame_count} 帧），"
+              f"{self.inputs} 次操作，耗时 {meta['duration']:.1f} 秒")
+
+class ReplayController:
+    """
+    回放控制器：提供与 AdbController 相同的 post_screencap/cached_image/post_click/post_swipe 接口，
+    按虚拟时钟从录制的会话中返回截图
+    对齐方式：每次点击/滑动与录制中的下一个同类操作对齐，之后的截图按"距该操作的虚拟耗时"
+    映射到录制时间线上，但不会越过录制中的下一个操作，因此优化后的流程
+    （少等待、少截图、跳过部分操作）也能得到与真实界面一致的画面
+    """
+    def __init__(self, session_dir, clock=None, lookahead=8, click_tolerance=15, swipe_tolerance=60,
+                 screencap_latency=None):
+        """
+        session_dir: 会话目录
+        clock: 虚拟时钟，默认新建 VirtualClock
+        lookahead: 操作对齐时向后查找的录制操作数
+        click_tolerance / swipe_tolerance: 操作坐标与录制操作的最大偏差（像素）
+        screencap_latency: 每次截图推进的虚拟时间，默认取录制中截图耗时的中位数
+        """
+        self.session_dir = session_dir
+        self.clock = clock if clock is not None else VirtualClock()
+        self.lookahead = lookahead
+        self.click_tolerance = click_tolerance
+        self.swipe_tolerance = swipe_tolerance
+
+        with open(os.path.join(session_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.chunk_size = self.meta["chunk_size"]
+        screencaps, self.inputs = [], []
+        with open(os.path.join(session_dir, "events.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                event = json.loads(line)
+                (screencaps if event["type"] == "screencap" else self.inputs).append(event)
+        screencaps.sort(key=lambda event: event["t"])
+        self.screencap_times = [event["t"] for event in screencaps]
+        self.screencap_frames = [event["frame"] for event in screencaps]
+        if screencap_latency is None:
+            durations = sorted(event["duration"] for event in screencaps)
+            screencap_latency = durations[len(durations) // 2] if durations else 0.0
+        self.screencap_latency = screencap_latency
+
+        self.connected = True
+        self.cached_image = None
+        self.chunks = {}
+        self.next_input = 0        # 录制中下一个待对齐的操作
+        self.anchor_recorded = 0.0  # 最近一次对齐的录制时间
+        self.anchor_virtual = self.clock.time()
+        self.screencaps = 0
+        self.matched = 0
+        self.mismatched = 0
+        print(f"[回放] 加载会话 {session_dir}: {len(screencaps)} 次截图，{len(self.inputs)} 次操作，"
+              f"{self.meta['frames']} 帧")
+
+    def _load_frame(self, index):
+        chunk_index = index // self.chunk_size
+        if chunk_index not in self.chunks:
+            path = os.path.join(self.session_dir, f"frames_{chunk_index:05d}.npz")
+            self.chunks[chunk_index] = np.load(path)
+        return self.chunks[chunk_index][f"f{index}"]
+
+    def _recorded_now(self):
+        """将当前虚拟时间映射到录制时间线，不越过下一个待对齐的操作"""
+        recorded = self.anchor_recorded + (self.clock.time() - self.anchor_virtual)
+        if self.next_input < len(self.inputs):
+            recorded = min(recorded, self.inputs[self.next_input]["t"])
+        return recorded
+
+    def post_screencap(self):
+        self.clock.advance(self.screencap_latency)
+        self.screencaps += 1
+        if not self.screencap_times:
+            return _Job()
+        recorded = self._recorded_now()
+        position = int(np.searchsorted(self.screencap_times, recorded, side="right")) - 1
+        self.cached_image = self._load_frame(self.screencap_frames[max(position, 0)])
+        return _Job()
+
+    def _matches(self, recorded, event):
+        if recorded["type"] != event["type"]:
+            return False
+        if event["type"] == "click":
+            tolerance = self.click_tolerance
+            keys = ("x", "y")
+        else:
+            tolerance = self.swipe_tolerance
+            keys = ("x1", "y1", "x2", "y2")
+        return all(abs(recorded[key] - event[key]) <= tolerance for key in keys)
+
+    def _align_input(self, event):
+        """将一次操作与录制中的操作对齐，并以该操作完成时刻作为新的时间锚点"""
+        window = self.inputs[self.next_input:self.next_input + self.lookahead]
+        position = next((i for i, recorded in enumerate(window) if self._matches(recorded, event)), None)
+        if position is None:
+            # 没有坐标吻合的操作：退而对齐下一个同类操作，记为偏离
+            position = next((i for i, recorded in enumerate(window) if recorded["type"] == event["type"]), None)
+            self.mismatched += 1
+            if position is None:
+                print(f"[回放] 操作无法与录制对齐: {event}")
+                return _Job()
+        else:
+            self.matched += 1
+        recorded = self.inputs[self.next_input + position]
+        self.next_input += position + 1
+        self.clock.advance(recorded["duration"])
+        self.anchor_recorded = recorded["t"] + recorded["duration"]
+        self.anchor_virtual = self.clock.time()
+        return _Job()
+
+    def post_click(self, x, y):
+        return self._align_input({"type": "click", "x": x, "y": y})
+
+    def post_swipe(self, x1, y1, x2, y2, duration):
+        return self._align_input({"type": "swipe", "x1": x1, "y1": y1, "x2": x2, "y2": y2})
+
+    def post_connection(self):
+        return _Job()
+
+    def post_start_app(self, package_name):
+        return _Job()
+
+    def stats(self):
+        """回放统计：截图次数、对齐/偏离的操作数、未使用的录制操作数"""
+        return {
+            "screencaps": self.screencaps,
+            "matched": self.matched,
+            "mismatched": self.mismatched,
+            "skipped": len(self.inputs) - self.next_input
+        }
+
+def record_session(config, session_dir, event_name):
+    """连接模拟器并导航到赛事中心后，录制一次 fetch_lbb_data 的完整过程"""
+    from init_manager import InitManager
+    from data_manager import DataManager
+    from main import create_screen_manager, navigate_to_event_center
+
+    init = InitManager(config=config)
+    controller, ocr = init.initialize_all()
+    screen_mgr = create_screen_manager(config, controller, ocr)
+    navigate_to_event_center(init, screen_mgr)
+
+    # 导航完成后才开始录制，回放从赛事中心页面开始
+    recorder = SessionRecorder(controller, session_dir)
+    screen_mgr.stop_capture()
+    screen_mgr.controller = recorder
+    scan_mode = screen_mgr.scan_mode
+    matches = screen_mgr.fetch_lbb_data(DataManager(config), event_name)
+    recorder.close(event_name=event_name, scan_mode=scan_mode, matches=matches)
+    return matches
+
+def replay_session(config, session_dir, scan_mode=None):
+    """
+    回放录制的会话：用虚拟时钟运行完整的 ScreenManager 扫描流程，
+    打印虚拟耗时、实际耗时和与录制结果的差异
+    """
+    from init_manager import InitManager
+    from data_manager import DataManager
+    from screen_manager import ScreenManager
+
+    controller = ReplayController(session_dir)
+    meta = controller.meta
+    ocr = InitManager(config=config).initialize_ocr()
+    screen_config = config.get('screen', {})
+    scan_mode = scan_mode or screen_config.get('scan_mode', meta.get('scan_mode', 'fixed'))
+    screen_mgr = ScreenManager(controller, ocr, scan_mode=scan_mode, clock=controller.clock)
+
+    started = time.time()
+    start_virtual = controller.clock.time()
+    matches = screen_mgr.fetch_lbb_data(DataManager(config), meta["event_name"])
+    wall = time.time() - started
+    virtual = controller.clock.time() - start_virtual
+
+    stats = controller.stats()
+    print(f"[回放] 扫描模式 {scan_mode}，获取 {len(matches)} 条数据（录制时 {len(meta.get('matches', []))} 条）")
+    print(f"[回放] 虚拟耗时 {virtual:.1f} 秒（录制 {meta['duration']:.1f} 秒），实际耗时 {wall:.1f} 秒")
+    print(f"[回放] 截图 {stats['screencaps']} 次，操作对齐 {stats['matched']} 次，"
+          f"偏离 {stats['mismatched']} 次，未使用的录制操作 {stats['skipped']} 次")
+
+    recorded = {match.get("match_name") for match in meta.get("matches", [])}
+    replayed = {match.get("match_name") for match in matches}
+    if recorded != replayed:
+        print(f"[回放] 与录制结果不一致，缺少: {sorted(recorded - replayed, key=str)}，"
+              f"多出: {sorted(replayed - recorded, key=str)}")
+    return matches
+
+if __name__ == "__main__":
+    # 用法:
+    #   python session_replay.py record <会话目录> <游戏项目>
+    #   python session_replay.py replay <会话目录> [fixed|stitched]
+    if len(sys.argv) < 3 or sys.argv[1] not in ("record", "replay"):
+        print("用法: python session_replay.py record <会话目录> <游戏项目>\n"
+              "      python session_replay.py replay <会话目录> [fixed|stitched]")
+        sys.exit(1)
+    from main import load_config
+    config = load_config()
+    if sys.argv[1] == "record":
+        if len(sys.argv) < 4:
+            print("[录制] 请指定游戏项目")
+            sys.exit(1)
+        record_session(config, sys.argv[2], sys.argv[3])
+    else:
+        replay_session(config, sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
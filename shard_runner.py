@@ -0,0 +1,124 @@
+# shard_runner.py - 多模拟器分片运行器，将各游戏项目分配到多个模拟器实例并行扫描
+import copy
+import queue
+import traceback
+import multiprocessing
+from init_manager import InitManager
+from data_manager import DataManager
+
+def shard_config(config, shard):
+    """
+    为单个分片生成配置：在全局配置基础上覆盖该模拟器实例的ADB端口和启动参数
+    shard 示例: {"adb_port": 16416, "emulator_command": "-v 1"}
+    """
+    config = copy.deepcopy(config)
+    if "adb_port" in shard:
+        config['adb']['port'] = shard['adb_port']
+    if "emulator_command" in shard:
+        config['emulator']['add_command'] = shard['emulator_command']
+    if "wait_seconds" in shard:
+        config['emulator']['wait_seconds'] = shard['wait_seconds']
+    return config
+
+def shard_worker(shard_index, config, game_queue, result_queue, save_lock, ocr_client=None):
+    """
+    分片工作进程：独立初始化模拟器、ADB控制器和OCR模型，
+    从共享队列领取游戏项目直到取到结束标记（None）
+    ocr_client: 共享OCR服务的客户端，提供时不在本进程加载模型
+    """
+    from main import create_screen_manager, navigate_to_event_center, process_game
+
+    tag = f"[分片{shard_index}]"
+    try:
+        print(f"{tag} 开始初始化，ADB端口: {config['adb']['port']}")
+        init = InitManager(config=config)
+        controller, ocr = init.initialize_all(with_ocr=ocr_client is None)
+        if ocr_client is not None:
+            ocr = ocr_client
+        screen_mgr = create_screen_manager(config, controller, ocr)
+        data_mgr = DataManager(config)
+        navigate_to_event_center(init, screen_mgr)
+    except Exception as e:
+        print(f"{tag} 初始化失败: {e}")
+        print(traceback.format_exc())
+        return
+
+    # 阻塞读取直到结束标记：multiprocessing.Queue 的 get_nowait() 抛出 Empty 时，
+    # 父进程放入的项目可能仍在后台传输中，不能据此判断队列已空
+    while True:
+        event_name = game_queue.get()
+        if event_name is None:
+            break
+        print(f"{tag} 领取游戏项目: {event_name}")
+        success = process_game(config, screen_mgr, data_mgr, event_name, save_lock=save_lock)
+        result_queue.put((event_name, shard_index, success))
+
+    if ocr_client is not None:
+        ocr_client.close()
+    print(f"{tag} 游戏项目已领取完毕，工作进程退出")
+
+def run_sharded(config):
+    """
+    分片运行：每个分片对应一个模拟器实例（不同ADB端口），各自运行在独立进程中，
+    游戏项目放入共享队列动态领取，数据库写入通过进程锁串行化
+    """
+    shards = config.get('shards', [])
+    skip_games = config.get('skip_games', [])
+    event_list = [name for name in config['urls']['games'] if name not in skip_games]
+    if skip_games:
+        print(f"[分片] 将跳过以下游戏: {skip_games}")
+
+    worker_count = min(len(shards), len(event_list))
+    game_queue = multiprocessing.Queue()
+    for event_name in event_list:
+        game_queue.put(event_name)
+    for _ in range(worker_count):
+        game_queue.put(None)  # 每个分片一个结束标记，排在所有游戏项目之后
+    result_queue = multiprocessing.Queue()
+    save_lock = multiprocessing.Lock()
+    # 配置了OCR服务时，所有分片共用一个已预热的模型池
+    from main import start_ocr_server
+    ocr_server = start_ocr_server(config, num_clients=worker_count)
+
+    print(f"[分片] 启动 {worker_count} 个模拟器分片处理 {len(event_list)} 个游戏项目: {event_list}")
+    workers = []
+    for index, shard in enumerate(shards[:worker_count]):
+        ocr_client = ocr_server.client(index) if ocr_server is not None else None
+        process = multiprocessing.Process(
+            target=shard_worker,
+            args=(index, shard_config(config, shard), game_queue, result_queue, save_lock, ocr_client),
+            name=f"shard-{index}"
+        )
+        process.start()
+        workers.append(process)
+
+    results = {}
+    while len(results) < len(event_list) and any(p.is_alive() for p in workers):
+        try:
+            event_name, shard_index, success = result_queue.get(timeout=5)
+        except queue.Empty:
+            continue
+        results[event_name] = (shard_index, success)
+        print(f"[分片] {event_name} 由分片{shard_index}处理{'完成' if success else '失败'}")
+
+    for process in workers:
+        process.join()
+    if ocr_server is not None:
+        ocr_server.stop()
+    # 收集工作进程退出前放入队列的剩余结果
+    while True:
+        try:
+            event_name, shard_index, success = result_queue.get(timeout=1)
+        except queue.Empty:
+            break
+        results[event_name] = (shard_index, success)
+
+    missing = [name for name in event_list if name not in results]
+    if missing:
+        print(f"[分片] 以下游戏项目未被处理（分片初始化失败或异常退出）: {missing}")
+    print(f"[分片] 所有分片处理完成，成功 {sum(1 for _, ok in results.values() if ok)}/{len(event_list)}")
+    return results
+
+if __name__ == "__main__":
+    from main import load_config
+    run_sharded(load_config())
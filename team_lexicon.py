@@ -0,0 +1,141 @@
+# team_lexicon.py - 队伍名称词典：用已知队伍名称纠正OCR识别结果
+import os
+import glob
+import sqlite3
+from db_manager import read_only
+
+def levenshtein(a, b):
+    """编辑距离（插入、删除、替换各计1）"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ch_a in enumerate(a, 1):
+        current = [i]
+        for j, ch_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ch_a != ch_b)))
+        previous = current
+    return previous[-1]
+
+class BKTree:
+    """
+    BK树：按编辑距离组织的度量树，查询距离上界内的词时
+    利用三角不等式只访问距离在 [d - k, d + k] 范围内的子树
+    """
+    def __init__(self, distance=levenshtein):
+        self.distance = distance
+        self.root = None  # (词, {距离: 子节点})
+        self.size = 0
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            d = self.distance(word, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = (word, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, word, max_distance):
+        """返回距离不超过 max_distance 的 (距离, 词) 列表，按距离排序"""
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            candidate, children = stack.pop()
+            d = self.distance(word, candidate)
+            if d <= max_distance:
+                results.append((d, candidate))
+            for child_distance, child in children.items():
+                if d - max_distance <= child_distance <= d + max_distance:
+                    stack.append(child)
+        return sorted(results)
+
+class TeamLexicon:
+    """
+    队伍名称词典：不区分大小写建立BK树，将OCR识别的队伍名称纠正为距离上界内唯一最近的已知名称
+    """
+    def __init__(self, names=()):
+        self.tree = BKTree()
+        self.canonical = {}  # 小写 -> 原始写法
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.canonical)
+
+    def add(self, name):
+        name = str(name or "").strip()
+        if not name or name.startswith("UNMATCHED_"):
+            return
+        key = name.lower()
+        if key not in self.canonical:
+            self.canonical[key] = name
+            self.tree.add(key)
+
+    @staticmethod
+    def max_distance(text):
+        """距离上界随名称长度增加：短名称只容忍1个字符错误，过短的名称不纠正"""
+        if len(text) <= 2:
+            return 0
+        if len(text) <= 5:
+            return 1
+        return 2
+
+    def correct(self, text):
+        """
+        纠正队伍名称
+        返回: (纠正后的名称, 编辑距离)；词典中没有距离上界内的名称，
+              或最近的名称不唯一时原样返回，距离为None
+        """
+        key = str(text).strip().lower()
+        if key in self.canonical:
+            return self.canonical[key], 0
+        bound = self.max_distance(key)
+        if bound == 0 or not self.canonical:
+            return text, None
+        matches = self.tree.search(key, bound)
+        if not matches or (len(matches) > 1 and matches[1][0] == matches[0][0]):
+            return text, None
+        distance, word = matches[0]
+        return self.canonical[word], distance
+
+    @classmethod
+    def from_data_dir(cls, data_dir, event_name):
+        """
+        从游戏项目的数据目录建立词典：
+        - 各比赛目录下 web_matches.db 中的网络队伍名称
+        - mappings.db 中已确认的小黑盒队伍名称及其对应的网络名称
+        """
+        lexicon = cls()
+        game_folder = os.path.join(data_dir, event_name)
+        for db_path in glob.glob(os.path.join(game_folder, "*", "web_matches.db")):
+            try:
+                with read_only(db_path) as conn:
+                    for team_a, team_b in conn.execute("SELECT team_a, team_b FROM matches"):
+                        lexicon.add(team_a)
+                        lexicon.add(team_b)
+            except sqlite3.Error as e:
+                print(f"[队伍词典] 读取 {db_path} 失败: {e}")
+
+        mappings_path = os.path.join(game_folder, "mappings.db")
+        if os.path.exists(mappings_path):
+            try:
+                with read_only(mappings_path) as conn:
+                    rows = conn.execute("SELECT lbb_team, web_team FROM team_mapping WHERE game_name = ?",
+                                        (event_name,)).fetchall()
+                for lbb_team, web_team in rows:
+                    lexicon.add(lbb_team)
+                    lexicon.add(web_team)
+            except sqlite3.Error as e:
+                print(f"[队伍词典] 读取 {mappings_path} 失败: {e}")
+        print(f"[队伍词典] {event_name} 词典包含 {len(lexicon)} 个队伍名称")
+        return lexicon
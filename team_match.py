@@ -1,10 +1,11 @@
-import sqlite3
 import os
 from datetime import datetime, timedelta
 import difflib
+from db_manager import connect, write_transaction
+from odds_store import OddsStore
 
 def initialize_db(game_folder):
-    """初始化数据库连接，创建必要的表"""
+    """初始化映射数据库，创建必要的表，返回数据库路径"""
     try:
         # 确保目录存在
         os.makedirs(game_folder, exist_ok=True)
@@ -13,35 +14,31 @@ def initialize_db(game_folder):
         db_path = os.path.join(game_folder, 'mappings.db')
         print(f"[团队匹配] 数据库路径: {db_path}")
         
-        # 连接数据库
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # 创建比赛名称映射表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS match_name_mapping (
-                lbb_match_name TEXT,
-                web_match_name TEXT,
-                game_name TEXT,
-                last_updated TEXT,
-                PRIMARY KEY (lbb_match_name, game_name)
-            )
-        """)
+        with write_transaction(db_path) as conn:
+            # 创建比赛名称映射表
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS match_name_mapping (
+                    lbb_match_name TEXT,
+                    web_match_name TEXT,
+                    game_name TEXT,
+                    last_updated TEXT,
+                    PRIMARY KEY (lbb_match_name, game_name)
+                )
+            """)
         
-        # 创建队伍名称映射表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS team_mapping (
-                lbb_team TEXT,
-                web_team TEXT,
-                game_name TEXT,
-                last_updated TEXT,
-                PRIMARY KEY (lbb_team, game_name)
-            )
-        """)
+            # 创建队伍名称映射表
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS team_mapping (
+                    lbb_team TEXT,
+                    web_team TEXT,
+                    game_name TEXT,
+                    last_updated TEXT,
+                    PRIMARY KEY (lbb_team, game_name)
+                )
+            """)
         
-        conn.commit()
         print(f"[团队匹配] 数据库初始化成功: {db_path}")
-        return conn, cursor
+        return db_path
     except Exception as e:
         print(f"[团队匹配] 数据库初始化失败: {str(e)}")
         raise
@@ -73,13 +70,12 @@ def match_teams_and_names(web_data, lbb_data, game_name, match_folder):
     2. 检查mappings.db中未匹配的URL比赛名称
     3. 为匹配的比赛创建名称映射关系和match_id映射
     """
-    conn, cursor = initialize_db(match_folder)
+    db_path = initialize_db(match_folder)
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print(f"[名称匹配] 开始处理游戏: {game_name}")
 
     if not web_data:
         print(f"[名称匹配] 无网络数据，跳过")
-        conn.close()
         return
 
     # 获取最新的网络数据
@@ -88,48 +84,55 @@ def match_teams_and_names(web_data, lbb_data, game_name, match_folder):
     standard_match_name = latest_web_match["MatchName"]
     print(f"[名称匹配] 标准比赛名称: {standard_match_name}")
 
-    # 处理每个OCR识别的比赛
-    for lbb_match in lbb_data:
-        lbb_match_name = lbb_match["match_name"]
+    # 处理每个OCR识别的比赛（一个写事务内完成）
+    name_mappings, team_mappings = [], []
+    with write_transaction(db_path) as conn:
+        cursor = conn.cursor()
+        for lbb_match in lbb_data:
+            lbb_match_name = lbb_match["match_name"]
         
-        # 检查是否已有映射
-        cursor.execute('SELECT web_match_name FROM match_name_mapping WHERE lbb_match_name = ? AND game_name = ?', 
-                      (lbb_match_name, game_name))
-        existing_mapping = cursor.fetchone()
+            # 检查是否已有映射
+            cursor.execute('SELECT web_match_name FROM match_name_mapping WHERE lbb_match_name = ? AND game_name = ?', 
+                          (lbb_match_name, game_name))
+            existing_mapping = cursor.fetchone()
         
-        if not existing_mapping:
-            # 保存比赛名称映射
-            cursor.execute('INSERT OR REPLACE INTO match_name_mapping (lbb_match_name, web_match_name, game_name, last_updated) VALUES (?, ?, ?, ?)',
-                         (lbb_match_name, standard_match_name, game_name, now))
-            print(f"[名称匹配] 创建映射: {lbb_match_name} -> {standard_match_name}")
+            if not existing_mapping:
+                # 保存比赛名称映射
+                cursor.execute('INSERT OR REPLACE INTO match_name_mapping (lbb_match_name, web_match_name, game_name, last_updated) VALUES (?, ?, ?, ?)',
+                             (lbb_match_name, standard_match_name, game_name, now))
+                name_mappings.append((lbb_match_name, standard_match_name, now))
+                print(f"[名称匹配] 创建映射: {lbb_match_name} -> {standard_match_name}")
 
-            # 找到时间最接近的网络数据进行队伍匹配
-            lbb_time = datetime.strptime(lbb_match["time"], '%Y-%m-%d %H:%M:%S')
-            closest_web_match = min(web_data, 
-                                  key=lambda x: abs(datetime.strptime(x["MatchTime"], '%Y-%m-%d %H:%M:%S') - lbb_time))
+                # 找到时间最接近的网络数据进行队伍匹配
+                lbb_time = datetime.strptime(lbb_match["time"], '%Y-%m-%d %H:%M:%S')
+                closest_web_match = min(web_data, 
+                                      key=lambda x: abs(datetime.strptime(x["MatchTime"], '%Y-%m-%d %H:%M:%S') - lbb_time))
             
-            time_diff = abs(datetime.strptime(closest_web_match["MatchTime"], '%Y-%m-%d %H:%M:%S') - lbb_time)
+                time_diff = abs(datetime.strptime(closest_web_match["MatchTime"], '%Y-%m-%d %H:%M:%S') - lbb_time)
             
-            if time_diff <= timedelta(hours=0.5):
-                web_teams = [closest_web_match["TeamA"], closest_web_match["TeamB"]]
-                lbb_teams = [lbb_match["team_a"], lbb_match["team_b"]]
+                if time_diff <= timedelta(hours=0.5):
+                    web_teams = [closest_web_match["TeamA"], closest_web_match["TeamB"]]
+                    lbb_teams = [lbb_match["team_a"], lbb_match["team_b"]]
                 
-                # 检查队伍是否匹配
-                teams_match = all(fuzzy_match(lbb_team, web_team) 
-                                for lbb_team, web_team in zip(lbb_teams, web_teams))
+                    # 检查队伍是否匹配
+                    teams_match = all(fuzzy_match(lbb_team, web_team) 
+                                    for lbb_team, web_team in zip(lbb_teams, web_teams))
                 
-                if teams_match:
-                    # 使用网络数据的match_id
-                    lbb_match["match_id"] = closest_web_match.get("MatchId")
-                    print(f"[名称匹配] 使用网络match_id: {lbb_match['match_id']}")
+                    if teams_match:
+                        # 使用网络数据的match_id
+                        lbb_match["match_id"] = closest_web_match.get("MatchId")
+                        print(f"[名称匹配] 使用网络match_id: {lbb_match['match_id']}")
                     
-                    # 保存队伍映射
-                    for lbb_team, web_team in zip(lbb_teams, web_teams):
-                        cursor.execute('INSERT OR REPLACE INTO team_mapping (lbb_team, web_team, game_name, last_updated) VALUES (?, ?, ?, ?)',
-                                     (lbb_team, web_team, game_name, now))
+                        # 保存队伍映射
+                        for lbb_team, web_team in zip(lbb_teams, web_teams):
+                            cursor.execute('INSERT OR REPLACE INTO team_mapping (lbb_team, web_team, game_name, last_updated) VALUES (?, ?, ?, ?)',
+                                         (lbb_team, web_team, game_name, now))
+                            team_mappings.append((lbb_team, web_team, now))
 
-    conn.commit()
-    conn.close()
+    # 同时写入统一赔率库（match_folder 为游戏项目目录，其上级为数据目录）
+    store = OddsStore(os.path.dirname(os.path.abspath(match_folder)))
+    store.save_name_mappings(game_name, name_mappings)
+    store.save_team_mappings(game_name, team_mappings)
     print(f"[名称匹配] 完成处理")
 
 def replace_team_and_match_name(lbb_data, game_name, match_folder):
@@ -140,7 +143,7 @@ def replace_team_and_match_name(lbb_data, game_name, match_folder):
     3. 用标准名称替换原始名称
     4. 如果没有找到比赛名称映射，返回None表示跳过保存
     """
-    conn, cursor = initialize_db(match_folder)
+    cursor = connect(initialize_db(match_folder)).cursor()
     print(f"[名称替换] 开始处理游戏: {game_name}")
     
     result_data = []
@@ -169,6 +172,5 @@ def replace_team_and_match_name(lbb_data, game_name, match_folder):
         else:
             print(f"[名称替换] 跳过未匹配比赛: {lbb_match_name}")
 
-    conn.close()
     print(f"[名称替换] 完成处理: {len(result_data)}条数据")
     return result_data
\ No newline at end of file
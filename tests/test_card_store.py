@@ -0,0 +1,74 @@
+# test_card_store.py - 卡片指纹库的指纹计算、有效期和持久化
+import os
+import json
+import numpy as np
+import card_store
+from card_store import CardStore
+
+MATCH = {"team_a": "NaVi", "team_b": "Spirit", "odds_a": 1.85, "odds_b": 1.95}
+
+def screen(value=100):
+    return np.full((720, 1280, 3), value, dtype=np.uint8)
+
+def test_fingerprint_tolerates_noise():
+    store = CardStore()
+    img = screen()
+    key = store.fingerprint(img, (640, 300))
+    noisy = img.copy()
+    noisy[300, 640] += 3   # 量化范围内的渲染噪声
+    assert store.fingerprint(noisy, (640, 300)) == key
+    changed = img.copy()
+    changed[250:290, 400:600] = 255  # 队伍名称或赔率变化
+    assert store.fingerprint(changed, (640, 300)) != key
+
+def test_fingerprint_none_when_card_truncated():
+    store = CardStore()
+    assert store.fingerprint(None, (640, 300)) is None
+    assert store.fingerprint(screen(), (640, 30)) is None    # 超出顶部
+    assert store.fingerprint(screen(), (640, 700)) is None   # 超出底部
+
+def test_get_put_and_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(card_store.time, "time", lambda: now[0])
+    store = CardStore(ttl=60)
+    key = store.fingerprint(screen(), (640, 300))
+    assert store.get("CS2", key) is None
+    store.put("CS2", key, MATCH)
+    match = store.get("CS2", key)
+    assert match == MATCH
+    match["odds_a"] = 9.9  # 返回副本，修改不影响记录
+    assert store.get("CS2", key) == MATCH
+    assert store.get("DOTA2", key) is None  # 按游戏项目隔离
+    now[0] += 60
+    assert store.get("CS2", key) is None
+    assert store.stats() == {"hits": 2, "misses": 3}
+
+def test_put_ignores_missing_key_or_match():
+    store = CardStore()
+    store.put("CS2", None, MATCH)
+    store.put("CS2", "abc", None)
+    assert store.cards("CS2") == {}
+    assert store.get("CS2", None) is None
+
+def test_save_and_reload_drops_expired(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(card_store.time, "time", lambda: now[0])
+    store = CardStore(str(tmp_path), ttl=60)
+    store.put("CS2", "old", MATCH)
+    now[0] += 30
+    store.put("CS2", "new", MATCH)
+    store.put("DOTA2", "dota", MATCH)
+    now[0] += 40
+    store.save()
+    with open(os.path.join(tmp_path, "CS2", CardStore.FILE_NAME), encoding="utf-8") as f:
+        assert set(json.load(f)) == {"new"}
+
+    reloaded = CardStore(str(tmp_path), ttl=60)
+    assert reloaded.get("CS2", "new") == MATCH
+    assert reloaded.get("CS2", "old") is None
+    assert reloaded.get("DOTA2", "dota") == MATCH
+
+def test_corrupt_file_starts_empty(tmp_path):
+    os.makedirs(tmp_path / "CS2")
+    (tmp_path / "CS2" / CardStore.FILE_NAME).write_text("{broken", encoding="utf-8")
+    assert CardStore(str(tmp_path)).cards("CS2") == {}
@@ -0,0 +1,64 @@
+# test_db_manager.py - 连接缓存、一次性只读连接和写事务
+import sqlite3
+import pytest
+import db_manager
+from db_manager import connect, read_only, release, write_transaction
+
+@pytest.fixture(autouse=True)
+def close_connections():
+    yield
+    db_manager.close_all()
+
+def test_connection_cached_per_path(tmp_path):
+    path = str(tmp_path / "a.db")
+    assert connect(path) is connect(path)
+    assert connect(path).execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+def test_held_connection_survives_many_other_databases(tmp_path):
+    held = connect(str(tmp_path / "held.db"))
+    for index in range(40):
+        connect(str(tmp_path / f"{index}.db"))
+    assert held.execute("SELECT 1").fetchone() == (1,)
+
+def test_release_closes_only_that_connection(tmp_path):
+    first, second = str(tmp_path / "first.db"), str(tmp_path / "second.db")
+    conn = connect(first)
+    connect(second)
+    release(first)
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert connect(first) is not conn
+    assert connect(second).execute("SELECT 1").fetchone() == (1,)
+
+def test_write_transaction_commits_and_rolls_back(tmp_path):
+    path = str(tmp_path / "w.db")
+    with write_transaction(path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(ValueError):
+        with write_transaction(path) as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise ValueError
+    assert connect(path).execute("SELECT x FROM t").fetchall() == [(1,)]
+
+def test_nested_write_transaction_joins_outer(tmp_path):
+    path = str(tmp_path / "n.db")
+    with write_transaction(path) as outer:
+        outer.execute("CREATE TABLE t (x INTEGER)")
+        with write_transaction(path) as inner:
+            assert inner is outer
+            inner.execute("INSERT INTO t VALUES (1)")
+        assert outer.in_transaction
+    assert connect(path).execute("SELECT COUNT(*) FROM t").fetchone() == (1,)
+
+def test_read_only_is_uncached_and_read_only(tmp_path):
+    path = str(tmp_path / "r.db")
+    with write_transaction(path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (5)")
+    with read_only(path) as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(5,)]
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO t VALUES (6)")
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
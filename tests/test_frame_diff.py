@@ -0,0 +1,48 @@
+# test_frame_diff.py - compare_frames 滚动偏移估计
+import numpy as np
+from frame_diff import compare_frames
+
+def make_page(height=1280, width=720, seed=0):
+    """生成每行内容不同的合成页面（带横向条纹，类似列表界面）"""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, 256, size=(height, 1, 3), dtype=np.uint8)
+    page = np.repeat(rows, width, axis=1)
+    page[:, ::16] = 255 - page[:, ::16]
+    return page
+
+def scrolled(page, offset, height):
+    """内容向上滚动 offset 像素后的画面：frame[y] = page[y + offset]"""
+    return page[offset:offset + height].copy()
+
+def test_identical_frames():
+    frame = make_page()
+    comparison = compare_frames(frame, frame.copy())
+    assert comparison.offset == 0
+    assert comparison.similarity == 1.0
+
+def test_scroll_offset_detected():
+    page = make_page(height=1700)
+    before = scrolled(page, 0, 1280)
+    for offset in (5, 37, 180, 367):
+        after = scrolled(page, offset, 1280)
+        comparison = compare_frames(before, after)
+        assert comparison.offset == offset
+        assert comparison.aligned_similarity > 0.99
+        assert comparison.similarity < comparison.aligned_similarity
+
+def test_scroll_back_gives_negative_offset():
+    page = make_page(height=1600)
+    comparison = compare_frames(scrolled(page, 200, 1280), scrolled(page, 120, 1280))
+    assert comparison.offset == -80
+
+def test_region_limits_rows():
+    page = make_page(height=1600)
+    before, after = scrolled(page, 0, 1280), scrolled(page, 50, 1280)
+    # 固定的顶栏不随列表滚动
+    after[:100] = before[:100]
+    comparison = compare_frames(before, after, region=(100, 1280))
+    assert comparison.offset == 50
+
+def test_shape_mismatch():
+    comparison = compare_frames(make_page(height=100), make_page(height=120))
+    assert comparison == (0.0, 0, 0.0)
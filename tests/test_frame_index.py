@@ -0,0 +1,49 @@
+# test_frame_index.py - 单帧OCR索引的区域查询
+from frame_index import FrameOCR
+
+def box(x, y, w=40, h=20):
+    return [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+
+RESULT = [
+    [box(100, 300), ("预测中", 0.98)],
+    [box(100, 100), ("刷新", 0.95)],
+    [box(400, 100), ("赛事中心", 0.9)],
+    [box(400, 300), ("1.85", 0.88)],
+    [],                         # 空条目被跳过
+    [box(0, 0), ()],            # 无识别结果被跳过
+]
+
+def test_from_result_sorts_by_center_y():
+    index = FrameOCR.from_result(RESULT, region=[0, 0, 800, 600])
+    assert len(index) == 4
+    assert index.ys == sorted(index.ys)
+    item = index.find("刷新")
+    assert item.center == (120, 110)
+    assert item.score == 0.95
+
+def test_query_filters_rows_and_columns():
+    index = FrameOCR.from_result(RESULT)
+    assert [item.text for item in index.query([0, 50, 800, 100])] == ["刷新", "赛事中心"]
+    assert [item.text for item in index.query([300, 250, 300, 100])] == ["1.85"]
+    assert index.query([0, 500, 800, 100]) == []
+    # 中心正好落在区域边界上也算在内
+    assert [item.text for item in index.query([120, 110, 0, 0])] == ["刷新"]
+
+def test_find_and_find_all():
+    index = FrameOCR.from_result(RESULT + [[box(100, 500), ("预测中", 0.9)]])
+    assert index.find("赛事").text == "赛事中心"
+    assert index.find("预测中", roi=[0, 250, 300, 100]).center[1] == 310
+    assert index.find("不存在") is None
+    assert len(index.find_all("预测中")) == 2
+    assert index.find_all("预测中", roi=[0, 450, 300, 100])[0].center[1] == 510
+
+def test_covers():
+    index = FrameOCR.from_result(RESULT, region=[0, 200, 800, 200])
+    assert index.covers([100, 250, 100, 100])
+    assert not index.covers([100, 150, 100, 100])
+    assert not index.covers([700, 250, 200, 100])
+    assert FrameOCR.from_result(RESULT).covers([0, 0, 5000, 5000])
+
+def test_bounds():
+    item = FrameOCR.from_result([[box(10.6, 20.2, 30, 15), ("x", 1.0)]]).items[0]
+    assert FrameOCR.bounds(item) == [10, 20, 30, 15]
@@ -0,0 +1,24 @@
+# test_init_manager.py - OCR模型后台加载的复用和失败重试
+import pytest
+
+pytest.importorskip("maa")
+from init_manager import InitManager
+
+def test_failed_load_is_retried(monkeypatch):
+    init = InitManager(config={})
+    attempts = []
+
+    def initialize_ocr():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("model missing")
+        init.ocr = "ocr"
+        return init.ocr
+
+    monkeypatch.setattr(init, "initialize_ocr", initialize_ocr)
+    with pytest.raises(RuntimeError):
+        init.load_ocr_async().result(timeout=5)
+    assert init.ocr_future is None
+    assert init.load_ocr_async().result(timeout=5) == "ocr"
+    assert init.load_ocr_async() is init.ocr_future
+    assert len(attempts) == 2
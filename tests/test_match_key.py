@@ -0,0 +1,29 @@
+# test_match_key.py - 比赛规范键的规范化和UTC日期分桶
+from match_key import normalize_team, match_key, start_ts
+
+def test_normalize_team():
+    assert normalize_team("Team Spirit") == "teamspirit"
+    assert normalize_team("  NAVI. ") == "navi"
+    assert normalize_team("G2_Esports!") == "g2esports"
+    assert normalize_team(None) == ""
+
+def test_team_order_and_spelling_ignored():
+    key = match_key("CS2", "2026-10-16 12:00:00", "Team Spirit", "NaVi")
+    assert key == match_key("CS2", "2026-10-16 12:00:00", "navi", "team-spirit")
+    assert key == "CS2|2026-10-16|navi|teamspirit"
+
+def test_utc8_early_morning_buckets_to_previous_utc_date():
+    # 北京时间 03:00 为UTC前一天 19:00
+    assert match_key("G", "2026-10-16 03:00:00", "A", "B") == "G|2026-10-15|a|b"
+    # 北京时间 08:00 为UTC当天 00:00
+    assert match_key("G", "2026-10-16 08:00", "A", "B") == "G|2026-10-16|a|b"
+
+def test_start_ts():
+    assert start_ts("2026-10-16 03:00:00") == 1792090800
+    assert start_ts("2026-10-16 03:00") == 1792090800
+    assert start_ts("未开始") is None
+    assert start_ts(None) is None
+
+def test_unparseable_time_falls_back_to_date_text():
+    assert match_key("G", "今天 19:00", "B", "A") == "G|今天|a|b"
+    assert match_key("G", None, "A", "B") == "G||a|b"
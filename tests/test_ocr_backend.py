@@ -0,0 +1,46 @@
+# test_ocr_backend.py - 字段类型推断和受限CTC解码
+import numpy as np
+from ocr_backend import FIELD_CHARSETS, OnnxOCRBackend, guess_field
+
+def make_backend(characters):
+    backend = OnnxOCRBackend.__new__(OnnxOCRBackend)
+    backend.characters = ["blank"] + list(characters) + [" "]
+    backend.charset_indices = {}
+    backend.buffers = {}
+    return backend
+
+def one_hot(backend, sequence, noise=None):
+    """按字符序列构造 (1, 时间步, 类别) 概率，noise 为 {时间步: 次高概率字符}"""
+    probs = np.full((1, len(sequence), len(backend.characters)), 0.01, dtype=np.float32)
+    for step, ch in enumerate(sequence):
+        probs[0, step, backend.characters.index(ch) if ch else 0] = 0.9
+    for step, ch in (noise or {}).items():
+        probs[0, step, backend.characters.index(ch)] = 0.5
+    return probs
+
+def test_guess_field():
+    assert guess_field("1.85") == "odds"
+    assert guess_field("19:30") == "time"
+    assert guess_field("Team Spirit") == "team"
+    assert guess_field("预测中") is None
+
+def test_only_closed_alphabets_restricted():
+    assert set(FIELD_CHARSETS) == {"odds", "time"}
+
+def test_ctc_decode_merges_repeats_and_blanks():
+    backend = make_backend("0123456789.:O")
+    assert backend.decode(one_hot(backend, ["1", "1", None, "1", ".", "8", "5"]))[0][0] == "11.85"
+
+def test_restricted_decode_falls_back_to_allowed_character():
+    backend = make_backend("0123456789.:O")
+    probs = one_hot(backend, ["1", ".", "O", "5"], noise={2: "0"})
+    assert backend.decode(probs)[0][0] == "1.O5"
+    assert backend.decode(probs, FIELD_CHARSETS["odds"])[0][0] == "1.05"
+
+def test_buffer_reused_per_kind():
+    backend = make_backend("0")
+    large = backend._buffer("rec", (2, 3, 48, 320))
+    small = backend._buffer("rec", (1, 3, 48, 100))
+    assert small.shape == (1, 3, 48, 100) and small.flags.c_contiguous
+    assert np.shares_memory(large, small)
+    assert len(backend.buffers) == 1
@@ -0,0 +1,115 @@
+# test_ocr_cache.py - OCR结果缓存的命中、LRU淘汰和异步提交
+from concurrent.futures import Future
+import numpy as np
+from ocr_cache import OCRCache
+
+class CountingOCR:
+    """记录调用次数的假OCR，结果为图像像素之和"""
+    def __init__(self):
+        self.calls = 0
+
+    def ocr(self, img, **kwargs):
+        self.calls += 1
+        return [[[[0, 0], [1, 0], [1, 1], [0, 1]], (str(int(np.asarray(img).sum())), 0.9)]]
+
+class AsyncOCR(CountingOCR):
+    """提供 submit() 的假OCR，Future由测试手动完成"""
+    def __init__(self):
+        super().__init__()
+        self.futures = []
+
+    def submit(self, img, **kwargs):
+        self.calls += 1
+        future = Future()
+        self.futures.append((future, img))
+        return future
+
+def image(value, shape=(8, 8)):
+    return np.full(shape, value, dtype=np.uint8)
+
+def test_hit_returns_cached_result():
+    inner = CountingOCR()
+    cache = OCRCache(inner, maxsize=4)
+    first = cache.ocr(image(1))
+    assert cache.ocr(image(1)) is first
+    assert inner.calls == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+def test_kwargs_and_shape_are_part_of_the_key():
+    inner = CountingOCR()
+    cache = OCRCache(inner, maxsize=8)
+    cache.ocr(image(1))
+    cache.ocr(image(1), det=False)
+    cache.ocr(image(1, shape=(4, 16)))
+    assert inner.calls == 3
+
+def test_lru_eviction():
+    inner = CountingOCR()
+    cache = OCRCache(inner, maxsize=2)
+    cache.ocr(image(1))
+    cache.ocr(image(2))
+    cache.ocr(image(1))  # 命中后1成为最近使用
+    cache.ocr(image(3))  # 淘汰最久未使用的2
+    assert cache.stats()["evictions"] == 1
+    calls = inner.calls
+    cache.ocr(image(1))
+    assert inner.calls == calls
+    cache.ocr(image(2))
+    assert inner.calls == calls + 1
+
+def test_coarse_mode_tolerates_noise():
+    inner = CountingOCR()
+    exact = OCRCache(inner, maxsize=4)
+    coarse = OCRCache(inner, maxsize=4, mode="coarse")
+    noisy = image(64)
+    noisy[0, 1] += 3  # 降采样跳过的像素和量化范围内的噪声
+    noisy[2, 2] += 2
+    assert exact.make_key(image(64), {}) != exact.make_key(noisy, {})
+    assert coarse.make_key(image(64), {}) == coarse.make_key(noisy, {})
+    assert coarse.make_key(image(64), {}) != coarse.make_key(image(200), {})
+
+def test_maxsize_zero_disables_cache():
+    inner = CountingOCR()
+    cache = OCRCache(inner, maxsize=0)
+    cache.ocr(image(1))
+    cache.ocr(image(1))
+    assert inner.calls == 2
+    assert cache.stats()["size"] == 0
+
+def test_submit_without_inner_submit():
+    inner = CountingOCR()
+    cache = OCRCache(inner, maxsize=4)
+    future = cache.submit(image(1))
+    assert future.done()
+    assert cache.submit(image(1)).result() is future.result()
+    assert inner.calls == 1
+
+def test_submit_stores_result_when_future_completes():
+    inner = AsyncOCR()
+    cache = OCRCache(inner, maxsize=4)
+    pending = cache.submit(image(1))
+    assert not pending.done() and cache.stats()["size"] == 0
+    inner.futures[0][0].set_result("done")
+    assert pending.result() == "done"
+    cached = cache.submit(image(1))
+    assert cached.done() and cached.result() == "done"
+    assert inner.calls == 1
+
+def test_submit_does_not_cache_failures():
+    inner = AsyncOCR()
+    cache = OCRCache(inner, maxsize=4)
+    cache.submit(image(1))
+    inner.futures[0][0].set_exception(RuntimeError("worker died"))
+    cache.submit(image(1))
+    assert inner.calls == 2
+
+def test_clear_and_passthrough():
+    inner = CountingOCR()
+    inner.name = "fake"
+    cache = OCRCache(inner, maxsize=4)
+    cache.ocr(image(1))
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "hit_rate": 0.0}
+    assert cache.name == "fake"
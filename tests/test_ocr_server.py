@@ -0,0 +1,57 @@
+# test_ocr_server.py - OCR服务客户端的共享内存复用和请求超时（以线程代替工作进程）
+import queue
+import threading
+import numpy as np
+import pytest
+from ocr_server import OCRClient, attach_shared_memory
+
+def start_worker(request_queue, response_queue, drop=lambda img: False):
+    """模拟工作进程：返回图像像素和；drop 为真时不响应（模拟卡住的工作进程）"""
+    def run():
+        while True:
+            request = request_queue.get()
+            if request is None:
+                break
+            request_id, _, shm_name, shape, dtype, _ = request
+            shm = attach_shared_memory(shm_name)
+            img = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            result, skip = int(img.sum()), drop(img)
+            del img
+            shm.close()
+            if not skip:
+                response_queue.put((request_id, result, None))
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+@pytest.fixture
+def client():
+    request_queue, response_queue = queue.Queue(), queue.Queue()
+    client = OCRClient(0, request_queue, response_queue, timeout=1)
+    yield client
+    request_queue.put(None)
+    client.close()
+
+def test_segment_reused_between_requests(client):
+    start_worker(client.request_queue, client.response_queue)
+    assert [client.ocr(np.full((10, 10, 3), i, np.uint8)) for i in range(3)] == [0, 300, 600]
+    assert len(client.free_segments) == 1
+    segment = client.free_segments[0]
+    client.ocr(np.ones((5, 5, 3), np.uint8))
+    assert client.free_segments == [segment]
+
+def test_segment_grows_for_larger_image(client):
+    start_worker(client.request_queue, client.response_queue)
+    client.ocr(np.ones((10, 10, 3), np.uint8))
+    assert client.ocr(np.ones((100, 100, 3), np.uint8)) == 30000
+    assert len(client.free_segments) == 1
+    assert client.free_segments[0].size >= 30000
+
+def test_unanswered_request_times_out(client):
+    start_worker(client.request_queue, client.response_queue, drop=lambda img: img[0, 0, 0] == 7)
+    with pytest.raises(TimeoutError):
+        client.ocr(np.full((4, 4, 3), 7, np.uint8))
+    assert client.pending == {}
+    # 超时请求的共享内存段不被复用，之后的请求照常完成
+    assert client.ocr(np.full((4, 4, 3), 1, np.uint8)) == 48
+    assert len(client.expired) == 1
@@ -0,0 +1,46 @@
+# test_odds_history.py - 赔率历史的差值链写入和查询
+import pytest
+from odds_store import OddsStore
+
+KEY = "G|2026-10-16|a|b"
+
+@pytest.fixture
+def store(tmp_path):
+    return OddsStore(str(tmp_path))
+
+def test_unchanged_snapshot_skipped(store):
+    assert store.append_odds("lbb", [(KEY, 1000, 1.85, 2.0)]) == 1
+    assert store.append_odds("lbb", [(KEY, 1060, 1.85, 2.0)]) == 0
+    assert store.odds_history("lbb", KEY) == [(1000, 1.85, 2.0)]
+
+def test_same_second_changes_merge(store):
+    store.append_odds("lbb", [(KEY, 1000, 1.85, 2.0)])
+    assert store.append_odds("lbb", [(KEY, 1120, 1.9, 1.95)]) == 1
+    assert store.append_odds("lbb", [(KEY, 1120, 1.7, 2.2)]) == 1
+    assert store.odds_history("lbb", KEY) == [(1000, 1.85, 2.0), (1120, 1.7, 2.2)]
+
+def test_out_of_order_snapshot_dropped(store):
+    store.append_odds("lbb", [(KEY, 1000, 1.85, 2.0)])
+    assert store.append_odds("lbb", [(KEY, 900, 1.1, 1.1)]) == 0
+    assert store.latest_odds("lbb") == {KEY: (1000, 1.85, 2.0)}
+
+def test_batch_keeps_last_snapshot_per_match(store):
+    store.append_odds("lbb", [(KEY, 1000, 1.85, 2.0)])
+    assert store.append_odds("lbb", [(KEY, 1300, 1.8, 2.05), (KEY, 1310, 1.81, 2.05)]) == 1
+    assert store.latest_odds("lbb", [KEY]) == {KEY: (1310, 1.81, 2.05)}
+    assert store.latest_odds("web") == {}
+
+def test_batch_keeps_latest_snapshot_regardless_of_order(store):
+    # 迁移时来自多个目录和数据库文件的快照不按时间排序
+    store.append_odds("lbb", [(KEY, 1000, 1.85, 2.0)])
+    assert store.append_odds("lbb", [(KEY, 1310, 1.81, 2.05), (KEY, 1100, 1.7, 2.2)]) == 1
+    assert store.latest_odds("lbb", [KEY]) == {KEY: (1310, 1.81, 2.05)}
+
+def test_open_close_and_downsample(store):
+    for ts, odds_a, odds_b in ((1000, 1.85, 2.0), (1120, 1.7, 2.2), (1310, 1.81, 2.05)):
+        store.append_odds("lbb", [(KEY, ts, odds_a, odds_b)])
+    assert store.open_close("lbb", KEY, close_ts=1200) == {"open": (1000, 1.85, 2.0), "close": (1120, 1.7, 2.2)}
+    assert store.open_close("lbb", KEY)["close"] == (1310, 1.81, 2.05)  # 比赛开始时间未知时取最新
+    assert store.open_close("lbb", "G|2026-10-16|x|y") is None
+    assert store.downsample("lbb", KEY, 120, end=1500) == [
+        (960, 1.85, 2.0), (1080, 1.7, 2.2), (1200, 1.81, 2.05), (1320, 1.81, 2.05), (1440, 1.81, 2.05)]
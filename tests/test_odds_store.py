@@ -0,0 +1,107 @@
+# test_odds_store.py - 旧目录结构迁移到统一赔率库及兼容读取
+import os
+import sqlite3
+import pytest
+from db_manager import connect
+from match_key import match_key
+from odds_store import OddsStore, migrate, read_matches, KELLY_COLUMNS
+
+GAME = "CS2"
+OLD_COLUMNS = "match_id TEXT PRIMARY KEY, match_name TEXT, match_time TEXT, team_a TEXT, team_b TEXT, " \
+              "odds_a REAL, odds_b REAL, last_updated TEXT"
+
+def write_db(path, schema, statement, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with sqlite3.connect(path) as conn:
+        conn.execute(schema)
+        conn.executemany(statement, rows)
+    conn.close()
+
+@pytest.fixture
+def legacy_dir(tmp_path):
+    """按旧目录结构建立一个游戏项目：比赛目录下的网络/小黑盒数据库、默认数据库、映射和凯利结果"""
+    game_folder = tmp_path / GAME
+    matches = "INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    write_db(str(game_folder / "Major" / "web_matches.db"), f"CREATE TABLE matches ({OLD_COLUMNS})", matches, [
+        ("web_1", "Major", "2026-10-16 20:00:00", "NaVi", "Spirit", 1.8, 2.0, "2026-10-16 10:00:00"),
+        ("web_2", "Major", "2026-10-16 22:00:00", "FaZe", "G2", 1.5, 2.6, "2026-10-16 10:00:00"),
+    ])
+    write_db(str(game_folder / "Major" / "lbb_matches.db"), f"CREATE TABLE matches ({OLD_COLUMNS})", matches, [
+        ("lbb_1", "Major", "2026-10-16 20:00", "Spirit", "NaVi", 2.1, 1.7, "2026-10-16 11:00:00"),
+    ])
+    write_db(str(game_folder / "default_lbb_matches.db"), f"CREATE TABLE matches ({OLD_COLUMNS})", matches, [
+        ("lbb_9", "Unknown Cup", "2026-10-17 12:00", "MOUZ", "Vitality", 3.0, 1.3, "2026-10-16 11:00:00"),
+    ])
+    mappings = str(game_folder / "mappings.db")
+    write_db(mappings, "CREATE TABLE match_name_mapping (lbb_match_name TEXT, web_match_name TEXT, "
+             "game_name TEXT, last_updated TEXT)", "INSERT INTO match_name_mapping VALUES (?, ?, ?, ?)",
+             [("小黑盒 Major", "Major", GAME, "2026-10-16")])
+    write_db(mappings, "CREATE TABLE team_mapping (lbb_team TEXT, web_team TEXT, game_name TEXT, last_updated TEXT)",
+             "INSERT INTO team_mapping VALUES (?, ?, ?, ?)", [("纳维", "NaVi", GAME, "2026-10-16")])
+    kelly = dict.fromkeys(KELLY_COLUMNS)
+    kelly.update(match_id="lbb_1", match_name="Major", kelly_a=0.12, coins_a=30, match_dir="Major")
+    write_db(str(game_folder / "kelly_results.db"),
+             f"CREATE TABLE kelly_results ({', '.join(KELLY_COLUMNS)}, PRIMARY KEY (match_id))",
+             f"INSERT INTO kelly_results VALUES ({', '.join('?' * len(KELLY_COLUMNS))})",
+             [[kelly[column] for column in KELLY_COLUMNS]])
+    return str(tmp_path)
+
+def ids(rows):
+    return sorted(row["match_id"] for row in rows)
+
+def test_migrate_round_trip(legacy_dir):
+    assert migrate(legacy_dir) == {GAME: 4}
+    store = OddsStore(legacy_dir)
+    assert store.is_migrated(GAME)
+
+    web = {row["match_id"]: row for row in store.match_rows(GAME, "web")}
+    assert set(web) == {"web_1", "web_2"}
+    assert web["web_1"]["folder"] == "Major"
+    assert (web["web_1"]["team_a"], web["web_1"]["odds_a"], web["web_1"]["odds_b"]) == ("NaVi", 1.8, 2.0)
+    assert web["web_1"]["match_key"] == match_key(GAME, "2026-10-16 20:00:00", "NaVi", "Spirit")
+    assert [row["folder"] for row in store.match_rows(GAME, "lbb_default")] == [None]
+
+    conn = connect(store.path)
+    assert conn.execute("SELECT lbb_match_name, web_match_name FROM match_name_mapping WHERE game = ?",
+                        (GAME,)).fetchall() == [("小黑盒 Major", "Major")]
+    assert conn.execute("SELECT lbb_team, web_team FROM team_mapping WHERE game = ?", (GAME,)).fetchall() == [("纳维", "NaVi")]
+    assert conn.execute("SELECT match_id, kelly_a, coins_a FROM kelly_results WHERE game = ?",
+                        (GAME,)).fetchall() == [("lbb_1", 0.12, 30)]
+
+    # 旧数据库的最新赔率作为赔率历史的第一条快照
+    key = match_key(GAME, "2026-10-16 20:00", "Spirit", "NaVi")
+    assert store.latest_odds("web", [key])[key][1:] == (1.8, 2.0)
+    assert store.latest_odds("lbb", [key])[key][1:] == (2.1, 1.7)
+
+def test_migrate_is_idempotent(legacy_dir):
+    migrate(legacy_dir)
+    assert migrate(legacy_dir) == {GAME: 4}
+    store = OddsStore(legacy_dir)
+    assert ids(store.match_rows(GAME, "web")) == ["web_1", "web_2"]
+    key = match_key(GAME, "2026-10-16 20:00", "NaVi", "Spirit")
+    assert len(store.odds_history("web", key)) == 1
+
+def test_read_matches_switches_to_store_after_migration(legacy_dir):
+    store = OddsStore(legacy_dir)
+    # 双写已开始但未迁移：统一库只有新数据，读取仍走旧目录结构
+    store.upsert_matches(GAME, "web", [dict(match_id="web_3", match_name="Major", match_time="2026-10-18 20:00:00",
+                                            team_a="Liquid", team_b="Heroic", odds_a=1.9, odds_b=1.9)], folder="Major")
+    assert ids(read_matches(legacy_dir, GAME, "web")) == ["web_1", "web_2"]
+    assert ids(read_matches(legacy_dir, GAME, "web", folder="Major")) == ["web_1", "web_2"]
+    assert read_matches(legacy_dir, GAME, "web", folder="Other") == []
+    legacy = read_matches(legacy_dir, GAME, "lbb")[0]
+    assert legacy["folder"] == "Major" and legacy["original_team_a"] is None  # 旧表缺少的字段为None
+
+    migrate(legacy_dir)
+    assert ids(read_matches(legacy_dir, GAME, "web")) == ["web_1", "web_2", "web_3"]
+    assert ids(read_matches(legacy_dir, GAME, "web", folder="Major")) == ["web_1", "web_2", "web_3"]
+
+def test_read_matches_unknown_game(legacy_dir):
+    assert read_matches(legacy_dir, "DOTA2", "web") == []
+    assert read_matches(legacy_dir, "DOTA2", "lbb_default") == []
+
+def test_paired_matches(legacy_dir):
+    migrate(legacy_dir)
+    pairs = OddsStore(legacy_dir).paired_matches(GAME)
+    # 队伍顺序相反、时间写法不同的同一场比赛按规范键配对，没有小黑盒数据的网络比赛不返回
+    assert [(web["match_id"], lbb["match_id"], folder) for web, lbb, folder in pairs] == [("web_1", "lbb_1", "Major")]
@@ -0,0 +1,65 @@
+# test_save_many.py - 批量保存小黑盒数据的更新和去重
+import os
+import sqlite3
+from data_manager import DataManager
+
+GAME = "CS2"
+
+def match(name, team_a, team_b, odds_a, odds_b, time):
+    return dict(match_name=name, team_a=team_a, team_b=team_b, odds_a=odds_a, odds_b=odds_b, time=time)
+
+def rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT match_id, team_a, team_b, odds_a, odds_b FROM matches ORDER BY match_id").fetchall()
+
+def make_manager(data_dir):
+    os.makedirs(os.path.join(data_dir, GAME))
+    with sqlite3.connect(os.path.join(data_dir, GAME, "mappings.db")) as conn:
+        conn.execute("CREATE TABLE match_name_mapping (lbb_match_name TEXT, web_match_name TEXT, game_name TEXT)")
+        conn.execute("INSERT INTO match_name_mapping VALUES ('LBB Cup', 'Web Cup', ?)", (GAME,))
+    return DataManager({'fetch': {'data_dir': data_dir}})
+
+def test_save_many_routes_by_mapping_and_skips_empty(tmp_path):
+    data_dir = str(tmp_path)
+    data_mgr = make_manager(data_dir)
+    ids = data_mgr.save_many(GAME, [
+        match("LBB Cup", "NaVi", "Spirit", 1.5, 2.5, "2026-10-16 12:00"),
+        {},
+        match("Other Cup", "FaZe", "G2", 1.8, 1.9, "2026-10-16 13:00"),
+    ])
+    assert ids[1] is None
+    assert ids[0] == "lbb_CS2_LBB Cup_2026-10-161200"
+    # 有映射的比赛写入标准名称目录，未映射的同时写入默认数据库
+    assert rows(os.path.join(data_dir, GAME, "Web Cup", "lbb_matches.db")) == [(ids[0], "NaVi", "Spirit", 1.5, 2.5)]
+    assert rows(os.path.join(data_dir, GAME, "Other Cup", "lbb_matches.db")) == [(ids[2], "FaZe", "G2", 1.8, 1.9)]
+    assert rows(os.path.join(data_dir, GAME, "default_lbb_matches.db")) == [(ids[2], "FaZe", "G2", 1.8, 1.9)]
+
+def test_save_many_upserts_existing_match(tmp_path):
+    data_dir = str(tmp_path)
+    data_mgr = make_manager(data_dir)
+    first = data_mgr.save_many(GAME, [match("LBB Cup", "NaVi", "Spirit", 1.5, 2.5, "2026-10-16 12:00")])
+    # 同一比赛赔率更新、开赛时间微调：按规范键找到原记录并更新，不新增记录
+    second = data_mgr.save_many(GAME, [match("LBB Cup", "NaVi", "Spirit", 1.4, 2.8, "2026-10-16 12:30")])
+    assert second == first
+    assert rows(os.path.join(data_dir, GAME, "Web Cup", "lbb_matches.db")) == [(first[0], "NaVi", "Spirit", 1.4, 2.8)]
+    lbb = data_mgr.odds_store.match_rows(GAME, "lbb")
+    assert [(row["match_id"], row["odds_a"], row["odds_b"]) for row in lbb] == [(first[0], 1.4, 2.8)]
+
+def test_save_many_dedupes_within_batch(tmp_path):
+    data_dir = str(tmp_path)
+    data_mgr = make_manager(data_dir)
+    # 同一批次中两次识别到同一场比赛（队伍顺序相反），只保留一条记录，后出现的数据生效
+    ids = data_mgr.save_many(GAME, [
+        match("Other Cup", "FaZe", "G2", 1.8, 1.9, "2026-10-16 13:00"),
+        match("Other Cup", "G2", "FaZe", 2.0, 1.7, "2026-10-16 14:00"),
+    ])
+    assert ids[0] == ids[1]
+    for path in ("Other Cup/lbb_matches.db", "default_lbb_matches.db"):
+        assert rows(os.path.join(data_dir, GAME, path)) == [(ids[0], "G2", "FaZe", 2.0, 1.7)]
+
+def test_save_many_keeps_explicit_match_id(tmp_path):
+    data_dir = str(tmp_path)
+    data_mgr = make_manager(data_dir)
+    data = dict(match("LBB Cup", "NaVi", "Spirit", 1.5, 2.5, "2026-10-16 12:00"), match_id="custom")
+    assert data_mgr.save_many(GAME, [data]) == ["custom"]
+    assert rows(os.path.join(data_dir, GAME, "Web Cup", "lbb_matches.db"))[0][0] == "custom"
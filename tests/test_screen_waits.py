@@ -0,0 +1,67 @@
+# test_screen_waits.py - 点击后的画面等待（虚拟时钟，不实际休眠）
+import numpy as np
+from session_replay import VirtualClock
+from screen_manager import ScreenManager
+
+class Job:
+    def wait(self):
+        return self
+
+class FakeController:
+    """点击后经过 reload_delay 秒画面变为 after（after 为None时画面不变）"""
+    def __init__(self, clock, before, after=None, reload_delay=0.5):
+        self.clock = clock
+        self.before = before
+        self.after = after
+        self.reload_delay = reload_delay
+        self.clicked_at = None
+
+    @property
+    def cached_image(self):
+        if self.after is not None and self.clicked_at is not None and \
+                self.clock.time() - self.clicked_at >= self.reload_delay:
+            return self.after
+        return self.before
+
+    def post_screencap(self):
+        return Job()
+
+    def post_click(self, x, y):
+        self.clicked_at = self.clock.time()
+        return Job()
+
+def make_screen(clock, controller):
+    screen = ScreenManager(controller, ocr=None, clock=clock, ocr_cache_size=0)
+    screen.find_anchor = lambda img, name, *args, **kwargs: [0, 0, 1, 1]
+    return screen
+
+def frame(value):
+    img = np.full((1280, 720, 3), value, dtype=np.uint8)
+    img[::7] = 255 - value
+    return img
+
+def test_wait_returns_after_screen_changes_and_settles():
+    clock = VirtualClock()
+    screen = make_screen(clock, FakeController(clock, frame(10), frame(90), reload_delay=0.5))
+    reference = screen.grab_frame()
+    screen.click(1, 1)
+    screen.wait_until_stable(3, reference=reference, label="点击")
+    record = screen.wait_log[-1]
+    assert record.settled
+    assert 0.5 <= record.elapsed < 1.0
+
+def test_unchanged_screen_uses_change_timeout():
+    clock = VirtualClock()
+    screen = make_screen(clock, FakeController(clock, frame(10)))
+    reference = screen.grab_frame()
+    screen.click(1, 1)
+    screen.wait_until_stable(3, reference=reference, label="点击", change_timeout=1.0)
+    record = screen.wait_log[-1]
+    assert record.settled
+    assert 1.0 <= record.elapsed < 1.5
+
+def test_refresh_with_identical_reload_does_not_burn_budget():
+    clock = VirtualClock()
+    screen = make_screen(clock, FakeController(clock, frame(10)))
+    assert screen.refresh()
+    assert sum(record.elapsed for record in screen.wait_log) < 1.5
@@ -0,0 +1,96 @@
+# test_session_replay.py - 会话录制后回放：截图、操作对齐和虚拟时钟
+import time
+import numpy as np
+import pytest
+from capture_service import CaptureService
+from session_replay import ReplayController, SessionRecorder, VirtualClock
+
+class Job:
+    """录制按真实时间记录事件，每个操作耗时几毫秒，事件时间互不相同"""
+    def wait(self):
+        time.sleep(0.005)
+        return self
+
+class FakeController:
+    """每次点击/滑动后画面切换到下一帧"""
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+        self.cached_image = None
+
+    def post_screencap(self):
+        self.cached_image = self.frames[self.index]
+        return Job()
+
+    def post_click(self, x, y):
+        self.index += 1
+        return Job()
+
+    def post_swipe(self, x1, y1, x2, y2, duration):
+        self.index += 1
+        return Job()
+
+def frame(value):
+    return np.full((32, 24, 3), value, dtype=np.uint8)
+
+@pytest.fixture
+def session(tmp_path):
+    """录制：截图A，点击，截图B两次（内容相同只保存一次），滑动，截图C"""
+    recorder = SessionRecorder(FakeController([frame(10), frame(20), frame(30)]), str(tmp_path), chunk_size=2)
+    recorder.post_screencap().wait()
+    recorder.post_click(100, 200).wait()
+    recorder.post_screencap().wait()
+    recorder.post_screencap().wait()
+    recorder.post_swipe(360, 900, 360, 500, 300).wait()
+    recorder.post_screencap().wait()
+    recorder.close(event="test")
+    return str(tmp_path)
+
+def test_recording_deduplicates_frames(session):
+    replay = ReplayController(session)
+    assert replay.meta["frames"] == 3
+    assert replay.meta["screencaps"] == 4
+    assert replay.meta["inputs"] == 2
+    assert replay.meta["event"] == "test"
+
+def test_replay_returns_recorded_frames_in_order(session):
+    replay = ReplayController(session, clock=VirtualClock(), screencap_latency=0.01)
+    seen = []
+    replay.post_screencap().wait()
+    seen.append(int(replay.cached_image[0, 0, 0]))
+    replay.post_click(104, 197).wait()  # 坐标在容差内
+    replay.post_screencap().wait()
+    seen.append(int(replay.cached_image[0, 0, 0]))
+    replay.post_swipe(360, 890, 360, 510, 300).wait()
+    replay.post_screencap().wait()
+    seen.append(int(replay.cached_image[0, 0, 0]))
+    assert seen == [10, 20, 30]
+    assert replay.stats() == {"screencaps": 3, "matched": 2, "mismatched": 0, "skipped": 0}
+
+def test_virtual_clock_advances_without_sleeping(session):
+    clock = VirtualClock(start=100.0)
+    replay = ReplayController(session, clock=clock, screencap_latency=0.5)
+    replay.post_screencap()
+    assert clock.time() == pytest.approx(100.5)
+    clock.sleep(30)  # 只推进虚拟时间
+    replay.post_screencap()
+    assert clock.time() == pytest.approx(131.0)
+    # 未对齐下一个操作前，截图不会越过录制中的点击
+    assert int(replay.cached_image[0, 0, 0]) == 10
+
+def test_mismatched_input_counted(session):
+    replay = ReplayController(session)
+    replay.post_click(600, 50)
+    assert replay.stats()["mismatched"] == 1
+
+def test_capture_service_stamps_frames_with_replay_clock(session):
+    clock = VirtualClock(start=5.0)
+    replay = ReplayController(session, clock=clock, screencap_latency=0.01)
+    capture = CaptureService(replay, ring_size=2, clock=clock)
+    capture.start()
+    try:
+        captured = capture.next_frame(after=5.0, timeout=5)
+    finally:
+        capture.stop()
+    assert captured is not None
+    assert 5.0 <= captured.timestamp <= clock.time()
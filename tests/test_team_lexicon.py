@@ -0,0 +1,52 @@
+# test_team_lexicon.py - 队伍名称词典的编辑距离纠正
+import os
+import sqlite3
+from team_lexicon import BKTree, TeamLexicon, levenshtein
+
+def test_levenshtein():
+    assert levenshtein("navi", "navi") == 0
+    assert levenshtein("navi", "nav1") == 1
+    assert levenshtein("spirit", "spir1t5") == 2
+    assert levenshtein("", "abc") == 3
+
+def test_bk_tree_search_matches_brute_force():
+    words = ["spirit", "navi", "vitality", "faze", "liquid", "g2", "heroic", "fnatic", "furia", "astralis"]
+    tree = BKTree()
+    for word in words:
+        tree.add(word)
+    tree.add("navi")  # 重复的词不重复加入
+    assert tree.size == len(words)
+    for query in ("navl", "spirlt", "fnatik", "xyz"):
+        expected = sorted((levenshtein(query, word), word) for word in words if levenshtein(query, word) <= 2)
+        assert tree.search(query, 2) == expected
+
+def test_correct_snaps_to_known_name():
+    lexicon = TeamLexicon(["Team Spirit", "NaVi", "Vitality"])
+    assert lexicon.correct("team spirit") == ("Team Spirit", 0)
+    assert lexicon.correct("Team Spirlt") == ("Team Spirit", 1)
+    assert lexicon.correct("NaV1") == ("NaVi", 1)
+    assert lexicon.correct("Vita1ity") == ("Vitality", 1)
+
+def test_correct_leaves_unknown_short_and_ambiguous_names():
+    lexicon = TeamLexicon(["G2", "Heroic", "Heroid", "UNMATCHED_X"])
+    assert len(lexicon) == 3
+    assert lexicon.correct("G3") == ("G3", None)          # 过短的名称不纠正
+    assert lexicon.correct("Liquid") == ("Liquid", None)  # 距离上界内没有名称
+    assert lexicon.correct("Herois") == ("Herois", None)  # 两个名称同样近
+
+def test_from_data_dir(tmp_path):
+    folder = tmp_path / "CS2" / "Major"
+    os.makedirs(folder)
+    conn = sqlite3.connect(str(folder / "web_matches.db"))
+    conn.execute("CREATE TABLE matches (match_id TEXT, team_a TEXT, team_b TEXT)")
+    conn.execute("INSERT INTO matches VALUES ('1', 'Team Spirit', 'NaVi')")
+    conn.commit()
+    conn.close()
+    conn = sqlite3.connect(str(tmp_path / "CS2" / "mappings.db"))
+    conn.execute("CREATE TABLE team_mapping (game_name TEXT, lbb_team TEXT, web_team TEXT)")
+    conn.execute("INSERT INTO team_mapping VALUES ('CS2', 'Spirit', 'Team Spirit')")
+    conn.commit()
+    conn.close()
+    lexicon = TeamLexicon.from_data_dir(str(tmp_path), "CS2")
+    assert sorted(lexicon.canonical.values()) == ["NaVi", "Spirit", "Team Spirit"]
+    assert lexicon.correct("Spirlt") == ("Spirit", 1)
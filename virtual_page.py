@@ -0,0 +1,65 @@
+# virtual_page.py
+import numpy as np
+
+class VirtualPage:
+    """
+    虚拟长页面：将连续滚动截图的列表区域按估计的滚动偏移拼接成一张长图，
+    并以虚拟纵坐标记录已处理的卡片，避免重叠区域内的卡片被重复处理
+    """
+    def __init__(self, region, card_tolerance=20):
+        """
+        region: (y0, y1) 截图中列表滚动区域的行范围
+        card_tolerance: 判断两个卡片为同一张时允许的虚拟纵坐标误差（像素）
+        """
+        self.region = region
+        self.card_tolerance = card_tolerance
+        self.top = 0          # 当前截图列表区域顶部对应的虚拟纵坐标
+        self.strips = []      # 拼接用的图像条带
+        self.cards = []       # 已处理卡片的虚拟纵坐标
+        self.offsets = []     # 每次滚动测得的偏移
+
+    @property
+    def height(self):
+        """已拼接的虚拟页面高度"""
+        return sum(strip.shape[0] for strip in self.strips)
+
+    def start(self, frame):
+        """以第一帧初始化虚拟页面"""
+        self.top = 0
+        self.strips = [frame[self.region[0]:self.region[1]].copy()]
+        self.cards = []
+        self.offsets = []
+
+    def advance(self, frame, offset):
+        """
+        滚动后追加新一帧：offset为内容向上移动的像素数，
+        只拼接新露出的底部 offset 行
+        """
+        self.offsets.append(offset)
+        if offset <= 0:
+            return
+        self.top += offset
+        region_rows = self.region[1] - self.region[0]
+        offset = min(offset, region_rows)
+        self.strips.append(frame[self.region[1] - offset:self.region[1]].copy())
+
+    def to_virtual_y(self, frame_y):
+        """截图纵坐标转换为虚拟页面纵坐标"""
+        return self.top + frame_y - self.region[0]
+
+    def mark_card(self, frame_y):
+        """
+        记录一张卡片，返回是否为新卡片
+        frame_y: 卡片在当前截图中的纵坐标
+        """
+        virtual_y = self.to_virtual_y(frame_y)
+        if any(abs(virtual_y - seen) <= self.card_tolerance for seen in self.cards):
+            return False
+        self.cards.append(virtual_y)
+        return True
+
+    def image(self):
+        """返回拼接后的整张虚拟页面"""
+        if not self.strips:
+            return None
+        return np.vstack(self.strips)